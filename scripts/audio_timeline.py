@@ -0,0 +1,205 @@
+"""
+Chunk durations and the per-line episode timeline, straight from the audio
+bytes — MP3 frame headers (plus the Xing/Info + LAME tag ElevenLabs writes)
+or raw PCM sizes, so no ffprobe spawn per chunk. The same logic runs in the
+Concatenate Audio node (JS_AUDIO_TIMELINE in js_lib.py); keep the two in step.
+
+Usage (from repo root):
+  python3 scripts/audio_timeline.py assets/test-flint.mp3          # one file
+  python3 scripts/audio_timeline.py logs/chunks/2026-10-18         # checkpoint dir (NNNN.mp3 / NNNN.pcm)
+  python3 scripts/audio_timeline.py DIR --format pcm_24000 --offset-ms 12000 --json
+
+Importable: parse_mp3(), pcm_chunk_info(), chunk_info(), build_timeline().
+"""
+import argparse, glob, json, math, os, re, sys
+
+# MPEG audio Layer III only — that is all ElevenLabs produces
+BITRATES_KBPS = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+SAMPLE_RATES = {
+    1:   [44100, 48000, 32000],
+    2:   [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000]
+}
+
+def round_half_up(x, digits=0):
+    # Math.round semantics, so the JS mirror produces identical numbers
+    scale = 10 ** digits
+    return math.floor(x * scale + 0.5) / scale if digits else math.floor(x + 0.5)
+
+def parse_frame_header(data, pos):
+    """Returns the Layer III frame at pos as a dict, or None if it is not a valid header."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 3
+    layer_bits   = (data[pos + 1] >> 1) & 3
+    bitrate_idx  = data[pos + 2] >> 4
+    rate_idx     = (data[pos + 2] >> 2) & 3
+    if version_bits == 1 or layer_bits != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    version     = {0: 2.5, 2: 2, 3: 1}[version_bits]
+    bitrate     = BITRATES_KBPS[1 if version == 1 else 2][bitrate_idx]
+    sample_rate = SAMPLE_RATES[version][rate_idx]
+    padding     = (data[pos + 2] >> 1) & 1
+    samples     = 1152 if version == 1 else 576
+    return {
+        "version":     version,
+        "bitrate":     bitrate,
+        "sample_rate": sample_rate,
+        "channels":    1 if (data[pos + 3] >> 6) == 3 else 2,
+        "samples":     samples,
+        "length":      samples // 8 * bitrate * 1000 // sample_rate + padding
+    }
+
+def id3v2_size(data):
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+def parse_info_frame(data, pos, header):
+    """Xing/Info (LAME) or VBRI header in the first frame — it carries no audio."""
+    side = (32 if header["channels"] == 2 else 17) if header["version"] == 1 else (17 if header["channels"] == 2 else 9)
+    x = pos + 4 + side
+    tag = data[x:x + 4]
+    if tag in (b"Xing", b"Info"):
+        flags = int.from_bytes(data[x + 4:x + 8], "big")
+        off = x + 8
+        frames = None
+        if flags & 1:
+            frames = int.from_bytes(data[off:off + 4], "big")
+            off += 4
+        off += (4 if flags & 2 else 0) + (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+        delay = padding = 0
+        # LAME extension: 9-byte encoder string, then delay/padding 12 bits each at +21
+        if data[off:off + 4] in (b"LAME", b"Lavf", b"Lavc") and off + 24 <= len(data):
+            d = data[off + 21:off + 24]
+            delay   = (d[0] << 4) | (d[1] >> 4)
+            padding = ((d[1] & 0x0F) << 8) | d[2]
+        return {"tag": tag.decode(), "frames": frames, "delay": delay, "padding": padding}
+    v = pos + 4 + 32
+    if data[v:v + 4] == b"VBRI":
+        return {"tag": "VBRI", "frames": int.from_bytes(data[v + 14:v + 18], "big"),
+                "delay": int.from_bytes(data[v + 6:v + 8], "big"), "padding": 0}
+    return None
+
+def parse_mp3(data):
+    """Walks every frame header. samples/duration_ms are what a gapless decoder
+    (ffmpeg included) plays: frames × samples-per-frame minus the encoder delay
+    and padding recorded in the LAME tag."""
+    pos = id3v2_size(data)
+    end = len(data) - (128 if data[-128:-125] == b"TAG" else 0)
+    frames = audio_bytes = skipped = 0
+    first = info = None
+    bitrates = set()
+    while pos + 4 <= end:
+        h = parse_frame_header(data, pos)
+        if not h or pos + h["length"] > end:
+            pos += 1          # junk or a truncated frame: resync byte by byte
+            skipped += 1
+            continue
+        if first is None:
+            first = h
+            info = parse_info_frame(data, pos, h)
+            if info:
+                pos += h["length"]
+                continue
+        frames += 1
+        audio_bytes += h["length"]
+        bitrates.add(h["bitrate"])
+        pos += h["length"]
+    if first is None:
+        raise ValueError("no MPEG Layer III frames found")
+
+    delay   = info["delay"] if info else 0
+    padding = info["padding"] if info else 0
+    samples = max(0, frames * first["samples"] - delay - padding)
+    coded_sec = frames * first["samples"] / first["sample_rate"]
+    return {
+        "format":        "mp3",
+        "sample_rate":   first["sample_rate"],
+        "channels":      first["channels"],
+        "frames":        frames,
+        "samples":       samples,
+        "duration_ms":   round_half_up(samples * 1000 / first["sample_rate"], 3),
+        "bitrate_kbps":  round_half_up(audio_bytes * 8 / coded_sec / 1000, 1) if frames else 0,
+        "vbr":           len(bitrates) > 1,
+        "encoder_delay": delay,
+        "padding":       padding,
+        "info_tag":      info["tag"] if info else None,
+        "skipped_bytes": skipped
+    }
+
+def pcm_chunk_info(nbytes, sample_rate):
+    samples = (nbytes + 1) // 2     # odd chunks are zero-padded to a whole sample
+    return {"format": "pcm", "sample_rate": sample_rate, "channels": 1, "frames": None,
+            "samples": samples, "duration_ms": round_half_up(samples * 1000 / sample_rate, 3),
+            "bitrate_kbps": sample_rate * 16 / 1000, "vbr": False}
+
+def chunk_info(data, output_format="mp3_44100_128"):
+    """Duration info for one TTS chunk; raw PCM (pcm_<rate>) is s16le mono."""
+    m = re.fullmatch(r"pcm_(\d+)", output_format or "")
+    return pcm_chunk_info(len(data), int(m.group(1))) if m else parse_mp3(data)
+
+def build_timeline(lines, offset_ms=0):
+    """lines: [{line_index, speaker, samples, sample_rate}] in episode order.
+    Boundaries accumulate in seconds and round once, so they never drift."""
+    out, t = [], 0.0
+    for l in sorted(lines, key=lambda l: l["line_index"]):
+        start = t
+        t += l["samples"] / l["sample_rate"]
+        out.append({
+            "line_index": l["line_index"],
+            "speaker":    l.get("speaker"),
+            "start_ms":   round_half_up(offset_ms + start * 1000),
+            "end_ms":     round_half_up(offset_ms + t * 1000)
+        })
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="+", help="audio files or a directory of NNNN.mp3 / NNNN.pcm chunks")
+    ap.add_argument("--format", help="TTS output_format (default: from the extension; .pcm needs pcm_<rate>)")
+    ap.add_argument("--offset-ms", type=int, default=0, help="where speech starts in the episode (12000 with the intro)")
+    ap.add_argument("--json", action="store_true", help="print the timeline as JSON")
+    args = ap.parse_args()
+
+    files = []
+    for p in args.paths:
+        if os.path.isdir(p):
+            files += sorted(f for f in glob.glob(os.path.join(p, "[0-9][0-9][0-9][0-9].*")) if f.endswith((".mp3", ".pcm")))
+        else:
+            files.append(p)
+    if not files:
+        print("No audio files found")
+        sys.exit(1)
+
+    # .pcm chunks carry no header — take the rate from the pipeline config
+    with open("config/pipeline.json") as f:
+        pcm_format = (json.load(f).get("tts") or {}).get("output_format") or ""
+    if not pcm_format.startswith("pcm_"):
+        pcm_format = "pcm_24000"
+
+    chunks = []
+    for i, f in enumerate(files):
+        fmt = args.format or (pcm_format if f.endswith(".pcm") else "mp3_44100_128")
+        with open(f, "rb") as fh:
+            info = chunk_info(fh.read(), fmt)
+        stem = os.path.splitext(os.path.basename(f))[0]
+        chunks.append({"file": f, "line_index": int(stem) if stem.isdigit() else i, **info})
+
+    timeline = build_timeline(chunks, args.offset_ms)
+    if args.json:
+        print(json.dumps(timeline, indent=2))
+        return
+    print(f"{'file':<32}{'frames':>8}{'samples':>10}{'ms':>11}{'kbps':>8}{'start':>10}{'end':>10}")
+    for c, t in zip(sorted(chunks, key=lambda c: c["line_index"]), timeline):
+        frames = "—" if c["frames"] is None else c["frames"]
+        print(f"{os.path.basename(c['file']):<32}{frames:>8}{c['samples']:>10}{c['duration_ms']:>11.1f}"
+              f"{c['bitrate_kbps']:>8.0f}{t['start_ms']:>10}{t['end_ms']:>10}")
+    print(f"total {(timeline[-1]['end_ms'] - args.offset_ms) / 1000:.2f}s speech in {len(chunks)} chunk(s)")
+
+if __name__ == "__main__":
+    main()
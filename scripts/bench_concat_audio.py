@@ -0,0 +1,161 @@
+"""
+Benchmark: single-graph audio assembly (patch_audio_assembly.py), once per
+show-format.json → audio.normalize setting, vs the old two-pass Concatenate
+Audio commands, on real TTS chunks or synthetic ones.
+
+Usage (from repo root, needs ffmpeg and node on PATH):
+  python3 scripts/bench_concat_audio.py --synthetic 120          # generate 120 fake lines
+  python3 scripts/bench_concat_audio.py --chunks /path/to/chunks # a checkpoint dir (NNNN.mp3)
+  python3 scripts/bench_concat_audio.py --chunks DIR --intro assets/intro.mp3 --iterations 5
+  python3 scripts/bench_concat_audio.py --synthetic 120 --save scripts/bench_results/concat_audio.txt
+
+Columns: ms = median wall time over --iterations, encodes = lossy MP3
+generations in the output, I / LRA / TP = EBU R128 integrated loudness, range
+and true peak of the result (target: show-format.json → audio.loudness).
+"""
+import argparse, glob, json, os, re, statistics, subprocess, sys, tempfile, time
+from js_lib import JS_AUDIO_ASSEMBLY
+
+SYNTHETIC_DIR = "scripts/fixtures/tts"
+NORMALIZE_MODES = [False, "dynaudnorm", "loudnorm"]
+
+# Verbatim copy of the two ffmpeg passes from the old JS_CONCAT_AUDIO
+# (patch_editor.py), with ffmpeg taken from PATH
+def legacy_commands(list_file, intro, tts_file, out_file):
+    cmds = [
+        f'ffmpeg -y -f concat -safe 0 -i "{list_file}" -acodec libmp3lame -q:a 4 "{tts_file}"'
+    ]
+    if intro:
+        cmds.append(
+            f'ffmpeg -y -i "{intro}" -i "{tts_file}" '
+            f"-filter_complex \"[0:a]volume='if(lt(t,9),1,if(lt(t,12),0.8,if(lt(t,15),0.75-(t-12)/3*0.5,0.25)))':eval=frame[iv];"
+            f"[1:a]adelay=12000|12000[td];"
+            f"[iv][td]amix=inputs=2:duration=longest:normalize=0[out]\" "
+            f'-map "[out]" -acodec libmp3lame -q:a 4 "{out_file}"'
+        )
+    else:
+        cmds.append(f'cp "{tts_file}" "{out_file}"')
+    return cmds
+
+def graph_args(list_file, intro, out_file, normalize):
+    with open("config/show-format.json") as f:
+        show_format = json.load(f)
+    show_format.setdefault("audio", {})["normalize"] = normalize
+    script = JS_AUDIO_ASSEMBLY + (
+        "process.stdout.write(JSON.stringify(assemblyArgs("
+        f"{{ listFile: {json.dumps(list_file)}, introPath: {json.dumps(intro)}, outFile: {json.dumps(out_file)},"
+        f"   loudness: loudnessConfig({json.dumps(show_format)}) }})));"
+    )
+    return json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+
+def synthetic(n):
+    # Speech-ish mono clips: band-limited noise with a syllable-rate tremolo,
+    # alternating levels so loudness normalization has something to do
+    os.makedirs(SYNTHETIC_DIR, exist_ok=True)
+    for i in range(n):
+        out = os.path.join(SYNTHETIC_DIR, f"{i:04d}.mp3")
+        if os.path.exists(out):
+            continue
+        secs = 2 + (i * 7) % 9
+        gain = -6 if i % 2 else -18
+        subprocess.run([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:duration={secs}:sample_rate=44100",
+            "-af", f"bandpass=f=700:width_type=o:w=2,tremolo=f=4:d=0.7,volume={gain}dB",
+            "-ac", "1", "-acodec", "libmp3lame", "-b:a", "128k", out
+        ], check=True)
+    print(f"✓ {n} synthetic chunks in {SYNTHETIC_DIR}")
+    return SYNTHETIC_DIR
+
+def synthetic_intro(tmp):
+    out = os.path.join(tmp, "intro.mp3")
+    subprocess.run([
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", "sine=frequency=220:duration=30",
+        "-f", "lavfi", "-i", "sine=frequency=330:duration=30",
+        "-filter_complex", "[0][1]amerge=inputs=2,volume=-8dB",
+        "-acodec", "libmp3lame", "-b:a", "192k", out
+    ], check=True)
+    return out
+
+def loudness(path):
+    err = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", path, "-af", "ebur128=peak=true", "-f", "null", "-"],
+        capture_output=True, text=True
+    ).stderr
+    summary = err[err.rfind("Summary:"):]
+    def pick(pattern):
+        m = re.search(pattern, summary)
+        return float(m.group(1)) if m else float("nan")
+    return {
+        "I":   pick(r"I:\s+(-?[\d.]+|-inf) LUFS"),
+        "LRA": pick(r"LRA:\s+(-?[\d.]+) LU"),
+        "TP":  pick(r"True peak:\s+Peak:\s+(-?[\d.]+|-inf) dBFS")
+    }
+
+def timed(run, iterations):
+    times = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", help="directory of per-line MP3s (NNNN.mp3)")
+    ap.add_argument("--synthetic", type=int, metavar="N", help="generate N synthetic line MP3s")
+    ap.add_argument("--intro", default="assets/intro.mp3" if os.path.exists("assets/intro.mp3") else None,
+                    help="intro bed (default assets/intro.mp3; a synthetic bed when missing)")
+    ap.add_argument("--iterations", type=int, default=3)
+    ap.add_argument("--save", metavar="FILE", help="also write the command, setup and table to FILE")
+    args = ap.parse_args()
+
+    chunk_dir = synthetic(args.synthetic) if args.synthetic else args.chunks
+    if not chunk_dir:
+        print("Pass --chunks DIR or --synthetic N")
+        sys.exit(1)
+    chunks = sorted(glob.glob(os.path.join(chunk_dir, "[0-9][0-9][0-9][0-9].mp3")))
+    if not chunks:
+        print(f"No NNNN.mp3 chunks in {chunk_dir}")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        intro = os.path.abspath(args.intro) if args.intro else synthetic_intro(tmp)
+        list_file = os.path.join(tmp, "list.txt")
+        with open(list_file, "w") as f:
+            f.write("\n".join(f"file '{os.path.abspath(c)}'" for c in chunks))
+
+        legacy_out = os.path.join(tmp, "legacy.mp3")
+        cmds = legacy_commands(list_file, intro, os.path.join(tmp, "tts_all.mp3"), legacy_out)
+
+        def run_legacy():
+            for c in cmds:
+                subprocess.run(c, shell=True, check=True, capture_output=True)
+
+        header = f"→ {len(chunks)} chunks, intro {os.path.basename(intro)}, {args.iterations} iteration(s)"
+        print(header)
+        rows = [("two-pass (old)", timed(run_legacy, args.iterations), 2, loudness(legacy_out), os.path.getsize(legacy_out))]
+        for mode in NORMALIZE_MODES:
+            out  = os.path.join(tmp, f"graph-{mode or 'off'}.mp3")
+            argv = ["ffmpeg"] + graph_args(list_file, intro, out, mode)
+            ms   = timed(lambda: subprocess.run(argv, check=True, capture_output=True), args.iterations)
+            rows.append((f"graph, {mode or 'no'} norm", ms, 1, loudness(out), os.path.getsize(out)))
+
+    lines = [f"{'path':<22}{'ms':>10}{'encodes':>9}{'I LUFS':>9}{'LRA':>7}{'TP dBFS':>9}{'KB':>9}{'vs old':>8}"]
+    for name, ms, encodes, l, size in rows:
+        lines.append(f"{name:<22}{ms:>10.0f}{encodes:>9}{l['I']:>9.1f}{l['LRA']:>7.1f}{l['TP']:>9.1f}"
+                     f"{size / 1024:>9.0f}{rows[0][1] / ms:>7.2f}x")
+    print("\n".join(lines))
+
+    if args.save:
+        version = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.splitlines()[0]
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            f.write(f"$ python3 scripts/bench_concat_audio.py {' '.join(sys.argv[1:])}\n")
+            f.write(f"{version}; {os.cpu_count()} CPU; {time.strftime('%Y-%m-%d')}\n")
+            f.write(f"{header}\n\n" + "\n".join(lines) + "\n")
+        print(f"✓ Saved {args.save}")
+
+if __name__ == "__main__":
+    main()
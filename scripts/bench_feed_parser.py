@@ -0,0 +1,162 @@
+"""
+Micro-benchmark: streaming feed parser (JS_FEED_PARSER in js_lib.py) vs the old
+per-tag RegExp parseRss, on recorded feed fixtures.
+
+Usage (from repo root, needs node on PATH):
+  python3 scripts/bench_feed_parser.py --record          # save current feeds to scripts/fixtures/feeds/
+  python3 scripts/bench_feed_parser.py                   # benchmark every fixture
+  python3 scripts/bench_feed_parser.py --iterations 500
+  python3 scripts/bench_feed_parser.py --synthetic 2000  # add a generated 2000-item fixture
+
+Columns: regex = old parseRss, stream = new parser on the whole body,
+stream+stop = new parser with the 36h early stop (what ingest actually runs).
+"""
+import argparse, glob, json, os, subprocess, sys, tempfile, time
+import urllib.request
+from email.utils import formatdate
+from js_lib import JS_FEED_PARSER
+
+FIXTURES_DIR = "scripts/fixtures/feeds"
+MAX_AGE_MS   = 36 * 3600 * 1000
+
+# Verbatim copy of parseRss from patch_ingest_feed_cache.py (the old parser)
+JS_LEGACY_PARSER = r"""
+function parseRss(xml) {
+  const items = [];
+  const itemRe = /<item>([\s\S]*?)<\/item>/g;
+  let m;
+  while ((m = itemRe.exec(xml)) !== null) {
+    const block = m[1];
+    const get = (tag) => {
+      const r = new RegExp(
+        `<${tag}[^>]*><!\\[CDATA\\[([\\s\\S]*?)\\]\\]></${tag}>|<${tag}[^>]*>([\\s\\S]*?)</${tag}>`
+      ).exec(block);
+      return r ? (r[1] || r[2] || '').trim() : '';
+    };
+    const pubDate = get('pubDate');
+    const rawLink = get('link') || get('guid');
+    const link = (rawLink.match(/https?:\/\/[^\s<"]+/) || [rawLink])[0];
+    items.push({
+      title: get('title'),
+      link,
+      description: get('description').replace(/<[^>]+>/g, '').substring(0, 400),
+      published: pubDate ? new Date(pubDate).getTime() : Date.now(),
+      score: parseInt(get('score') || '0', 10)
+    });
+  }
+  return items;
+}
+"""
+
+JS_BENCH = r"""
+const fs = require('fs');
+const [fixturesJson, iterations, maxAgeMs] = process.argv.slice(2);
+const fixtures = JSON.parse(fs.readFileSync(fixturesJson, 'utf8'));
+const cutoff   = Date.now() - Number(maxAgeMs);
+
+function time(fn) {
+  for (let i = 0; i < 5; i++) fn();                 // warm-up
+  const t0 = process.hrtime.bigint();
+  let out;
+  for (let i = 0; i < Number(iterations); i++) out = fn();
+  return { ms: Number(process.hrtime.bigint() - t0) / 1e6 / Number(iterations), out };
+}
+
+const rows = fixtures.map(file => {
+  const xml    = fs.readFileSync(file, 'utf8');
+  const legacy = time(() => parseRss(xml));
+  const stream = time(() => parseFeed(xml, { staleRun: 0 }));
+  const stop   = time(() => parseFeed(xml, { cutoff, staleRun: 3 }));
+  const a = new Set(legacy.out.map(i => i.link));
+  const b = new Set(stream.out.map(i => i.link));
+  return {
+    file, bytes: Buffer.byteLength(xml),
+    regex_items: legacy.out.length, stream_items: stream.out.length, stop_items: stop.out.length,
+    regex_ms: legacy.ms, stream_ms: stream.ms, stop_ms: stop.ms,
+    links_match: a.size === b.size && [...a].every(l => b.has(l))
+  };
+});
+console.log(JSON.stringify(rows));
+"""
+
+def slug(name):
+    return "".join(c if c.isalnum() else "-" for c in name.lower()).strip("-")
+
+def record():
+    with open("config/sources.json") as f:
+        data = json.load(f)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for s in data["sources"] + data.get("rotation_pool", []):
+        if not s.get("rss"):
+            continue
+        print(f"→ Recording {s['name']:<28} ", end="", flush=True)
+        req = urllib.request.Request(s["rss"], headers={
+            "User-Agent": "Mozilla/5.0 (compatible; CircuitBreakers/1.0; +https://github.com/msangui/podcast)"
+        })
+        try:
+            with urllib.request.urlopen(req, timeout=15) as r:
+                body = r.read()
+        except Exception as e:
+            print(f"✗ {e}")
+            continue
+        out = os.path.join(FIXTURES_DIR, f"{slug(s['name'])}.xml")
+        with open(out, "wb") as f:
+            f.write(body)
+        print(f"✓ {len(body):,} bytes → {out}")
+
+def synthetic(n):
+    # Newest-first, one item per 20 minutes — most fall outside the 36h window
+    now = time.time()
+    items = []
+    for i in range(n):
+        items.append(
+            f"<item><title><![CDATA[Synthetic story {i}: model release & agents]]></title>"
+            f"<link>https://example.com/story/{i}</link><guid isPermaLink=\"false\">s-{i}</guid>"
+            f"<description><![CDATA[<p>Paragraph {i} about LLM agents.</p>{'<span>filler</span>' * 20}]]></description>"
+            f"<pubDate>{formatdate(now - i * 1200, usegmt=True)}</pubDate></item>"
+        )
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    out = os.path.join(FIXTURES_DIR, f"synthetic-{n}.xml")
+    with open(out, "w") as f:
+        f.write(f"<?xml version=\"1.0\"?><rss version=\"2.0\"><channel><title>Synthetic</title>{''.join(items)}</channel></rss>")
+    print(f"✓ Wrote {out}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--record", action="store_true", help="download current feeds into the fixtures dir")
+    ap.add_argument("--synthetic", type=int, metavar="N", help="generate an N-item RSS fixture")
+    ap.add_argument("--iterations", type=int, default=200)
+    args = ap.parse_args()
+
+    if args.record:
+        record()
+    if args.synthetic:
+        synthetic(args.synthetic)
+
+    fixtures = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.xml")))
+    if not fixtures:
+        print(f"No fixtures in {FIXTURES_DIR} — run with --record or --synthetic N first")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "bench.js")
+        with open(script, "w") as f:
+            f.write(JS_FEED_PARSER + JS_LEGACY_PARSER + JS_BENCH)
+        listing = os.path.join(tmp, "fixtures.json")
+        with open(listing, "w") as f:
+            json.dump([os.path.abspath(p) for p in fixtures], f)
+        out  = subprocess.run(["node", script, listing, str(args.iterations), str(MAX_AGE_MS)],
+                              capture_output=True, text=True, check=True).stdout
+        rows = json.loads(out)
+
+    print(f"{'fixture':<32}{'KB':>8}{'items r/s/s+':>16}{'regex ms':>11}{'stream ms':>11}"
+          f"{'stream+stop':>13}{'speedup':>9}  links")
+    for r in rows:
+        speedup = r["regex_ms"] / r["stop_ms"] if r["stop_ms"] else float("inf")
+        counts  = f"{r['regex_items']}/{r['stream_items']}/{r['stop_items']}"
+        print(f"{os.path.basename(r['file']):<32}{r['bytes'] / 1024:>8.1f}{counts:>16}"
+              f"{r['regex_ms']:>11.3f}{r['stream_ms']:>11.3f}{r['stop_ms']:>13.3f}"
+              f"{speedup:>8.1f}x  {'=' if r['links_match'] else '≠'}")
+
+if __name__ == "__main__":
+    main()
@@ -387,6 +387,18 @@ workflow = {
             "typeVersion": 4.2,
             "position": [460, 300]
         },
+        # 2b – Fetch pipeline.json (ingest, history, TTS, … settings) from GitHub
+        {
+            "parameters": {
+                "url": "={{ $env.GITHUB_RAW_BASE_URL }}/config/pipeline.json",
+                "options": {"response": {"response": {"responseFormat": "json"}}}
+            },
+            "id": "fetch-pipeline",
+            "name": "Fetch pipeline.json",
+            "type": "n8n-nodes-base.httpRequest",
+            "typeVersion": 4.2,
+            "position": [570, 460]
+        },
         # 3 – Fetch show-format.json from GitHub
         {
             "parameters": {
@@ -637,7 +649,8 @@ workflow = {
     ],
     "connections": {
         "Daily Schedule":          {"main": [[{"node": "Fetch sources.json",      "type": "main", "index": 0}]]},
-        "Fetch sources.json":      {"main": [[{"node": "Fetch show-format.json",  "type": "main", "index": 0}]]},
+        "Fetch sources.json":      {"main": [[{"node": "Fetch pipeline.json",     "type": "main", "index": 0}]]},
+        "Fetch pipeline.json":     {"main": [[{"node": "Fetch show-format.json",  "type": "main", "index": 0}]]},
         "Fetch show-format.json":  {"main": [[{"node": "Ingest & Filter News",    "type": "main", "index": 0}]]},
         "Ingest & Filter News":    {"main": [[{"node": "Fetch Curator Prompt",    "type": "main", "index": 0}]]},
         "Fetch Curator Prompt":    {"main": [[{"node": "Build Curator Input",     "type": "main", "index": 0}]]},
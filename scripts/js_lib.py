@@ -0,0 +1,1558 @@
+"""
+Shared JavaScript helpers for the Code nodes. n8n Code nodes cannot require
+each other, so every node that needs a helper gets its source prepended; this
+module is the one copy the patch scripts (and the benchmarks) import:
+
+    from js_lib import JS_STORY_INDEX, JS_ARTIFACTS
+
+Each constant is plain JS with no Python-side state. Some build on others —
+JS_TTS_CACHE / JS_TTS_CHECKPOINT use ttsFormat() from JS_TTS, JS_INTRO_BED and
+JS_STREAM_ENCODER use spawnFfmpeg() from JS_FFMPEG_RUNNER — so concatenate
+them in that order. Changes here reach a node the next time a patch script
+that embeds it is run.
+"""
+
+
+# ── Bounded-concurrency map ───────────────────────────────────────────────────
+# mapConcurrent(list, max, perHost, hostOf, fn) → results in input order; a
+# call that throws leaves { error } in its slot. Ingest fetches feeds with it,
+# the editor fans segment reviews out over it with a single "host".
+JS_MAP_CONCURRENT = r"""
+// Run fn over list with at most `max` calls in flight overall and at most
+// `perHost` per hostname. Results keep the input order.
+function mapConcurrent(list, max, perHost, hostOf, fn) {
+  const results    = new Array(list.length);
+  const pending    = list.map((_, i) => i);
+  const hostActive = {};
+  let active = 0;
+  return new Promise((resolve) => {
+    const pump = () => {
+      if (pending.length === 0 && active === 0) return resolve(results);
+      for (let k = 0; k < pending.length && active < max; ) {
+        const i    = pending[k];
+        const host = hostOf(list[i]);
+        if ((hostActive[host] || 0) >= perHost) { k++; continue; }
+        pending.splice(k, 1);
+        active++;
+        hostActive[host] = (hostActive[host] || 0) + 1;
+        Promise.resolve()
+          .then(() => fn(list[i], i))
+          .then(r => { results[i] = r; }, e => { results[i] = { error: e }; })
+          .finally(() => { active--; hostActive[host]--; pump(); });
+      }
+    };
+    pump();
+  });
+}
+"""
+
+# ── Streaming feed parser (also used by scripts/bench_feed_parser.py) ─────────
+# new FeedParser({ cutoff, staleRun }) → write(text) per chunk → end() → items.
+# Input is cut at the last complete </item> / </entry> so every scan starts on
+# an item boundary; `done` flips once the stale run is reached.
+JS_FEED_PARSER = r"""
+const FEED_TOKEN_RE = /<!\[CDATA\[([\s\S]*?)\]\]>|<!--[\s\S]*?-->|<[?!][^>]*>|<(\/?)([A-Za-z_][\w:.-]*)([^>]*?)(\/?)>/g;
+const FEED_HREF_RE  = /\bhref\s*=\s*(?:"([^"]*)"|'([^']*)')/;
+const FEED_REL_RE   = /\brel\s*=\s*(?:"([^"]*)"|'([^']*)')/;
+const FEED_ENTITY_RE = /&(#[xX][0-9a-fA-F]+|#\d+|amp|lt|gt|quot|apos);/g;
+const FEED_TAG_RE   = /<[^>]+>/g;
+const FEED_URL_RE   = /https?:\/\/[^\s<"]+/;
+const FEED_ENTITIES = { amp: '&', lt: '<', gt: '>', quot: '"', apos: "'" };
+const FEED_ITEM_TAGS = { item: true, entry: true };
+const FEED_CUT_RE   = /<!\[CDATA\[|<!--|<\/(?:item|entry)\s*>/g;
+const FEED_FIELDS = {
+  title: 'title', link: 'link', guid: 'guid', id: 'guid',
+  description: 'description', summary: 'summary',
+  'content:encoded': 'content', content: 'content',
+  pubDate: 'date', published: 'date', 'dc:date': 'date', updated: 'updated',
+  score: 'score'
+};
+
+function decodeXml(s) {
+  if (s.indexOf('&') === -1) return s;
+  return s.replace(FEED_ENTITY_RE, (_, e) => {
+    if (e[0] !== '#') return FEED_ENTITIES[e];
+    const code = (e[1] === 'x' || e[1] === 'X') ? parseInt(e.slice(2), 16) : parseInt(e.slice(1), 10);
+    try { return String.fromCodePoint(code); } catch (err) { return ''; }
+  });
+}
+
+class FeedParser {
+  constructor(opts) {
+    opts = opts || {};
+    this.cutoff   = opts.cutoff || 0;
+    this.staleRun = opts.staleRun === undefined ? 3 : opts.staleRun;
+    this.items    = [];
+    this.pending  = '';
+    this.checked  = 0;    // pending[0, checked) holds no open CDATA/comment
+    this.stale    = 0;
+    this.done     = false;
+  }
+
+  write(text) {
+    if (this.done) return;
+    this.pending += text;
+    const end = this._cutIndex();
+    if (end === -1) return;
+    this._scan(this.pending.slice(0, end));
+    this.pending = this.pending.slice(end);
+    this.checked -= end;
+  }
+
+  // End of the last </item> / </entry> that is markup — not text inside a
+  // CDATA section or comment. An unterminated section, or an opener split
+  // across chunks ('<![CDA' + 'TA['), stays unchecked until more text arrives.
+  _cutIndex() {
+    const s = this.pending, re = FEED_CUT_RE;
+    let pos = this.checked, cut = -1, m;
+    re.lastIndex = pos;
+    while ((m = re.exec(s)) !== null) {
+      if (m[0][1] === '/') { cut = pos = re.lastIndex; continue; }
+      const close = s.indexOf(m[0] === '<!--' ? '-->' : ']]>', re.lastIndex);
+      if (close === -1) { pos = m.index; break; }
+      pos = re.lastIndex = close + 3;
+    }
+    // '<![CDATA[' is the longest token: a partial one fits in the last 8 chars
+    this.checked = m === null ? Math.max(pos, s.length - 8) : pos;
+    return cut;
+  }
+
+  end() {
+    if (!this.done && this.pending) this._scan(this.pending);
+    this.pending = '';
+    this.checked = 0;
+    return this.items;
+  }
+
+  _scan(xml) {
+    const re = FEED_TOKEN_RE;
+    re.lastIndex = 0;
+    let item = null, field = null, depth = 0, buf = '', last = 0, m;
+    while ((m = re.exec(xml)) !== null) {
+      if (field !== null) {
+        if (m.index > last) buf += decodeXml(xml.slice(last, m.index));
+        if (m[1] !== undefined) buf += m[1];
+      }
+      last = re.lastIndex;
+      const name = m[3];
+      if (name === undefined) continue;          // CDATA, comment, PI, doctype
+      const closing     = m[2] === '/';
+      const selfClosing = m[5] === '/';
+
+      if (item === null) {
+        if (!closing && !selfClosing && FEED_ITEM_TAGS[name]) { item = {}; depth = 0; }
+        continue;
+      }
+      if (closing) {
+        if (depth === 0) {
+          if (FEED_ITEM_TAGS[name]) {
+            if (this._finish(item)) return;
+            item = null;
+          }
+          continue;
+        }
+        depth--;
+        if (depth === 0 && field !== null) {
+          if (item[field] === undefined) item[field] = buf.trim();
+          field = null;
+        }
+        continue;
+      }
+      if (depth === 0) {
+        const key = FEED_FIELDS[name];
+        if (key === 'link' && FEED_HREF_RE.test(m[4])) {
+          // Atom: <link rel="alternate" href="..."/>
+          const href = FEED_HREF_RE.exec(m[4]);
+          const rel  = FEED_REL_RE.exec(m[4]);
+          const relv = rel ? (rel[1] || rel[2]) : 'alternate';
+          if (item.link === undefined && relv === 'alternate') item.link = decodeXml(href[1] || href[2] || '');
+        } else if (key && !selfClosing && item[key] === undefined) {
+          field = key;
+          buf   = '';
+        }
+      }
+      if (!selfClosing) depth++;
+    }
+  }
+
+  // Returns true when parsing should stop (stale run reached)
+  _finish(item) {
+    const dateStr   = item.date || item.updated || '';
+    const published = dateStr ? new Date(dateStr).getTime() : Date.now();
+    if (this.cutoff && published < this.cutoff) {
+      if (this.staleRun && ++this.stale >= this.staleRun) this.done = true;
+      return this.done;
+    }
+    this.stale = 0;
+    const rawLink = item.link || item.guid || '';
+    this.items.push({
+      title:       (item.title || '').replace(FEED_TAG_RE, '').trim(),
+      link:        (rawLink.match(FEED_URL_RE) || [rawLink])[0],
+      description: (item.description || item.summary || item.content || '')
+                     .replace(FEED_TAG_RE, '').trim().substring(0, 400),
+      published,
+      score:       parseInt(item.score || '0', 10)
+    });
+    return false;
+  }
+}
+
+function parseFeed(xml, opts) {
+  const parser = new FeedParser(opts);
+  parser.write(xml);
+  return parser.end();
+}
+"""
+
+# ── Canonical URL + story index helpers ───────────────────────────────────────
+JS_STORY_INDEX = r"""
+const TRACKING_PARAM_RE = /^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|ref|ref_src|ref_url|cmpid|ncid|guccounter|guce_referrer|guce_referrer_sig|_hsenc|_hsmi|mkt_tok|oly_anon_id|oly_enc_id|sr_share|smid)$/i;
+
+function canonicalUrl(raw) {
+  if (!raw) return '';
+  let u;
+  try { u = new URL(String(raw).trim()); } catch (e) { return String(raw).trim(); }
+  if (u.protocol !== 'http:' && u.protocol !== 'https:') return u.toString();
+  const host = u.hostname.toLowerCase().replace(/^(www|m|amp)\./, '');
+  let p = u.pathname.replace(/\/{2,}/g, '/').replace(/\/(amp|index\.html?)\/?$/i, '/');
+  if (p.length > 1) p = p.replace(/\/+$/, '');
+  const params = [...u.searchParams]
+    .filter(([k]) => !TRACKING_PARAM_RE.test(k))
+    .sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0));
+  const query = params.length
+    ? '?' + params.map(([k, v]) => `${encodeURIComponent(k)}=${encodeURIComponent(v)}`).join('&')
+    : '';
+  return `https://${host}${u.port ? ':' + u.port : ''}${p === '/' ? '' : p}${query}`;
+}
+
+function storyIndexConfig(cfg) {
+  cfg = cfg || {};
+  return {
+    indexPath:  cfg.index_path  || '/logs/index/covered-urls.json',
+    windowDays: cfg.window_days || 7,
+    retainDays: Math.max(cfg.retain_days || 30, cfg.window_days || 7)
+  };
+}
+
+function daysAgo(n) {
+  return new Date(Date.now() - n * 86400000).toISOString().split('T')[0];
+}
+
+function saveStoryIndex(cfg, index) {
+  const fs   = require('fs');
+  const path = require('path');
+  const { indexPath, retainDays } = storyIndexConfig(cfg);
+  const keepFrom = daysAgo(retainDays);
+  for (const [url, e] of Object.entries(index.urls)) if (!(e.date >= keepFrom)) delete index.urls[url];
+  index.updated_at = new Date().toISOString();
+  fs.mkdirSync(path.dirname(indexPath), { recursive: true });
+  fs.writeFileSync(`${indexPath}.tmp`, JSON.stringify(index));
+  fs.renameSync(`${indexPath}.tmp`, indexPath);
+}
+
+// One-time bootstrap from the per-day run logs written before the index existed
+function migrateStoryIndex() {
+  const fs    = require('fs');
+  const index = { version: 1, urls: {} };
+  let files = [];
+  try { files = fs.readdirSync('/logs').filter(f => /^\d{4}-\d{2}-\d{2}\.json$/.test(f)).sort(); } catch (e) {}
+  for (const file of files) {
+    try {
+      const log = JSON.parse(fs.readFileSync(`/logs/${file}`, 'utf8'));
+      for (const url of log.covered_urls || []) {
+        index.urls[canonicalUrl(url)] = { date: file.replace('.json', ''), title: null };
+      }
+    } catch (e) {}
+  }
+  return index;
+}
+
+// Returns { index, covered } — covered is a Map of canonical URL → entry for
+// everything aired inside the history window
+function loadStoryIndex(cfg) {
+  const fs = require('fs');
+  const { indexPath, windowDays } = storyIndexConfig(cfg);
+  let index = null;
+  try { index = JSON.parse(fs.readFileSync(indexPath, 'utf8')); } catch (e) {}
+  if (!index || !index.urls) {
+    index = migrateStoryIndex();
+    try { saveStoryIndex(cfg, index); } catch (e) { console.error('Story index write failed:', e.message); }
+  }
+  // Entries dated today were written by an earlier run of this same episode
+  const from    = daysAgo(windowDays), today = daysAgo(0);
+  const covered = new Map();
+  for (const [url, e] of Object.entries(index.urls)) if (e.date >= from && e.date < today) covered.set(url, e);
+  return { index, covered };
+}
+"""
+
+# ── Prompt encoding + measurement helpers ─────────────────────────────────────
+# Modes (show-format.json → prompt_encoding.<agent>):
+#   pretty   — JSON.stringify(v, null, 2), the original format
+#   compact  — minified JSON
+#   columnar — arrays of objects become a header row + tab-separated records;
+#              everything else is minified JSON
+JS_PROMPT_ENCODING = r"""
+const ENCODING_MODES = ['pretty', 'compact', 'columnar'];
+
+function promptEncoding(showFormat, agent) {
+  const mode = ((showFormat.prompt_encoding || {})[agent] || 'pretty').toLowerCase();
+  return ENCODING_MODES.includes(mode) ? mode : 'pretty';
+}
+
+function isTable(v) {
+  return Array.isArray(v) && v.length > 0 &&
+    v.every(r => r && typeof r === 'object' && !Array.isArray(r));
+}
+
+function tableCell(v) {
+  if (v === null || v === undefined) return '';
+  if (Array.isArray(v) && v.every(x => typeof x !== 'object')) return v.join('; ');
+  const s = typeof v === 'object' ? JSON.stringify(v) : String(v);
+  return s.replace(/[\t\r\n]+/g, ' ');
+}
+
+function encodeTable(rows) {
+  const columns = [];
+  for (const r of rows) for (const k of Object.keys(r)) if (!columns.includes(k)) columns.push(k);
+  return [columns.join('\t'), ...rows.map(r => columns.map(c => tableCell(r[c])).join('\t'))].join('\n');
+}
+
+function encodeValue(value, mode) {
+  if (mode === 'pretty')  return JSON.stringify(value, null, 2);
+  if (mode === 'compact') return JSON.stringify(value);
+  if (isTable(value)) return encodeTable(value);
+  if (value && typeof value === 'object' && !Array.isArray(value)) {
+    // Lift nested tables out of the object so they get the columnar treatment too
+    const rest = {}, tables = [];
+    for (const [k, v] of Object.entries(value)) {
+      if (isTable(v)) tables.push([k, v]); else rest[k] = v;
+    }
+    if (!tables.length) return JSON.stringify(value);
+    return [
+      JSON.stringify(rest),
+      ...tables.map(([k, v]) => `${k} (${v.length} rows, tab-separated, header first):\n${encodeTable(v)}`)
+    ].join('\n');
+  }
+  return JSON.stringify(value);
+}
+
+// Measurement hook — chars and ~tokens (chars / 4) per prompt section
+function measurePrompt(agent, mode, system, user, sections) {
+  const size = text => ({ chars: text.length, est_tokens: Math.ceil(text.length / 4) });
+  return {
+    agent,
+    encoding: mode,
+    system:   size(system),
+    user:     size(user),
+    sections: Object.fromEntries(Object.entries(sections).map(([k, t]) => [k, size(t)]))
+  };
+}
+"""
+
+# ── Claude client + response cache ────────────────────────────────────────────
+# Key = sha256(model, system, messages, max_tokens). One JSON file per response
+# under claude_cache.dir; mtime is bumped on every hit so size-based eviction
+# drops the least recently used entries first.
+# Only complete replies (stop_reason 'end_turn') are stored, and a Parse node
+# that rejects a reply drops it with dropClaudeCache(key), so a truncated or
+# malformed response is never replayed into every rerun of the day.
+# Policy (first match wins): 'Rerun Trigger' input claude_cache_policy → $env
+# CLAUDE_CACHE_POLICY → pipeline.json claude_cache.policy → 'reuse'. Ingest &
+# Filter News follows the same policy for the day's feed snapshot, so a
+# same-day rerun sends identical prompts.
+#   reuse   — return the stored response if present, else call and store
+#   refresh — always call, overwrite the stored response
+#   bypass  — always call, never read or write the cache
+JS_CLAUDE_CLIENT = r"""
+const CLAUDE_CACHE_POLICIES = ['reuse', 'refresh', 'bypass'];
+
+function claudeCacheConfig() {
+  let cfg = {};
+  try { cfg = $('Fetch pipeline.json').first().json.claude_cache || {}; } catch (e) {}
+  let policy = cfg.policy || 'reuse';
+  if ($env.CLAUDE_CACHE_POLICY) policy = $env.CLAUDE_CACHE_POLICY;
+  // Per-run override; the Rerun Trigger hasn't run on a scheduled execution
+  try { policy = $('Rerun Trigger').first().json.claude_cache_policy || policy; } catch (e) {}
+  policy = String(policy).toLowerCase();
+  return {
+    dir:       cfg.dir || '/logs/cache/claude',
+    max_bytes: (cfg.max_mb ?? 200) * 1024 * 1024,
+    policy:    CLAUDE_CACHE_POLICIES.includes(policy) ? policy : 'reuse'
+  };
+}
+
+function claudeCacheKey(body) {
+  return require('crypto').createHash('sha256').update(JSON.stringify({
+    model:      body.model,
+    system:     body.system,
+    messages:   body.messages,
+    max_tokens: body.max_tokens
+  })).digest('hex');
+}
+
+function evictClaudeCache(cfg) {
+  const fs = require('fs'), path = require('path');
+  const entries = fs.readdirSync(cfg.dir)
+    .filter(f => f.endsWith('.json'))
+    .map(f => { const p = path.join(cfg.dir, f); const st = fs.statSync(p); return { p, size: st.size, mtime: st.mtimeMs }; })
+    .sort((a, b) => a.mtime - b.mtime);
+  let total = entries.reduce((a, e) => a + e.size, 0);
+  let evicted = 0;
+  for (const e of entries) {
+    if (total <= cfg.max_bytes) break;
+    try { fs.unlinkSync(e.p); total -= e.size; evicted++; } catch (err) {}
+  }
+  return evicted;
+}
+
+function postClaude(body) {
+  const https   = require('https');
+  const payload = JSON.stringify(body);
+  return new Promise((resolve, reject) => {
+    const req = https.request({
+      hostname: 'api.anthropic.com',
+      path:     '/v1/messages',
+      method:   'POST',
+      headers: {
+        'x-api-key':         $env.ANTHROPIC_API_KEY,
+        'anthropic-version': '2023-06-01',
+        'Content-Type':      'application/json',
+        'Content-Length':    Buffer.byteLength(payload)
+      }
+    }, res => {
+      let d = '';
+      res.on('data', c => d += c);
+      res.on('end', () => {
+        if (res.statusCode >= 200 && res.statusCode < 300) resolve(JSON.parse(d));
+        else reject(new Error(`Anthropic HTTP ${res.statusCode}: ${d}`));
+      });
+    });
+    req.on('error', reject);
+    req.write(payload);
+    req.end();
+  });
+}
+
+// Returns { response, cache: 'hit' | 'miss' | 'refresh' | 'bypass', key }.
+// `call` does the actual request (postClaude, or streamClaude for the writer).
+async function cachedClaude(body, call = postClaude) {
+  const fs  = require('fs');
+  const cfg = claudeCacheConfig();
+  const key = claudeCacheKey(body);
+  const file = `${cfg.dir}/${key}.json`;
+
+  if (cfg.policy === 'reuse') {
+    try {
+      const response = JSON.parse(fs.readFileSync(file, 'utf8'));
+      const now = new Date();
+      try { fs.utimesSync(file, now, now); } catch (e) {}
+      return { response, cache: 'hit', key };
+    } catch (e) {}
+  }
+
+  const response = await call(body);
+  if (cfg.policy !== 'bypass' && response.stop_reason !== 'end_turn') {
+    // max_tokens, a cut-off stream, ...: never store it, and drop what a
+    // refresh was meant to replace
+    console.error(`Claude response not cached: stop_reason ${response.stop_reason}`);
+    try { fs.unlinkSync(file); } catch (e) {}
+  } else if (cfg.policy !== 'bypass') {
+    try {
+      fs.mkdirSync(cfg.dir, { recursive: true });
+      const tmp = `${file}.${process.pid}.tmp`;
+      fs.writeFileSync(tmp, JSON.stringify(response));
+      fs.renameSync(tmp, file);
+      evictClaudeCache(cfg);
+    } catch (e) {
+      console.error('Claude cache write failed:', e.message);
+    }
+  }
+  return { response, cache: cfg.policy === 'reuse' ? 'miss' : cfg.policy, key };
+}
+
+// Called by the node that parses a reply when it rejects it, so the next run
+// asks Claude again instead of replaying the same unusable response.
+function dropClaudeCache(key) {
+  if (!key) return;
+  try { require('fs').unlinkSync(`${claudeCacheConfig().dir}/${key}.json`); } catch (e) {}
+}
+"""
+
+# ── Streaming Messages API call (SSE) ─────────────────────────────────────────
+# Resolves to the same shape as a non-streaming response so the cache and the
+# Parse Writer Response node don't care which path produced it.
+JS_CLAUDE_STREAM = r"""
+function streamClaude(body, onText) {
+  const https   = require('https');
+  const payload = JSON.stringify({ ...body, stream: true });
+  return new Promise((resolve, reject) => {
+    const req = https.request({
+      hostname: 'api.anthropic.com',
+      path:     '/v1/messages',
+      method:   'POST',
+      headers: {
+        'x-api-key':         $env.ANTHROPIC_API_KEY,
+        'anthropic-version': '2023-06-01',
+        'Content-Type':      'application/json',
+        'Content-Length':    Buffer.byteLength(payload)
+      }
+    }, res => {
+      if (res.statusCode < 200 || res.statusCode >= 300) {
+        let d = '';
+        res.on('data', c => d += c);
+        res.on('end', () => reject(new Error(`Anthropic HTTP ${res.statusCode}: ${d}`)));
+        return;
+      }
+      res.setEncoding('utf8');
+      let buf = '', message = {}, text = '', stopReason = null, usage = {}, streamError = null;
+
+      const handle = evt => {
+        if (evt.type === 'message_start') {
+          message = evt.message || {};
+          usage   = { ...(message.usage || {}) };
+        } else if (evt.type === 'content_block_delta' && evt.delta.type === 'text_delta') {
+          text += evt.delta.text;
+          onText(evt.delta.text);
+        } else if (evt.type === 'message_delta') {
+          stopReason = evt.delta.stop_reason || stopReason;
+          Object.assign(usage, evt.usage || {});
+        } else if (evt.type === 'error') {
+          streamError = new Error(`Anthropic stream error: ${(evt.error || {}).message || 'unknown'}`);
+        }
+      };
+
+      res.on('data', chunk => {
+        buf += chunk.replace(/\r\n/g, '\n');
+        let i;
+        while ((i = buf.indexOf('\n\n')) !== -1) {
+          const frame = buf.slice(0, i);
+          buf = buf.slice(i + 2);
+          const data = frame.split('\n').filter(l => l.startsWith('data:')).map(l => l.slice(5).trim()).join('');
+          if (data) handle(JSON.parse(data));
+        }
+      });
+      res.on('end', () => {
+        if (streamError) return reject(streamError);
+        resolve({ ...message, content: [{ type: 'text', text }], stop_reason: stopReason, usage });
+      });
+      res.on('error', reject);
+    });
+    req.on('error', reject);
+    req.write(payload);
+    req.end();
+  });
+}
+"""
+
+# ── Editor line patches ───────────────────────────────────────────────────────
+# The editor answers in patch mode with { patches: [{ line, op, text, reason }] }
+# addressed by the 1-based numbers it was shown; every Editor Review variant
+# parses and applies them through these.
+JS_EDITOR_PATCHES = r"""
+function parseReview(response) {
+  const text = response.content[0].text.trim();
+  return JSON.parse(text.replace(/^```json\s*/, '').replace(/\s*```$/, ''));
+}
+
+// Applies patches to lines[start..end) and returns that range's new lines.
+// Throws on anything we can't apply safely — the caller falls back to a full rewrite
+function applyPatches(lines, patches, start = 0, end = lines.length) {
+  if (!Array.isArray(patches)) throw new Error('patches is not an array');
+  const byLine = new Map();
+  for (const p of patches) {
+    const n = Number(p.line);
+    if (!Number.isInteger(n) || n < start + 1 || n > end) throw new Error(`line ${p.line} out of range`);
+    if (byLine.has(n)) throw new Error(`line ${n} patched twice`);
+    if (p.op === 'replace') {
+      if (typeof p.text !== 'string' || !p.text.trim()) throw new Error(`line ${n}: empty replacement`);
+      if (/^(CLAIRE|FLINT):/.test(lines[n - 1].trim()) && !/^(CLAIRE|FLINT):/.test(p.text.trim())) {
+        throw new Error(`line ${n}: replacement lost its speaker tag`);
+      }
+    } else if (p.op !== 'delete') {
+      throw new Error(`line ${n}: unknown op ${p.op}`);
+    }
+    byLine.set(n, p);
+  }
+  const out = [];
+  for (let i = start; i < end; i++) {
+    const p = byLine.get(i + 1);
+    if (!p) out.push(lines[i]);
+    else if (p.op === 'replace') out.push(p.text.trim());
+  }
+  return out;
+}
+
+function sumUsage(calls) {
+  const total = {};
+  for (const c of calls) {
+    for (const [k, v] of Object.entries(c.response.usage || {})) {
+      if (typeof v === 'number') total[k] = (total[k] || 0) + v;
+    }
+  }
+  return total;
+}
+"""
+
+# ── Script segmentation for the segment-parallel editor ───────────────────────
+# The script has no headers, so boundaries come from the fixed lines in
+# show-format.json (cold-open tease, Read These / sign-off closers) and from
+# the first line that names each curator story.
+JS_EDITOR_SEGMENTS = r"""
+const SEGMENT_STOP = new Set(['the', 'and', 'for', 'with', 'that', 'this', 'from', 'its', 'into', 'new', 'are', 'has', 'have', 'was', 'will', 'you', 'your', 'about', 'what', 'how', 'why', 'now', 'out']);
+const segmentNorm = s => String(s || '').toLowerCase().replace(/[^a-z0-9' ]+/g, ' ').replace(/\s+/g, ' ').trim();
+const wordCount   = s => String(s || '').split(/\s+/).filter(Boolean).length;
+
+function titleMatcher(title) {
+  const kw = new Set(segmentNorm(title).split(' ').filter(w => w.length >= 3 && !SEGMENT_STOP.has(w)));
+  if (kw.size < 2) return () => false;
+  return line => {
+    const lw = new Set(line.split(' '));
+    let hit = 0;
+    for (const w of kw) if (lw.has(w)) hit++;
+    return hit >= 2 && hit / kw.size >= 0.34;
+  };
+}
+
+// → [{ name, start, end }] over lines[start..end), in script order
+function segmentScript(lines, { showFormat, brief, parallel = true, chunkWords = 700 }) {
+  const N = lines.length;
+  if (!parallel) return [{ name: 'full_script', start: 0, end: N }];
+
+  const findLine = (from, to, pred) => {
+    for (let i = Math.max(0, from); i < Math.min(to, N); i++) if (pred(segmentNorm(lines[i]), i)) return i;
+    return -1;
+  };
+  const readClose = (showFormat.segments.read_these || {}).closing_lines || {};
+  const coldEnd = findLine(0, N, l => l.includes("let's get into it") || l.includes('lets get into it'));
+  const tomorrow = readClose.claire ? findLine(0, N, l => l.includes(segmentNorm(readClose.claire))) : -1;
+  const unfortunately = tomorrow >= 0 && readClose.flint_final
+    ? findLine(tomorrow + 1, tomorrow + 4, l => l.includes(segmentNorm(readClose.flint_final))) : -1;
+  const readEnd = unfortunately >= 0 ? unfortunately + 1 : (tomorrow >= 0 ? tomorrow + 1 : -1);
+
+  const bounds = [];   // [{ at, segment }]
+  bounds.push({ at: 0, segment: coldEnd >= 0 ? 'cold_open' : 'story_rapidfire' });
+  let cursor = coldEnd >= 0 ? coldEnd + 1 : 0;
+  if (coldEnd >= 0) bounds.push({ at: cursor, segment: 'story_rapidfire' });
+  const rapidEnd = readEnd >= 0 ? readEnd : N;
+  for (const story of (brief || {}).stories || []) {
+    const at = findLine(cursor + 1, rapidEnd, titleMatcher(story.title));
+    if (at < 0) continue;
+    bounds.push({ at, segment: 'story_rapidfire' });
+    cursor = at;
+  }
+  if (readEnd >= 0) {
+    const picks = ((brief || {}).deep_dive_picks || []).map(p => titleMatcher(p.title));
+    const readStart = findLine(cursor + 1, readEnd, l => picks.some(m => m(l)));
+    if (readStart >= 0) bounds.push({ at: readStart, segment: 'read_these' });
+    if (readEnd < N) bounds.push({ at: readEnd, segment: 'sign_off' });
+  }
+
+  // Pieces between boundaries; oversized ones (e.g. no story matched) are cut
+  // at the first FLINT: line past chunkWords, then small neighbours in the
+  // same segment are merged back up to chunkWords
+  const uniq = bounds.filter((b, i) => i === 0 || b.at > bounds[i - 1].at);
+  const pieces = [];
+  uniq.forEach((b, i) => {
+    const end = i + 1 < uniq.length ? uniq[i + 1].at : N;
+    let start = b.at, acc = 0;
+    for (let j = b.at; j < end; j++) {
+      if (acc >= chunkWords && lines[j].trim().startsWith('FLINT:')) {
+        pieces.push({ segment: b.segment, start, end: j });
+        start = j; acc = 0;
+      }
+      acc += wordCount(lines[j]);
+    }
+    if (end > start) pieces.push({ segment: b.segment, start, end });
+  });
+  const chunks = [];
+  for (const p of pieces) {
+    const w = wordCount(lines.slice(p.start, p.end).join(' '));
+    const last = chunks[chunks.length - 1];
+    if (last && last.segment === p.segment && last.words + w <= chunkWords) {
+      last.end = p.end; last.words += w;
+    } else {
+      chunks.push({ ...p, words: w });
+    }
+  }
+  return chunks.map((c, i) => ({ name: `${c.segment}#${i + 1}`, start: c.start, end: c.end }));
+}
+"""
+
+# ── BM25 index ────────────────────────────────────────────────────────────────
+# Small in-process BM25 (k1 1.2, b 0.75). The fact-context editor indexes the
+# day's stories once and queries it with each segment's text.
+JS_BM25 = r"""
+const BM25_K1 = 1.2, BM25_B = 0.75;
+const BM25_STOP = new Set(['the', 'and', 'for', 'with', 'that', 'this', 'from', 'its', 'into', 'are', 'was', 'were', 'has', 'have', 'had', 'will', 'you', 'your', 'but', 'not', 'just', 'what', 'how', 'why', 'who', 'they', 'their', 'them', 'our', 'all', 'can', 'like', 'okay', 'yeah', 'right', 'well', 'so', 'it', 'is', 'of', 'to', 'in', 'on', 'at', 'an', 'or', 'be', 'we', 'he', 'she', 'me', 'my', 'do', 'if', 'as', 'by', 'up', 'no', 'oh', 'claire', 'flint']);
+const bm25Tokens = s => String(s || '').toLowerCase().split(/[^a-z0-9]+/).filter(w => w.length >= 2 && !BM25_STOP.has(w));
+
+// → { size, search(text, k) } — search returns up to k of `items`, best first,
+// skipping those that share no term with the query
+function bm25Index(items, textOf) {
+  const docs = items.map(item => bm25Tokens(textOf(item)));
+  const df = new Map();
+  const tfs = docs.map(tokens => {
+    const tf = new Map();
+    for (const t of tokens) tf.set(t, (tf.get(t) || 0) + 1);
+    for (const t of tf.keys()) df.set(t, (df.get(t) || 0) + 1);
+    return tf;
+  });
+  const N = docs.length;
+  const avgdl = docs.reduce((a, d) => a + d.length, 0) / (N || 1);
+  const idf = t => Math.log(1 + (N - (df.get(t) || 0) + 0.5) / ((df.get(t) || 0) + 0.5));
+  return {
+    size: N,
+    search(text, k) {
+      const q = [...new Set(bm25Tokens(text))].filter(t => df.has(t));
+      const scored = [];
+      tfs.forEach((tf, i) => {
+        let score = 0;
+        for (const t of q) {
+          const f = tf.get(t);
+          if (!f) continue;
+          score += idf(t) * (f * (BM25_K1 + 1)) / (f + BM25_K1 * (1 - BM25_B + BM25_B * docs[i].length / avgdl));
+        }
+        if (score > 0) scored.push({ i, score });
+      });
+      return scored.sort((a, b) => b.score - a.score).slice(0, k).map(r => items[r.i]);
+    }
+  };
+}
+"""
+
+# ── ElevenLabs helpers ────────────────────────────────────────────────────────
+# ttsKey() is shared by the writer prefetch, Generate Voice and
+# scripts/test_voices.py — all three must agree for a line to be found again.
+JS_TTS = r"""
+const TTS_MODEL_ID   = 'eleven_multilingual_v2';
+const TTS_MP3_FORMAT = 'mp3_44100_128';
+
+// pipeline.json → tts.output_format: 'mp3_44100_128' (the API default) or raw
+// PCM such as 'pcm_24000' — headerless 16-bit little-endian mono at that rate
+function ttsFormat(ttsCfg) {
+  const name = (ttsCfg || {}).output_format || TTS_MP3_FORMAT;
+  const m = name.match(/^pcm_(\d+)$/);
+  return m
+    ? { name, pcm: true,  sample_rate: Number(m[1]), ext: 'pcm' }
+    : { name, pcm: false, sample_rate: null,         ext: 'mp3' };
+}
+
+function hostVoices(showFormat) {
+  const h1 = showFormat.hosts.host_1, h2 = showFormat.hosts.host_2;
+  return {
+    CLAIRE: {
+      voice_id:       $env.ELEVENLABS_CLAIRE_VOICE_ID || h1.voice_id,
+      voice_settings: h1.voice_settings || { stability: 0.28, similarity_boost: 0.75, style: 0.40, use_speaker_boost: true },
+      speed:          h1.speed || null
+    },
+    FLINT: {
+      voice_id:       $env.ELEVENLABS_FLINT_VOICE_ID || h2.voice_id,
+      voice_settings: h2.voice_settings || { stability: 0.30, similarity_boost: 0.75, style: 0.35, use_speaker_boost: true },
+      speed:          h2.speed || null
+    }
+  };
+}
+
+// Must stay in step with tts_cache_key() in scripts/test_voices.py
+function normalizeTtsText(text) {
+  return String(text).normalize('NFC').replace(/\s+/g, ' ').trim();
+}
+
+// MP3 keys are unchanged from before output formats existed, so the cache
+// survives; any other format is part of the key
+function ttsKey(voice, text, format) {
+  return require('crypto').createHash('sha256').update(JSON.stringify({
+    voice_id:       voice.voice_id,
+    model_id:       TTS_MODEL_ID,
+    voice_settings: voice.voice_settings || null,
+    speed:          voice.speed || null,
+    text:           normalizeTtsText(text),
+    ...(format && format.name !== TTS_MP3_FORMAT ? { output_format: format.name } : {})
+  })).digest('hex');
+}
+
+// Retry-After is either delay-seconds or an HTTP-date; null when absent or
+// unparseable, so the scheduler falls back to exponential backoff
+function retryAfterMs(header, now = Date.now()) {
+  const h = header == null ? '' : String(header).trim();
+  if (!h) return null;
+  const secs = Number(h);
+  const ms = Number.isFinite(secs) ? (secs >= 0 ? secs * 1000 : NaN) : Date.parse(h) - now;
+  return Number.isFinite(ms) ? Math.max(0, ms) : null;
+}
+
+function postElevenlabs(voiceId, text, voiceSettings, speed, apiKey, format) {
+  const https = require('https');
+  return new Promise((resolve, reject) => {
+    const bodyObj = {
+      text,
+      model_id: TTS_MODEL_ID,
+      voice_settings: voiceSettings
+    };
+    if (speed) bodyObj.speed = speed;
+    const body = JSON.stringify(bodyObj);
+    const req = https.request({
+      hostname: 'api.elevenlabs.io',
+      path: `/v1/text-to-speech/${voiceId}` + (format && format.pcm ? `?output_format=${format.name}` : ''),
+      method: 'POST',
+      headers: {
+        'xi-api-key':     apiKey,
+        'Content-Type':   'application/json',
+        'Accept':         format && format.pcm ? '*/*' : 'audio/mpeg',
+        'Content-Length': Buffer.byteLength(body)
+      }
+    }, (res) => {
+      if (res.statusCode !== 200) {
+        let errBody = '';
+        res.on('data', c => errBody += c);
+        res.on('end', () => {
+          const err = new Error(`ElevenLabs HTTP ${res.statusCode}: ${errBody}`);
+          err.status     = res.statusCode;
+          err.retryAfterMs = retryAfterMs(res.headers['retry-after']);
+          reject(err);
+        });
+        return;
+      }
+      const chunks = [];
+      res.on('data', c => chunks.push(Buffer.isBuffer(c) ? c : Buffer.from(c)));
+      res.on('end',  () => resolve(Buffer.concat(chunks)));
+      res.on('error', reject);
+    });
+    req.on('error', reject);
+    req.write(body);
+    req.end();
+  });
+}
+"""
+
+# ── ElevenLabs scheduler ──────────────────────────────────────────────────────
+# tts.dispatch / the dispatch option: longest_first (default) or in_order —
+# the streaming encoder needs lines in episode order more than a short tail.
+JS_TTS_SCHEDULER = r"""
+function createTokenBucket(ratePerSec, burst) {
+  let tokens = burst, last = Date.now(), pausedUntil = 0;
+  const sleep = ms => new Promise(r => setTimeout(r, ms));
+  return {
+    pause(ms) { pausedUntil = Math.max(pausedUntil, Date.now() + ms); },
+    async take() {
+      for (;;) {
+        const now = Date.now();
+        if (now < pausedUntil) { await sleep(pausedUntil - now); continue; }
+        tokens = Math.min(burst, tokens + (now - last) / 1000 * ratePerSec);
+        last = now;
+        if (tokens >= 1) { tokens -= 1; return; }
+        await sleep(Math.ceil((1 - tokens) / ratePerSec * 1000));
+      }
+    }
+  };
+}
+
+// jobs: [{ key, cost, run: () => Promise }] — resolves to results in job order
+async function runTtsSchedule(jobs, cfg) {
+  const maxWorkers = Math.max(1, cfg.concurrency || 2);
+  const bucket     = createTokenBucket(cfg.requests_per_second || 2, cfg.burst || maxWorkers);
+  const maxRetries = cfg.max_retries ?? 5;
+  const stats      = { requests: 0, retries: 0, throttled: 0, max_workers: maxWorkers, min_workers: maxWorkers };
+  const results    = new Array(jobs.length);
+  const order      = cfg.dispatch === 'in_order'
+    ? jobs.map((_, i) => i)
+    : jobs.map((_, i) => i).sort((a, b) => jobs[b].cost - jobs[a].cost);
+  let limit = maxWorkers, active = 0, streak = 0, next = 0, failed = null;
+
+  await new Promise(resolve => {
+    const pump = () => {
+      if (failed || (next >= order.length && active === 0)) return resolve();
+      while (!failed && active < limit && next < order.length) {
+        const i = order[next++];
+        active++;
+        attempt(i, 0).finally(() => { active--; pump(); });
+      }
+    };
+
+    const attempt = async (i, tries) => {
+      await bucket.take();
+      stats.requests++;
+      try {
+        results[i] = { value: await jobs[i].run(), attempts: tries + 1 };
+        if (++streak >= 20 && limit < maxWorkers) { limit++; streak = 0; }
+      } catch (e) {
+        streak = 0;
+        const retryable = e.status === 429 || e.status >= 500 || !e.status;
+        if (!retryable || tries >= maxRetries) { failed = failed || e; return; }
+        stats.retries++;
+        const backoffMs = Number.isFinite(e.retryAfterMs) ? e.retryAfterMs
+                        : Math.min(30000, 1000 * 2 ** tries) + Math.random() * 250;
+        if (e.status === 429) {
+          stats.throttled++;
+          bucket.pause(backoffMs);
+          limit = Math.max(1, limit - 1);
+          stats.min_workers = Math.min(stats.min_workers, limit);
+        } else {
+          await new Promise(r => setTimeout(r, backoffMs));
+        }
+        return attempt(i, tries + 1);
+      }
+    };
+
+    pump();
+  });
+
+  if (failed) throw failed;
+  return { results, stats };
+}
+"""
+
+# ── Persistent TTS audio cache ────────────────────────────────────────────────
+# Eviction counts both extensions, so switching formats stays inside max_mb.
+JS_TTS_CACHE = r"""
+function ttsCacheConfig(ttsCfg) {
+  const c = (ttsCfg || {}).cache || {};
+  return {
+    enabled:   c.enabled !== false,
+    dir:       c.dir || '/logs/cache/tts',
+    max_bytes: (c.max_mb ?? 500) * 1024 * 1024,
+    ext:       ttsFormat(ttsCfg).ext
+  };
+}
+
+function readTtsCache(cache, key) {
+  if (!cache.enabled) return null;
+  const fs = require('fs'), file = `${cache.dir}/${key}.${cache.ext}`;
+  try {
+    const buf = fs.readFileSync(file);
+    const now = new Date();
+    try { fs.utimesSync(file, now, now); } catch (e) {}
+    return buf;
+  } catch (e) {
+    return null;
+  }
+}
+
+function writeTtsCache(cache, key, buf) {
+  if (!cache.enabled) return;
+  const fs = require('fs'), file = `${cache.dir}/${key}.${cache.ext}`;
+  try {
+    fs.mkdirSync(cache.dir, { recursive: true });
+    if (fs.existsSync(file)) return;
+    fs.writeFileSync(`${file}.${process.pid}.tmp`, buf);
+    fs.renameSync(`${file}.${process.pid}.tmp`, file);
+  } catch (e) {
+    console.error('TTS cache write failed:', e.message);
+  }
+}
+
+function evictTtsCache(cache) {
+  if (!cache.enabled) return 0;
+  const fs = require('fs'), path = require('path');
+  let entries;
+  try {
+    entries = fs.readdirSync(cache.dir)
+      .filter(f => /\.(mp3|pcm)$/.test(f))
+      .map(f => { const p = path.join(cache.dir, f); const st = fs.statSync(p); return { p, size: st.size, mtime: st.mtimeMs }; })
+      .sort((a, b) => a.mtime - b.mtime);
+  } catch (e) {
+    return 0;
+  }
+  let total = entries.reduce((a, e) => a + e.size, 0);
+  let evicted = 0;
+  for (const e of entries) {
+    if (total <= cache.max_bytes) break;
+    try { fs.unlinkSync(e.p); total -= e.size; evicted++; } catch (err) {}
+  }
+  return evicted;
+}
+"""
+
+# ── Per-run TTS checkpoints ───────────────────────────────────────────────────
+JS_TTS_CHECKPOINT = r"""
+function ttsCheckpointConfig(ttsCfg) {
+  const c = (ttsCfg || {}).checkpoint || {};
+  return {
+    enabled:   c.enabled !== false,
+    dir:       c.dir || '/tmp/chunks',
+    keep_days: c.keep_days ?? 3,
+    ext:       ttsFormat(ttsCfg).ext
+  };
+}
+
+function openTtsCheckpoint(ckpt, runId, totalLines) {
+  const fs = require('fs');
+  const dir = `${ckpt.dir}/${runId}`;
+  const manifestPath = `${dir}/manifest.json`;
+  let manifest = { run_id: runId, total_lines: totalLines, updated_at: null, chunks: {} };
+  if (ckpt.enabled) {
+    fs.mkdirSync(dir, { recursive: true });
+    try {
+      const prev = JSON.parse(fs.readFileSync(manifestPath, 'utf8'));
+      if (prev && prev.chunks) manifest.chunks = prev.chunks;
+    } catch (e) {}
+  }
+  const chunkName = lineIndex => `${String(lineIndex).padStart(4, '0')}.${ckpt.ext}`;
+
+  return {
+    dir,
+    written: 0,
+    // Audio for this line from an earlier attempt, or null
+    load(lineIndex, key) {
+      if (!ckpt.enabled) return null;
+      const entry = manifest.chunks[lineIndex];
+      if (!entry || entry.key !== key) return null;
+      try {
+        const buf = fs.readFileSync(`${dir}/${entry.file}`);
+        return buf.length === entry.bytes ? buf : null;
+      } catch (e) {
+        return null;
+      }
+    },
+    save(lineIndex, key, chars, buf, source) {
+      if (!ckpt.enabled) return;
+      try {
+        const file = chunkName(lineIndex);
+        fs.writeFileSync(`${dir}/${file}.tmp`, buf);
+        fs.renameSync(`${dir}/${file}.tmp`, `${dir}/${file}`);
+        manifest.chunks[lineIndex] = { file, key, chars, bytes: buf.length, source };
+        manifest.updated_at = new Date().toISOString();
+        fs.writeFileSync(`${manifestPath}.tmp`, JSON.stringify(manifest, null, 2));
+        fs.renameSync(`${manifestPath}.tmp`, manifestPath);
+        this.written++;
+      } catch (e) {
+        console.error(`TTS checkpoint write failed for line ${lineIndex}:`, e.message);
+      }
+    },
+    count() { return Object.keys(manifest.chunks).length; }
+  };
+}
+
+// Drop run directories from earlier days; the current run is never touched
+function pruneTtsCheckpoints(ckpt, runId) {
+  if (!ckpt.enabled) return 0;
+  const fs = require('fs');
+  const cutoff = Date.now() - ckpt.keep_days * 24 * 3600 * 1000;
+  let pruned = 0;
+  let runs = [];
+  try { runs = fs.readdirSync(ckpt.dir); } catch (e) { return 0; }
+  for (const r of runs) {
+    if (r === runId) continue;
+    try {
+      if (fs.statSync(`${ckpt.dir}/${r}`).mtimeMs < cutoff) {
+        fs.rmSync(`${ckpt.dir}/${r}`, { recursive: true, force: true });
+        pruned++;
+      }
+    } catch (e) {}
+  }
+  return pruned;
+}
+"""
+
+# ── Artifact store ────────────────────────────────────────────────────────────
+# Audio moves between nodes as { path, bytes } on disk instead of base64 in
+# item JSON, which n8n keeps in memory and persists with the execution.
+# One directory per run (the episode date) under pipeline.json → artifacts.dir;
+# earlier runs are pruned after artifacts.keep_days.
+JS_ARTIFACTS = r"""
+function artifactConfig(pipelineCfg) {
+  const a = (pipelineCfg || {}).artifacts || {};
+  return {
+    dir:       a.dir || '/tmp/artifacts',
+    keep_days: a.keep_days ?? 3
+  };
+}
+
+function artifactRunDir(cfg, runId) {
+  const dir = `${cfg.dir}/${runId}`;
+  require('fs').mkdirSync(dir, { recursive: true });
+  return dir;
+}
+
+function writeArtifact(file, buf) {
+  const fs = require('fs');
+  fs.mkdirSync(require('path').dirname(file), { recursive: true });
+  fs.writeFileSync(`${file}.tmp`, buf);
+  fs.renameSync(`${file}.tmp`, file);
+  return { path: file, bytes: buf.length };
+}
+
+// Throws if an upstream artifact is gone or was cut short
+function checkArtifact(path, bytes) {
+  let size = null;
+  try { size = require('fs').statSync(path).size; } catch (e) {}
+  if (size === null || (bytes != null && size !== bytes)) {
+    throw new Error(`Artifact ${path} ${size === null ? 'is missing' : `has ${size} bytes, expected ${bytes}`}`);
+  }
+  return size;
+}
+
+function pruneArtifacts(cfg, runId) {
+  const fs = require('fs');
+  const cutoff = Date.now() - cfg.keep_days * 24 * 3600 * 1000;
+  let pruned = 0;
+  let runs = [];
+  try { runs = fs.readdirSync(cfg.dir); } catch (e) { return 0; }
+  for (const r of runs) {
+    if (r === runId) continue;
+    try {
+      if (fs.statSync(`${cfg.dir}/${r}`).mtimeMs < cutoff) {
+        fs.rmSync(`${cfg.dir}/${r}`, { recursive: true, force: true });
+        pruned++;
+      }
+    } catch (e) {}
+  }
+  return pruned;
+}
+
+// What the same payload would have cost as base64 in item JSON
+function base64Bytes(n) {
+  return Math.ceil(n / 3) * 4;
+}
+
+// Streams a file into a request between a multipart preamble and trailer
+function pipeMultipart(req, head, filePath, tail) {
+  const fs = require('fs');
+  return new Promise((resolve, reject) => {
+    req.write(head);
+    const rs = fs.createReadStream(filePath);
+    rs.on('error', reject);
+    rs.on('end', () => { req.end(tail); resolve(); });
+    rs.pipe(req, { end: false });
+  });
+}
+"""
+
+# ── Async ffmpeg / ffprobe runner ─────────────────────────────────────────────
+# Nothing here blocks the event loop: child processes are spawned and awaited,
+# so webhooks (Telegram Concierge) keep being served during assembly.
+# ffmpeg runs with -progress pipe:1; each progress block updates out_time,
+# speed and the estimated time remaining, logged every ~10s. Timeouts come from
+# the media duration — duration / ffmpeg.min_speed + ffmpeg.grace_ms, never
+# below ffmpeg.min_timeout_ms — instead of fixed constants.
+JS_FFMPEG_RUNNER = r"""
+const FFPROBE = '/usr/local/bin/ffprobe';
+
+function ffmpegConfig(pipelineCfg) {
+  const c = (pipelineCfg || {}).ffmpeg || {};
+  return {
+    min_speed:      c.min_speed ?? 2,
+    grace_ms:       c.grace_ms ?? 30000,
+    min_timeout_ms: c.min_timeout_ms ?? 60000
+  };
+}
+
+function ffmpegTimeoutMs(cfg, durationSec) {
+  if (!(durationSec > 0)) return cfg.min_timeout_ms;
+  return Math.max(cfg.min_timeout_ms, Math.round(durationSec * 1000 / cfg.min_speed) + cfg.grace_ms);
+}
+
+// Returns { proc, stats, done, arm(ms) }. done resolves to stats on exit 0 and
+// rejects on a non-zero exit or when an armed timeout fires (process killed).
+function spawnFfmpeg(args, { durationSec = null, timeoutMs = null, stdin = false, label = 'ffmpeg' } = {}) {
+  const { spawn } = require('child_process');
+  const t0   = Date.now();
+  const proc = spawn(FFMPEG, ['-progress', 'pipe:1', '-nostats', ...args], {
+    stdio: [stdin ? 'pipe' : 'ignore', 'pipe', 'pipe']
+  });
+  const stats = {
+    wall_ms: null, out_time_s: 0, expected_s: durationSec, speed_x: null,
+    remaining_ms: null, timeout_ms: null, progress_updates: 0
+  };
+  const where = () => `${stats.out_time_s.toFixed(1)}s` + (stats.expected_s ? ` of ${stats.expected_s.toFixed(1)}s` : '');
+
+  let stderr = '', pending = '', block = {}, lastLog = 0, timer = null, fail;
+  proc.stdout.on('data', d => {
+    pending += d;
+    let nl;
+    while ((nl = pending.indexOf('\n')) !== -1) {
+      const line = pending.slice(0, nl).trim();
+      pending = pending.slice(nl + 1);
+      const eq = line.indexOf('=');
+      if (eq < 0) continue;
+      const k = line.slice(0, eq), v = line.slice(eq + 1);
+      if (k !== 'progress') { block[k] = v; continue; }
+
+      // progress=continue|end closes a block
+      const us = Number(block.out_time_us ?? block.out_time_ms);   // both are microseconds
+      if (Number.isFinite(us) && us >= 0) stats.out_time_s = us / 1e6;
+      const speed = parseFloat(block.speed);
+      if (Number.isFinite(speed) && speed > 0) stats.speed_x = speed;
+      if (stats.expected_s && stats.speed_x) {
+        stats.remaining_ms = Math.max(0, Math.round((stats.expected_s - stats.out_time_s) / stats.speed_x * 1000));
+      }
+      stats.progress_updates++;
+      block = {};
+      if (v === 'end' || Date.now() - lastLog > 10000) {
+        lastLog = Date.now();
+        console.log(`${label}: ${where()}, ${stats.speed_x ?? '?'}x, ${Date.now() - t0}ms elapsed` +
+                    (stats.remaining_ms != null ? `, ~${stats.remaining_ms}ms left` : ''));
+      }
+    }
+  });
+  proc.stderr.on('data', d => { stderr = (stderr + d).slice(-4000); });
+
+  const done = new Promise((resolve, reject) => {
+    fail = reject;
+    proc.on('error', e => { clearTimeout(timer); reject(e); });
+    proc.on('close', code => {
+      clearTimeout(timer);
+      stats.wall_ms = Date.now() - t0;
+      if (code === 0) resolve(stats);
+      else reject(new Error(`${label} exited ${code}: ${stderr.slice(-500)}`));
+    });
+  });
+
+  function arm(ms) {
+    clearTimeout(timer);
+    stats.timeout_ms = ms;
+    timer = setTimeout(() => {
+      try { proc.kill('SIGKILL'); } catch (e) {}
+      fail(new Error(`${label} timed out after ${ms}ms at ${where()}`));
+    }, ms);
+  }
+  if (timeoutMs) arm(timeoutMs);
+
+  return { proc, stats, done, arm };
+}
+
+function runFfmpeg(args, opts) {
+  return spawnFfmpeg(args, opts).done;
+}
+
+function runFfprobe(args, timeoutMs = 30000) {
+  const { spawn } = require('child_process');
+  return new Promise((resolve, reject) => {
+    const proc = spawn(FFPROBE, args, { stdio: ['ignore', 'pipe', 'pipe'] });
+    let out = '', err = '';
+    const timer = setTimeout(() => { proc.kill('SIGKILL'); reject(new Error(`ffprobe timed out after ${timeoutMs}ms`)); }, timeoutMs);
+    proc.stdout.on('data', d => { out += d; });
+    proc.stderr.on('data', d => { err = (err + d).slice(-2000); });
+    proc.on('error', e => { clearTimeout(timer); reject(e); });
+    proc.on('close', code => {
+      clearTimeout(timer);
+      code === 0 ? resolve(out) : reject(new Error(`ffprobe exited ${code}: ${err}`));
+    });
+  });
+}
+
+// Seconds, or null when the file can't be probed
+async function mediaDurationSec(path) {
+  try {
+    const d = parseFloat(await runFfprobe(['-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path]));
+    return Number.isFinite(d) ? d : null;
+  } catch (e) {
+    return null;
+  }
+}
+
+// Length of one TTS line from its size: raw PCM is s16le mono, ElevenLabs
+// MP3 formats are CBR (mp3_<rate>_<kbps>)
+function lineDurationSec(bytes, formatName) {
+  let m;
+  if ((m = /^pcm_(\d+)$/.exec(formatName || ''))) return bytes / 2 / Number(m[1]);
+  if ((m = /^mp3_\d+_(\d+)$/.exec(formatName || ''))) return bytes * 8 / (Number(m[1]) * 1000);
+  return null;
+}
+
+// Episode length: speech starts SPEECH_DELAY_MS into the intro bed
+function episodeDurationSec(speechSec, introSec) {
+  if (speechSec == null) return null;
+  return introSec != null ? Math.max(introSec, SPEECH_DELAY_MS / 1000 + speechSec) : speechSec;
+}
+"""
+
+# ── Audio assembly graph ──────────────────────────────────────────────────────
+JS_AUDIO_ASSEMBLY = r"""
+const FFMPEG = '/usr/local/bin/ffmpeg';
+
+// Intro bed: full level for 9s, 0.8 until speech comes in at 12s, then a 3s
+// duck down to 0.25 for the rest of the bed
+const INTRO_VOLUME    = "volume='if(lt(t,9),1,if(lt(t,12),0.8,if(lt(t,15),0.75-(t-12)/3*0.5,0.25)))':eval=frame";
+const SPEECH_DELAY_MS = 12000;
+
+// audio.normalize: false (default) — no normalization stage, the fast path;
+// 'dynaudnorm' — cheap dynamic level matching between lines; 'loudnorm' (or
+// true) — EBU R128 to audio.loudness, exact but it resamples to 192k
+// internally and dominates assembly time (2.2x the old two-pass path,
+// scripts/bench_results/concat_audio.txt).
+// `enabled` means loudnorm, which is what the run logs report.
+function loudnessConfig(showFormat) {
+  const a = (showFormat || {}).audio || {};
+  const l = a.loudness || {};
+  const mode = a.normalize === true ? 'loudnorm' : (a.normalize || 'off');
+  return {
+    mode,
+    enabled:         mode === 'loudnorm',
+    integrated_lufs: l.integrated_lufs ?? -16,
+    true_peak_db:    l.true_peak_db ?? -1.5,
+    lra:             l.lra ?? 11
+  };
+}
+
+// argv for execFileSync/spawn — no shell, so paths need no quoting.
+// Speech is either a concat list of MP3s (listFile) or one raw PCM file
+// (pcmFile, s16le mono at sampleRate) that needs no per-chunk decode.
+// introBed is an intro with INTRO_VOLUME already applied (see introBed());
+// otherwise introPath gets the envelope inside the graph.
+function assemblyArgs({ listFile, pcmFile, sampleRate, introPath, introBed, outFile, loudness, quality = 4 }) {
+  const args    = ['-hide_banner', '-nostdin', '-y'];
+  const filters = [];
+  const intro   = introBed || introPath;
+  if (intro) args.push('-i', intro);
+  if (pcmFile) args.push('-f', 's16le', '-ar', String(sampleRate), '-ac', '1', '-i', pcmFile);
+  else         args.push('-f', 'concat', '-safe', '0', '-i', listFile);
+
+  let mixed = intro ? 'mix' : '0:a';
+  if (intro) {
+    if (!introBed) filters.push(`[0:a]${INTRO_VOLUME}[iv]`);
+    filters.push(
+      `[1:a]adelay=${SPEECH_DELAY_MS}|${SPEECH_DELAY_MS}[td]`,
+      `${introBed ? '[0:a]' : '[iv]'}[td]amix=inputs=2:duration=longest:normalize=0[mix]`
+    );
+  }
+  // loudnorm upsamples internally and PCM speech may be 24k — always hand
+  // the encoder 44.1k
+  const normalize = {
+    loudnorm:   `loudnorm=I=${loudness.integrated_lufs}:TP=${loudness.true_peak_db}:LRA=${loudness.lra},`,
+    dynaudnorm: 'dynaudnorm,'
+  }[loudness.mode] || '';
+  filters.push(`[${mixed}]${normalize}aresample=44100[out]`);
+
+  args.push('-filter_complex', filters.join(';'), '-map', '[out]',
+            '-acodec', 'libmp3lame', '-q:a', String(quality), outFile);
+  return args;
+}
+"""
+
+# ── Intro bed cache ───────────────────────────────────────────────────────────
+# The envelope never changes between episodes, so it is rendered once per
+# (intro file, envelope) pair. WAV keeps the bed lossless; the only MP3 encode
+# is still the episode itself.
+JS_INTRO_BED = r"""
+const INTRO_BED_FORMAT = 'wav pcm_s16le';
+
+function introBedConfig(pipelineCfg) {
+  const c = (pipelineCfg || {}).intro_bed || {};
+  return { enabled: c.enabled !== false, dir: c.dir || '/logs/cache/intro' };
+}
+
+// { path, key, hit, render_ms, error } — path is null when disabled or the
+// render failed, and the caller applies the envelope live instead
+async function introBed(cfg, introPath, ffCfg) {
+  const fs = require('fs'), crypto = require('crypto');
+  if (!cfg.enabled) return { path: null, key: null, hit: false, render_ms: null, error: null };
+
+  const key = crypto.createHash('sha256')
+    .update(fs.readFileSync(introPath))
+    .update(`\0${INTRO_VOLUME}\0${INTRO_BED_FORMAT}`)
+    .digest('hex').slice(0, 16);
+  const name = `intro-bed-${key}.wav`;
+  const path = `${cfg.dir}/${name}`;
+  if (fs.existsSync(path)) return { path, key, hit: true, render_ms: 0, error: null };
+
+  const t0  = Date.now();
+  const tmp = `${cfg.dir}/.partial-${process.pid}-${name}`;
+  try {
+    fs.mkdirSync(cfg.dir, { recursive: true });
+    const sec = await mediaDurationSec(introPath);
+    await runFfmpeg(['-hide_banner', '-nostdin', '-y', '-i', introPath, '-af', INTRO_VOLUME, '-c:a', 'pcm_s16le', tmp],
+                    { durationSec: sec, timeoutMs: ffmpegTimeoutMs(ffCfg, sec), label: 'intro bed' });
+    fs.renameSync(tmp, path);
+  } catch (e) {
+    try { fs.unlinkSync(tmp); } catch (err) {}
+    return { path: null, key, hit: false, render_ms: null, error: String(e.message).slice(0, 300) };
+  }
+  // Beds from an older intro or envelope are never hit again
+  for (const f of fs.readdirSync(cfg.dir)) {
+    if (/^intro-bed-[0-9a-f]+\.wav$/.test(f) && f !== name) {
+      try { fs.unlinkSync(`${cfg.dir}/${f}`); } catch (e) {}
+    }
+  }
+  return { path, key, hit: false, render_ms: Date.now() - t0, error: null };
+}
+"""
+
+# ── Streaming encoder ─────────────────────────────────────────────────────────
+# Needs JS_FFMPEG_RUNNER. Progress comes from the runner, and the timeout is
+# only armed in finish() — until the last line is written ffmpeg waits on TTS,
+# not on the CPU.
+JS_STREAM_ENCODER = r"""
+function startStreamingEncoder(args) {
+  const run  = spawnFfmpeg(args, { stdin: true, label: 'stream encoder' });
+  const proc = run.proc;
+  let error = null, chain = Promise.resolve(), bytes = 0;
+
+  const exited = run.done.then(() => {}, e => { error = error || e; });
+  proc.stdin.on('error', e => { error = error || e; });   // EPIPE once ffmpeg is gone
+
+  // Respect backpressure; a dead process resolves the wait instead of 'drain'
+  const write = buf => error ? null : new Promise(resolve => {
+    if (proc.stdin.write(buf)) return resolve();
+    proc.stdin.once('drain', resolve);
+    exited.then(resolve);
+  });
+
+  return {
+    get error() { return error; },
+    get bytes() { return bytes; },
+    get stats() { return run.stats; },
+    push(buf) {
+      // keep 16-bit sample alignment across line boundaries
+      if (buf.length % 2) buf = Buffer.concat([buf, Buffer.alloc(1)]);
+      bytes += buf.length;
+      chain = chain.then(() => write(buf));
+      return chain;
+    },
+    // durationSec: expected episode length; timeoutMs covers what is left of it
+    async finish(durationSec, timeoutMs) {
+      await chain;
+      run.stats.expected_s = durationSec;
+      if (!error) {
+        if (timeoutMs) run.arm(timeoutMs);
+        proc.stdin.end();
+      }
+      await exited;
+      if (error) throw error;
+      return run.stats;
+    },
+    abort() {
+      try { proc.kill('SIGKILL'); } catch (e) {}
+    }
+  };
+}
+"""
+
+# ── Audio timeline (mirror of scripts/audio_timeline.py) ──────────────────────
+# MP3 frame headers + Xing/Info/LAME tag, or raw PCM sizes → exact samples per
+# chunk without spawning ffprobe per line. Keep in step with the Python module.
+JS_AUDIO_TIMELINE = r"""
+// MPEG audio Layer III only — that is all ElevenLabs produces
+const MP3_BITRATES_KBPS = {
+  1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+  2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+};
+const MP3_SAMPLE_RATES = {
+  '1':   [44100, 48000, 32000],
+  '2':   [22050, 24000, 16000],
+  '2.5': [11025, 12000, 8000]
+};
+
+function mp3FrameHeader(buf, pos) {
+  if (pos + 4 > buf.length || buf[pos] !== 0xFF || (buf[pos + 1] & 0xE0) !== 0xE0) return null;
+  const versionBits = (buf[pos + 1] >> 3) & 3;
+  const layerBits   = (buf[pos + 1] >> 1) & 3;
+  const bitrateIdx  = buf[pos + 2] >> 4;
+  const rateIdx     = (buf[pos + 2] >> 2) & 3;
+  if (versionBits === 1 || layerBits !== 1 || bitrateIdx === 0 || bitrateIdx === 15 || rateIdx === 3) return null;
+  const version    = { 0: 2.5, 2: 2, 3: 1 }[versionBits];
+  const bitrate    = MP3_BITRATES_KBPS[version === 1 ? 1 : 2][bitrateIdx];
+  const sampleRate = MP3_SAMPLE_RATES[String(version)][rateIdx];
+  const samples    = version === 1 ? 1152 : 576;
+  return {
+    version, bitrate, sampleRate, samples,
+    channels: (buf[pos + 3] >> 6) === 3 ? 1 : 2,
+    length:   Math.floor(samples / 8 * bitrate * 1000 / sampleRate) + ((buf[pos + 2] >> 1) & 1)
+  };
+}
+
+function id3v2Size(buf) {
+  if (buf.length < 10 || buf.toString('latin1', 0, 3) !== 'ID3') return 0;
+  const size = (buf[6] << 21) | (buf[7] << 14) | (buf[8] << 7) | buf[9];
+  return 10 + size + (buf[5] & 0x10 ? 10 : 0);
+}
+
+// Xing/Info (LAME) or VBRI header in the first frame — it carries no audio
+function mp3InfoFrame(buf, pos, h) {
+  const side = h.version === 1 ? (h.channels === 2 ? 32 : 17) : (h.channels === 2 ? 17 : 9);
+  const x    = pos + 4 + side;
+  const tag  = buf.toString('latin1', x, x + 4);
+  if (tag === 'Xing' || tag === 'Info') {
+    const flags = buf.readUInt32BE(x + 4);
+    let off = x + 8, frames = null;
+    if (flags & 1) { frames = buf.readUInt32BE(off); off += 4; }
+    off += (flags & 2 ? 4 : 0) + (flags & 4 ? 100 : 0) + (flags & 8 ? 4 : 0);
+    let delay = 0, padding = 0;
+    // LAME extension: 9-byte encoder string, then delay/padding 12 bits each at +21
+    if (['LAME', 'Lavf', 'Lavc'].includes(buf.toString('latin1', off, off + 4)) && off + 24 <= buf.length) {
+      delay   = (buf[off + 21] << 4) | (buf[off + 22] >> 4);
+      padding = ((buf[off + 22] & 0x0F) << 8) | buf[off + 23];
+    }
+    return { tag, frames, delay, padding };
+  }
+  const v = pos + 4 + 32;
+  if (v + 18 <= buf.length && buf.toString('latin1', v, v + 4) === 'VBRI') {
+    return { tag: 'VBRI', frames: buf.readUInt32BE(v + 14), delay: buf.readUInt16BE(v + 6), padding: 0 };
+  }
+  return null;
+}
+
+// samples / duration_ms are what a gapless decoder (ffmpeg included) plays:
+// frames × samples-per-frame minus the LAME encoder delay and padding
+function parseMp3(buf) {
+  let pos = id3v2Size(buf);
+  const end = buf.length - (buf.length >= 128 && buf.toString('latin1', buf.length - 128, buf.length - 125) === 'TAG' ? 128 : 0);
+  let frames = 0, audioBytes = 0, skipped = 0, first = null, info = null;
+  const bitrates = new Set();
+  while (pos + 4 <= end) {
+    const h = mp3FrameHeader(buf, pos);
+    if (!h || pos + h.length > end) { pos++; skipped++; continue; }   // junk or truncated frame: resync
+    if (!first) {
+      first = h;
+      info  = mp3InfoFrame(buf, pos, h);
+      if (info) { pos += h.length; continue; }
+    }
+    frames++;
+    audioBytes += h.length;
+    bitrates.add(h.bitrate);
+    pos += h.length;
+  }
+  if (!first) throw new Error('no MPEG Layer III frames found');
+
+  const delay    = info ? info.delay : 0;
+  const padding  = info ? info.padding : 0;
+  const samples  = Math.max(0, frames * first.samples - delay - padding);
+  const codedSec = frames * first.samples / first.sampleRate;
+  return {
+    format:        'mp3',
+    sample_rate:   first.sampleRate,
+    channels:      first.channels,
+    frames,
+    samples,
+    duration_ms:   Math.round(samples * 1000 / first.sampleRate * 1000) / 1000,
+    bitrate_kbps:  frames ? Math.round(audioBytes * 8 / codedSec / 100) / 10 : 0,
+    vbr:           bitrates.size > 1,
+    encoder_delay: delay,
+    padding,
+    info_tag:      info ? info.tag : null,
+    skipped_bytes: skipped
+  };
+}
+
+function pcmChunkInfo(bytes, sampleRate) {
+  const samples = Math.ceil(bytes / 2);   // odd chunks are zero-padded to a whole sample
+  return {
+    format: 'pcm', sample_rate: sampleRate, channels: 1, frames: null, samples,
+    duration_ms: Math.round(samples * 1000 / sampleRate * 1000) / 1000,
+    bitrate_kbps: sampleRate * 16 / 1000, vbr: false
+  };
+}
+
+// Raw PCM (pcm_<rate>) is s16le mono
+function chunkInfo(buf, formatName) {
+  const m = /^pcm_(\d+)$/.exec(formatName || '');
+  return m ? pcmChunkInfo(buf.length, Number(m[1])) : parseMp3(buf);
+}
+
+// lines: [{ line_index, speaker, samples, sample_rate }]. Boundaries
+// accumulate in seconds and round once, so they never drift.
+function buildTimeline(lines, offsetMs = 0) {
+  let t = 0;
+  return [...lines].sort((a, b) => a.line_index - b.line_index).map(l => {
+    const start = t;
+    t += l.samples / l.sample_rate;
+    return {
+      line_index: l.line_index,
+      speaker:    l.speaker ?? null,
+      start_ms:   Math.round(offsetMs + start * 1000),
+      end_ms:     Math.round(offsetMs + t * 1000)
+    };
+  });
+}
+"""
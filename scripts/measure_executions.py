@@ -0,0 +1,87 @@
+"""
+Execution-size report for the Daily Pipeline — how much data n8n stores per
+run and how long each run took. Use it to compare runs before and after a
+change such as patch_audio_artifacts.py (file references instead of base64).
+
+Usage (from repo root, n8n running):
+  python3 scripts/measure_executions.py             # last 10 executions
+  python3 scripts/measure_executions.py --limit 30
+  python3 scripts/measure_executions.py --nodes 5   # show the 5 heaviest nodes per run
+
+Columns: stored = serialized execution data (roughly the execution_data row),
+audio nodes = item JSON of Generate Voice + Concatenate Audio, duration =
+startedAt → stoppedAt.
+"""
+import argparse, json, urllib.request, urllib.error
+from datetime import datetime
+
+AUDIO_NODES = ("Generate Voice (Sequential)", "Concatenate Audio")
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+def size(obj):
+    return len(json.dumps(obj, separators=(",", ":")).encode())
+
+def parse_ts(ts):
+    return datetime.fromisoformat(ts.replace("Z", "+00:00")) if ts else None
+
+def node_sizes(execution):
+    run_data = ((execution.get("data") or {}).get("resultData") or {}).get("runData") or {}
+    return {name: size(runs) for name, runs in run_data.items()}
+
+def mb(n):
+    return f"{n / 1048576:.1f}"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--nodes", type=int, default=0, help="list the N heaviest nodes per execution")
+    args = ap.parse_args()
+
+    res = n8n("GET", f"/executions?workflowId={WF_ID}&includeData=true&limit={args.limit}")
+    executions = res.get("data", [])
+    if not executions:
+        print("No executions found")
+        return
+
+    print(f"{'id':>8}  {'started':<17}{'status':<10}{'stored MB':>10}{'audio nodes MB':>16}{'duration':>10}")
+    for e in executions:
+        nodes    = node_sizes(e)
+        start    = parse_ts(e.get("startedAt"))
+        stop     = parse_ts(e.get("stoppedAt"))
+        duration = f"{(stop - start).total_seconds():.0f}s" if start and stop else "—"
+        audio    = sum(nodes.get(n, 0) for n in AUDIO_NODES)
+        print(f"{e['id']:>8}  {start.strftime('%Y-%m-%d %H:%M') if start else '—':<17}"
+              f"{e.get('status', '?'):<10}{mb(size(e.get('data') or {})):>10}{mb(audio):>16}{duration:>10}")
+        for name, n in sorted(nodes.items(), key=lambda kv: -kv[1])[:args.nodes]:
+            print(f"{'':>10}{name:<40}{mb(n):>8} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+"""
+Moves audio between Daily Pipeline nodes as file references instead of base64
+in item JSON. Every line's audio_b64 and the episode's combined_b64 (tens of MB)
+were held in the n8n heap and saved with each execution.
+
+  - Generate Voice (Sequential) emits audio_path + bytes per line — the
+    checkpoint chunk from patch_tts_checkpoint.py when it holds that audio,
+    otherwise a file in the run's artifact dir
+  - Concatenate Audio passes those paths straight to ffmpeg and writes the
+    episode to /episodes/{date}/ (SAVE_LOCAL) or the artifact dir, emitting
+    combined_path + combined_bytes
+  - Upload to Buzzsprout and Upload to Google Drive stream the file from disk
+  - Artifacts live under pipeline.json → artifacts.dir/<date>/, pruned after
+    artifacts.keep_days; every consumer checks the file exists at the
+    recorded size
+  - The run log gets artifacts {voice_item_json_bytes, base64_bytes_avoided,
+    heap_used_mb, max_rss_mb, ...}; scripts/measure_executions.py compares
+    stored execution size and duration across runs for the before/after
+
+Run from repo root: python3 scripts/patch_audio_artifacts.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import (
+    JS_STORY_INDEX, JS_TTS, JS_TTS_SCHEDULER, JS_TTS_CACHE, JS_TTS_CHECKPOINT,
+    JS_ARTIFACTS
+)
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Generate Voice (Sequential) — emits audio_path instead of audio_b64 ──────
+JS_GENERATE_VOICE = JS_TTS + JS_TTS_SCHEDULER + JS_TTS_CACHE + JS_TTS_CHECKPOINT + JS_ARTIFACTS + r"""
+const fs = require('fs');
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const prefetchDir = (pipelineCfg.writer_stream || {}).prefetch_dir || '/tmp/tts-prefetch';
+const ttsCfg      = pipelineCfg.tts || {};
+const cache       = ttsCacheConfig(ttsCfg);
+const ckptCfg     = ttsCheckpointConfig(ttsCfg);
+const artCfg      = artifactConfig(pipelineCfg);
+
+const lines  = $input.all().map(i => i.json);
+const apiKey = $env.ELEVENLABS_API_KEY;
+const t0     = Date.now();
+const keys   = lines.map(l => ttsKey(l, l.text));
+
+// One episode per day, so the date identifies the run across retries
+const runId  = new Date().toISOString().split('T')[0];
+const pruned = pruneTtsCheckpoints(ckptCfg, runId);
+const ckpt   = openTtsCheckpoint(ckptCfg, runId, lines.length);
+
+// Resume order: this run's checkpoints, lines the streaming writer already
+// synthesized, the persistent cache — only the rest go to ElevenLabs
+const audio  = new Array(lines.length).fill(null);
+const source = new Array(lines.length).fill('api');
+lines.forEach((l, i) => {
+  audio[i] = ckpt.load(l.line_index, keys[i]);
+  if (audio[i]) { source[i] = 'checkpoint'; return; }
+  try { audio[i] = fs.readFileSync(`${prefetchDir}/${keys[i]}.mp3`); source[i] = 'prefetch'; } catch (e) {}
+  if (!audio[i]) {
+    audio[i] = readTtsCache(cache, keys[i]);
+    if (audio[i]) source[i] = 'cache';
+  }
+  if (audio[i]) ckpt.save(l.line_index, keys[i], l.text.length, audio[i], source[i]);
+});
+const resumed = source.filter(s => s === 'checkpoint').length;
+
+const pending = lines.map((l, i) => i).filter(i => !audio[i]);
+let results, stats;
+try {
+  ({ results, stats } = await runTtsSchedule(pending.map(i => ({
+    cost: lines[i].text.length,
+    run:  async () => {
+      const buf = await postElevenlabs(lines[i].voice_id, lines[i].text, lines[i].voice_settings, lines[i].speed, apiKey);
+      ckpt.save(lines[i].line_index, keys[i], lines[i].text.length, buf, 'api');
+      return buf;
+    }
+  })), ttsCfg));
+} catch (e) {
+  if (ckptCfg.enabled) {
+    e.message = `${e.message} — ${ckpt.count()}/${lines.length} lines checkpointed in ${ckpt.dir}; retry to resume`;
+  }
+  throw e;
+}
+const attempts = new Array(lines.length).fill(0);
+pending.forEach((i, k) => { audio[i] = results[k].value; attempts[i] = results[k].attempts; });
+
+// Everything synthesized (this attempt, an earlier one, or by the writer) goes into the cache
+lines.forEach((l, i) => { if (source[i] !== 'cache') writeTtsCache(cache, keys[i], audio[i]); });
+const evicted = evictTtsCache(cache);
+
+const hits = lines.filter((l, i) => source[i] === 'cache');
+const ttsCache = {
+  enabled:     cache.enabled,
+  hits:        hits.length,
+  misses:      lines.length - hits.length,
+  chars_saved: hits.reduce((a, l) => a + l.text.length, 0),
+  evicted
+};
+const ttsCheckpoint = {
+  enabled:       ckptCfg.enabled,
+  run_id:        runId,
+  dir:           ckptCfg.enabled ? ckpt.dir : null,
+  resumed,
+  resumed_chars: lines.reduce((a, l, i) => a + (source[i] === 'checkpoint' ? l.text.length : 0), 0),
+  written:       ckpt.written,
+  pruned_runs:   pruned
+};
+// Hand downstream nodes a file per line: the checkpoint chunk when it holds
+// exactly this audio, otherwise a copy in the run's artifact dir
+const artDir = artifactRunDir(artCfg, runId);
+const audioPaths = lines.map((l, i) => {
+  const name = `${String(l.line_index).padStart(4, '0')}.mp3`;
+  if (ckptCfg.enabled) {
+    try {
+      if (fs.statSync(`${ckpt.dir}/${name}`).size === audio[i].length) return `${ckpt.dir}/${name}`;
+    } catch (e) {}
+  }
+  return writeArtifact(`${artDir}/tts/${name}`, audio[i]).path;
+});
+
+const schedule = {
+  ...stats,
+  lines:      lines.length,
+  prefetched: source.filter(s => s === 'prefetch').length,
+  wall_ms:    Date.now() - t0
+};
+
+return lines
+  .map((l, i) => ({ l, i }))
+  .sort((a, b) => a.l.line_index - b.l.line_index)
+  .map(({ l, i }, n) => ({
+    json: {
+      speaker:       l.speaker,
+      line_index:    l.line_index,
+      total_lines:   l.total_lines,
+      episode_title: l.episode_title,
+      prefetched:    source[i] === 'prefetch',
+      tts_source:    source[i],
+      tts_attempts:  attempts[i],
+      bytes:         audio[i].length,
+      audio_path:    audioPaths[i],
+      // run-level stats ride on the first item
+      ...(n === 0 ? { tts_schedule: schedule, tts_cache: ttsCache, tts_checkpoint: ttsCheckpoint } : {})
+    }
+  }));
+"""
+
+# ── Concatenate Audio — ffmpeg reads the line files in place ─────────────────
+JS_CONCAT_AUDIO = JS_ARTIFACTS + r"""
+const fs           = require('fs');
+const { execSync } = require('child_process');
+const items = $input.all();
+const date  = new Date().toISOString().split('T')[0];
+const fname = `circuit-breakers-${date}.mp3`;
+
+const artCfg = artifactConfig($('Fetch pipeline.json').first().json);
+const pruned = pruneArtifacts(artCfg, date);
+const artDir = artifactRunDir(artCfg, date);
+
+const tmpDir = `/tmp/ep-${Date.now()}`;
+fs.mkdirSync(tmpDir, { recursive: true });
+
+// TTS segments are already on disk — hand their paths straight to ffmpeg
+const segFiles = [];
+let ttsBytes = 0;
+items.forEach(item => {
+  if (!item.json.audio_path) return;
+  ttsBytes += checkArtifact(item.json.audio_path, item.json.bytes);
+  segFiles.push(item.json.audio_path);
+});
+
+// Step 1: concat all TTS into one file
+const listFile = `${tmpDir}/list.txt`;
+fs.writeFileSync(listFile, segFiles.map(f => `file '${f}'`).join('\n'));
+const ttsFile = `${tmpDir}/tts_all.mp3`;
+execSync(
+  `/usr/local/bin/ffmpeg -y -f concat -safe 0 -i "${listFile}" -acodec libmp3lame -q:a 4 "${ttsFile}"`,
+  { timeout: 120000 }
+);
+
+// Step 2: mix intro (with duck at t=12s) + TTS delayed 12s; fallback to TTS only.
+// Local runs write the episode straight into /episodes/{date}/, otherwise it
+// stays in the run's artifact dir until the uploads have read it.
+const introPath  = '/assets/intro.mp3';
+const episodeDir = `/episodes/${date}`;
+const outDir     = $env.SAVE_LOCAL === 'true' ? episodeDir : artDir;
+const outFile    = `${outDir}/${fname}`;
+fs.mkdirSync(outDir, { recursive: true });
+
+if (fs.existsSync(introPath)) {
+  execSync(
+    `/usr/local/bin/ffmpeg -y -i "${introPath}" -i "${ttsFile}" ` +
+    `-filter_complex "[0:a]volume='if(lt(t,9),1,if(lt(t,12),0.8,if(lt(t,15),0.75-(t-12)/3*0.5,0.25)))':eval=frame[iv];` +
+    `[1:a]adelay=12000|12000[td];` +
+    `[iv][td]amix=inputs=2:duration=longest:normalize=0[out]" ` +
+    `-map "[out]" -acodec libmp3lame -q:a 4 "${outFile}"`,
+    { timeout: 180000 }
+  );
+} else {
+  fs.copyFileSync(ttsFile, outFile);
+}
+const combinedBytes = checkArtifact(outFile);
+
+if ($env.SAVE_LOCAL === 'true') {
+  // Save transcript — prefer Editor Review output (corrected script), fall back to writer
+  let transcript = '';
+  try {
+    transcript = $('Editor Review').first().json.script || '';
+  } catch (_) {
+    try { transcript = $('Parse Writer Response').first().json.script || ''; } catch (_) {}
+  }
+  if (transcript) fs.writeFileSync(`${episodeDir}/transcript.txt`, transcript);
+}
+
+try { fs.rmSync(tmpDir, { recursive: true, force: true }); } catch (e) {}
+
+// Before/after numbers for the run log: what now rides in item JSON vs what
+// the base64 fields used to add to every execution
+const mb = n => Math.round(n / 1048576 * 10) / 10;
+const artifacts = {
+  dir:                   artDir,
+  tts_lines:             segFiles.length,
+  tts_bytes:             ttsBytes,
+  combined_bytes:        combinedBytes,
+  voice_item_json_bytes: items.reduce((a, i) => a + Buffer.byteLength(JSON.stringify(i.json)), 0),
+  base64_bytes_avoided:  items.reduce((a, i) => a + base64Bytes(i.json.bytes || 0), 0) + base64Bytes(combinedBytes),
+  heap_used_mb:          mb(process.memoryUsage().heapUsed),
+  max_rss_mb:            mb(process.resourceUsage().maxRSS * 1024),
+  pruned_runs:           pruned
+};
+
+return [{
+  json: {
+    file_name:      fname,
+    episode_dir:    episodeDir,
+    line_count:     items.length,
+    has_intro:      fs.existsSync(introPath),
+    combined_path:  outFile,
+    combined_bytes: combinedBytes,
+    artifacts
+  }
+}];
+"""
+
+# ── Upload to Buzzsprout — streams the episode file from disk ─────────────────
+JS_UPLOAD_BUZZSPROUT = JS_ARTIFACTS + r"""
+const https = require('https');
+
+// Skip upload when running in local-save mode
+if ($env.SAVE_LOCAL === 'true') {
+  const fname = $input.first().json.file_name || 'episode.mp3';
+  return [{ json: { skipped: true, id: null, audio_url: null, title: fname } }];
+}
+
+const item        = $input.first();
+const audioPath   = item.json.combined_path;
+const audioSize   = checkArtifact(audioPath, item.json.combined_bytes);
+const fileName    = item.json.file_name || 'episode.mp3';
+
+// Episode title from the writer output
+const episodeTitle = $('Parse Writer Response').first().json.episode_title || fileName;
+
+const apiKey    = $env.BUZZSPROUT_API_KEY;
+const podcastId = $env.BUZZSPROUT_PODCAST_ID;
+const boundary  = `----FormBoundary${Date.now()}`;
+
+// The MP3 is streamed from disk between these two parts
+const head = Buffer.from(
+  `--${boundary}\r\nContent-Disposition: form-data; name="title"\r\n\r\n${episodeTitle}\r\n` +
+  `--${boundary}\r\nContent-Disposition: form-data; name="audio_file"; filename="${fileName}"\r\nContent-Type: audio/mpeg\r\n\r\n`
+);
+const tail = Buffer.from(`\r\n--${boundary}--\r\n`);
+
+const result = await new Promise((resolve, reject) => {
+  const req = https.request({
+    hostname: 'www.buzzsprout.com',
+    path:     `/api/${podcastId}/episodes.json`,
+    method:   'POST',
+    headers: {
+      'Authorization':  `Token token="${apiKey}"`,
+      'Content-Type':   `multipart/form-data; boundary=${boundary}`,
+      'Content-Length': head.length + audioSize + tail.length
+    }
+  }, (res) => {
+    let data = '';
+    res.on('data', c => data += c);
+    res.on('end', () => {
+      if (res.statusCode >= 200 && res.statusCode < 300) {
+        resolve(JSON.parse(data));
+      } else {
+        reject(new Error(`Buzzsprout HTTP ${res.statusCode}: ${data}`));
+      }
+    });
+    res.on('error', reject);
+  });
+  req.on('error', reject);
+  pipeMultipart(req, head, audioPath, tail).catch(reject);
+});
+
+return [{ json: result }];
+"""
+
+# ── Upload to Google Drive — streams the episode file from disk ───────────────
+JS_UPLOAD_GOOGLE_DRIVE = JS_ARTIFACTS + r"""
+if ($env.SAVE_LOCAL !== 'true') {
+  return [{ json: { skipped: true, fileId: null, webViewLink: null } }];
+}
+
+const https  = require('https');
+const crypto = require('crypto');
+const fs     = require('fs');
+
+const sa  = JSON.parse(fs.readFileSync('/config/google-service-account.json', 'utf8'));
+const now = Math.floor(Date.now() / 1000);
+
+// Build RS256-signed JWT for the service account
+const header  = Buffer.from(JSON.stringify({ alg: 'RS256', typ: 'JWT' })).toString('base64url');
+const payload = Buffer.from(JSON.stringify({
+  iss: sa.client_email,
+  scope: 'https://www.googleapis.com/auth/drive.file',
+  aud:  'https://oauth2.googleapis.com/token',
+  iat:  now,
+  exp:  now + 3600
+})).toString('base64url');
+
+const signer = crypto.createSign('RSA-SHA256');
+signer.update(`${header}.${payload}`);
+const jwt = `${header}.${payload}.${signer.sign(sa.private_key, 'base64url')}`;
+
+// Exchange JWT for an access token
+function post(hostname, path, headers, body) {
+  return new Promise((resolve, reject) => {
+    const req = https.request({ hostname, path, method: 'POST', headers }, res => {
+      let d = '';
+      res.on('data', c => d += c);
+      res.on('end', () => resolve({ status: res.statusCode, body: d }));
+    });
+    req.on('error', reject);
+    req.write(body);
+    req.end();
+  });
+}
+
+const tokenBody = `grant_type=urn%3Aietf%3Aparams%3Aoauth%3Agrant-type%3Ajwt-bearer&assertion=${jwt}`;
+const tokenRes  = await post(
+  'oauth2.googleapis.com', '/token',
+  { 'Content-Type': 'application/x-www-form-urlencoded', 'Content-Length': Buffer.byteLength(tokenBody) },
+  tokenBody
+);
+const { access_token: token } = JSON.parse(tokenRes.body);
+if (!token) throw new Error(`Token exchange failed: ${tokenRes.body}`);
+
+// Build multipart/related body: JSON metadata + MP3 binary
+const concatOut = $('Concatenate Audio').first().json;
+const audioSize = checkArtifact(concatOut.combined_path, concatOut.combined_bytes);
+const fileName  = concatOut.file_name;
+const folderId  = $env.GOOGLE_DRIVE_FOLDER_ID;
+const boundary  = `DriveUpload${Date.now()}`;
+const meta      = JSON.stringify({ name: fileName, parents: [folderId] });
+
+const head = Buffer.from(
+  `--${boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n${meta}\r\n` +
+  `--${boundary}\r\nContent-Type: audio/mpeg\r\n\r\n`
+);
+const tail = Buffer.from(`\r\n--${boundary}--`);
+
+// Upload via Drive API multipart endpoint, streaming the MP3 from disk
+const uploadRes = await new Promise((resolve, reject) => {
+  const req = https.request({
+    hostname: 'www.googleapis.com',
+    path:     '/upload/drive/v3/files?uploadType=multipart&fields=id,webViewLink&supportsAllDrives=true',
+    method:   'POST',
+    headers: {
+      'Authorization': `Bearer ${token}`,
+      'Content-Type':  `multipart/related; boundary=${boundary}`,
+      'Content-Length': head.length + audioSize + tail.length
+    }
+  }, res => {
+    let d = '';
+    res.on('data', c => d += c);
+    res.on('end', () => {
+      const parsed = JSON.parse(d);
+      if (res.statusCode >= 200 && res.statusCode < 300) resolve(parsed);
+      else reject(new Error(`Drive upload HTTP ${res.statusCode}: ${d}`));
+    });
+  });
+  req.on('error', reject);
+  pipeMultipart(req, head, concatOut.combined_path, tail).catch(reject);
+});
+
+return [{ json: { fileId: uploadRes.id, webViewLink: uploadRes.webViewLink, fileName } }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+let editorPatch         = null;
+let editorParallel      = null;
+let editorFacts         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+  editorPatch          = editorOut.editor_patch || null;
+  editorParallel       = editorOut.editor_parallel || null;
+  editorFacts          = editorOut.editor_fact_context || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    !!cache && String(cache).split('+').every(c => c === 'hit'),
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+let ttsSchedule     = null;
+let ttsCache        = null;
+let ttsCheckpoint   = null;
+try {
+  const voiceItems = $('Generate Voice (Sequential)').all();
+  ttsPrefetchHits  = voiceItems.filter(i => i.json.prefetched).length;
+  ttsSchedule      = (voiceItems[0] && voiceItems[0].json.tts_schedule) || null;
+  ttsCache         = (voiceItems[0] && voiceItems[0].json.tts_cache)    || null;
+  ttsCheckpoint    = (voiceItems[0] && voiceItems[0].json.tts_checkpoint) || null;
+} catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  tts_schedule:          ttsSchedule,
+  tts_cache:             ttsCache,
+  tts_checkpoint:        ttsCheckpoint,
+  artifacts:             concatOut.artifacts || null,
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  editor_patch:          editorPatch,
+  editor_parallel:       editorParallel,
+  editor_fact_context:   editorFacts,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Generate Voice (Sequential)":
+        n["parameters"]["jsCode"] = JS_GENERATE_VOICE
+        print("  ✓ Patched 'Generate Voice (Sequential)' — json.audio_path instead of audio_b64")
+    elif n["name"] == "Concatenate Audio":
+        n["parameters"]["jsCode"] = JS_CONCAT_AUDIO
+        print("  ✓ Patched 'Concatenate Audio' — json.combined_path instead of combined_b64")
+    elif n["name"] == "Upload to Buzzsprout":
+        n["parameters"]["jsCode"] = JS_UPLOAD_BUZZSPROUT
+        print("  ✓ Patched 'Upload to Buzzsprout' — streams combined_path")
+    elif n["name"] == "Upload to Google Drive":
+        n["parameters"]["jsCode"] = JS_UPLOAD_GOOGLE_DRIVE
+        print("  ✓ Patched 'Upload to Google Drive' — streams combined_path")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records artifacts")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
@@ -0,0 +1,305 @@
+"""
+Replaces the two-pass audio assembly in Concatenate Audio with a single ffmpeg
+filter graph. The old path encoded the concatenated speech to tts_all.mp3
+(-q:a 4), then decoded it again to mix in the intro and encoded a second time —
+two full encodes and a generation of MP3 loss. show-format.json also promised
+audio.normalize but nothing normalized.
+
+  - One invocation: concat demuxer over the line files → intro volume envelope
+    + 12s speech delay → amix → [normalization] → one libmp3lame encode
+  - Normalization is opt-in via show-format.json → audio.normalize: false
+    (default, fastest), "dynaudnorm" (cheap level matching between lines) or
+    "loudnorm" / true (EBU R128 to audio.loudness, default -16 LUFS integrated,
+    -1.5 dBTP, LRA 11 — about 2.5x the old path's wall time on its own)
+  - ffmpeg is called with an argv array (execFileSync), not a shell string
+  - Concatenate Audio reports assembly {passes, ms, normalize, loudnorm}; the run log
+    records it as audio_assembly
+  - scripts/bench_concat_audio.py times this graph, with each normalize
+    setting, against the old two-pass commands and measures loudness / true
+    peak of every output; scripts/bench_results/concat_audio.txt holds a run
+
+Run from repo root: python3 scripts/patch_audio_assembly.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX, JS_ARTIFACTS, JS_AUDIO_ASSEMBLY
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Concatenate Audio — single ffmpeg pass ────────────────────────────────────
+JS_CONCAT_AUDIO = JS_ARTIFACTS + JS_AUDIO_ASSEMBLY + r"""
+const fs           = require('fs');
+const { execFileSync } = require('child_process');
+const items = $input.all();
+const date  = new Date().toISOString().split('T')[0];
+const fname = `circuit-breakers-${date}.mp3`;
+
+const artCfg   = artifactConfig($('Fetch pipeline.json').first().json);
+const loudness = loudnessConfig($('Fetch show-format.json').first().json);
+const pruned = pruneArtifacts(artCfg, date);
+const artDir = artifactRunDir(artCfg, date);
+
+const tmpDir = `/tmp/ep-${Date.now()}`;
+fs.mkdirSync(tmpDir, { recursive: true });
+
+// TTS segments are already on disk — hand their paths straight to ffmpeg
+const segFiles = [];
+let ttsBytes = 0;
+items.forEach(item => {
+  if (!item.json.audio_path) return;
+  ttsBytes += checkArtifact(item.json.audio_path, item.json.bytes);
+  segFiles.push(item.json.audio_path);
+});
+
+const listFile = `${tmpDir}/list.txt`;
+fs.writeFileSync(listFile, segFiles.map(f => `file '${f}'`).join('\n'));
+
+// Concat + intro duck + loudness in one graph, one encode. Local runs write
+// the episode straight into /episodes/{date}/, otherwise it stays in the
+// run's artifact dir until the uploads have read it.
+const introPath  = '/assets/intro.mp3';
+const hasIntro   = fs.existsSync(introPath);
+const episodeDir = `/episodes/${date}`;
+const outDir     = $env.SAVE_LOCAL === 'true' ? episodeDir : artDir;
+const outFile    = `${outDir}/${fname}`;
+fs.mkdirSync(outDir, { recursive: true });
+
+const t0 = Date.now();
+execFileSync(FFMPEG, assemblyArgs({ listFile, introPath: hasIntro ? introPath : null, outFile, loudness }), {
+  timeout:   300000,
+  maxBuffer: 16 * 1024 * 1024
+});
+const assembly = {
+  passes:    1,
+  ms:        Date.now() - t0,
+  normalize: loudness.mode,
+  loudnorm:  loudness.enabled ? { I: loudness.integrated_lufs, TP: loudness.true_peak_db, LRA: loudness.lra } : null,
+  has_intro: hasIntro
+};
+const combinedBytes = checkArtifact(outFile);
+
+if ($env.SAVE_LOCAL === 'true') {
+  // Save transcript — prefer Editor Review output (corrected script), fall back to writer
+  let transcript = '';
+  try {
+    transcript = $('Editor Review').first().json.script || '';
+  } catch (_) {
+    try { transcript = $('Parse Writer Response').first().json.script || ''; } catch (_) {}
+  }
+  if (transcript) fs.writeFileSync(`${episodeDir}/transcript.txt`, transcript);
+}
+
+try { fs.rmSync(tmpDir, { recursive: true, force: true }); } catch (e) {}
+
+// Before/after numbers for the run log: what now rides in item JSON vs what
+// the base64 fields used to add to every execution
+const mb = n => Math.round(n / 1048576 * 10) / 10;
+const artifacts = {
+  dir:                   artDir,
+  tts_lines:             segFiles.length,
+  tts_bytes:             ttsBytes,
+  combined_bytes:        combinedBytes,
+  voice_item_json_bytes: items.reduce((a, i) => a + Buffer.byteLength(JSON.stringify(i.json)), 0),
+  base64_bytes_avoided:  items.reduce((a, i) => a + base64Bytes(i.json.bytes || 0), 0) + base64Bytes(combinedBytes),
+  heap_used_mb:          mb(process.memoryUsage().heapUsed),
+  max_rss_mb:            mb(process.resourceUsage().maxRSS * 1024),
+  pruned_runs:           pruned
+};
+
+return [{
+  json: {
+    file_name:      fname,
+    episode_dir:    episodeDir,
+    line_count:     items.length,
+    has_intro:      hasIntro,
+    combined_path:  outFile,
+    combined_bytes: combinedBytes,
+    artifacts,
+    assembly
+  }
+}];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+let editorPatch         = null;
+let editorParallel      = null;
+let editorFacts         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+  editorPatch          = editorOut.editor_patch || null;
+  editorParallel       = editorOut.editor_parallel || null;
+  editorFacts          = editorOut.editor_fact_context || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    !!cache && String(cache).split('+').every(c => c === 'hit'),
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+let ttsSchedule     = null;
+let ttsCache        = null;
+let ttsCheckpoint   = null;
+try {
+  const voiceItems = $('Generate Voice (Sequential)').all();
+  ttsPrefetchHits  = voiceItems.filter(i => i.json.prefetched).length;
+  ttsSchedule      = (voiceItems[0] && voiceItems[0].json.tts_schedule) || null;
+  ttsCache         = (voiceItems[0] && voiceItems[0].json.tts_cache)    || null;
+  ttsCheckpoint    = (voiceItems[0] && voiceItems[0].json.tts_checkpoint) || null;
+} catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  tts_schedule:          ttsSchedule,
+  tts_cache:             ttsCache,
+  tts_checkpoint:        ttsCheckpoint,
+  artifacts:             concatOut.artifacts || null,
+  audio_assembly:        concatOut.assembly  || null,
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  editor_patch:          editorPatch,
+  editor_parallel:       editorParallel,
+  editor_fact_context:   editorFacts,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Concatenate Audio":
+        n["parameters"]["jsCode"] = JS_CONCAT_AUDIO
+        print("  ✓ Patched 'Concatenate Audio' — single-pass concat + intro duck (+ optional normalization)")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records audio_assembly")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
@@ -0,0 +1,225 @@
+"""
+Per-line episode timeline from the TTS chunks themselves. Chapters, timing
+and length checks otherwise meant one ffprobe spawn per chunk (~200 a run).
+
+  - JS_AUDIO_TIMELINE mirrors scripts/audio_timeline.py: MP3 frame headers
+    plus the Xing/Info + LAME tag give exact frames, samples (encoder delay
+    and padding trimmed, as ffmpeg plays them) and bitrate; raw PCM chunks
+    are sized from their byte count
+  - Concatenate Audio builds start/end ms per line_index and speaker,
+    shifted by SPEECH_DELAY_MS when the intro bed is mixed in, and writes
+    timeline.json next to the episode (and transcript.txt when SAVE_LOCAL)
+  - The batch assembly's expected duration (ffmpeg timeout and progress)
+    now comes from the timeline instead of CBR size estimates
+  - Output gains timeline_path and timeline {lines, speech_ms, offset_ms,
+    parse_ms, mp3_frames}
+
+Run from repo root: python3 scripts/patch_audio_timeline.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import (
+    JS_ARTIFACTS, JS_FFMPEG_RUNNER, JS_AUDIO_ASSEMBLY, JS_INTRO_BED,
+    JS_AUDIO_TIMELINE
+)
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Concatenate Audio — assembly + per-line timeline ──────────────────────────
+JS_CONCAT_AUDIO = JS_ARTIFACTS + JS_AUDIO_ASSEMBLY + JS_FFMPEG_RUNNER + JS_INTRO_BED + JS_AUDIO_TIMELINE + r"""
+const fs    = require('fs');
+const items = $input.all();
+const date  = new Date().toISOString().split('T')[0];
+const fname = `circuit-breakers-${date}.mp3`;
+
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const artCfg   = artifactConfig(pipelineCfg);
+const ffCfg    = ffmpegConfig(pipelineCfg);
+const bedCfg   = introBedConfig(pipelineCfg);
+const loudness = loudnessConfig($('Fetch show-format.json').first().json);
+const pruned   = pruneArtifacts(artCfg, date);
+const artDir   = artifactRunDir(artCfg, date);
+
+// TTS segments are already on disk — hand their paths straight to ffmpeg
+const segFiles = [];
+let ttsBytes = 0;
+items.forEach(item => {
+  if (!item.json.audio_path) return;
+  ttsBytes += checkArtifact(item.json.audio_path, item.json.bytes);
+  segFiles.push(item.json.audio_path);
+});
+
+// Local runs write the episode straight into /episodes/{date}/, otherwise it
+// stays in the run's artifact dir until the uploads have read it.
+const introPath  = '/assets/intro.mp3';
+const hasIntro   = fs.existsSync(introPath);
+const episodeDir = `/episodes/${date}`;
+const outDir     = $env.SAVE_LOCAL === 'true' ? episodeDir : artDir;
+let   outFile    = `${outDir}/${fname}`;
+fs.mkdirSync(outDir, { recursive: true });
+const loudnorm   = loudness.enabled ? { I: loudness.integrated_lufs, TP: loudness.true_peak_db, LRA: loudness.lra } : null;
+
+// Exact per-line timing from the chunk bytes — PCM from its size, MP3 from
+// its frame headers. Speech starts SPEECH_DELAY_MS into the intro bed.
+const tParse = Date.now();
+let mp3Frames = 0;
+const chunks = items.filter(i => i.json.audio_path).map(i => {
+  const m = /^pcm_(\d+)$/.exec(i.json.audio_format || '');
+  const info = m ? pcmChunkInfo(i.json.bytes, Number(m[1])) : parseMp3(fs.readFileSync(i.json.audio_path));
+  mp3Frames += info.frames || 0;
+  return { line_index: i.json.line_index, speaker: i.json.speaker, samples: info.samples, sample_rate: info.sample_rate };
+});
+const offsetMs  = hasIntro ? SPEECH_DELAY_MS : 0;
+const timeline  = buildTimeline(chunks, offsetMs);
+const speechMs  = timeline.length ? timeline[timeline.length - 1].end_ms - offsetMs : 0;
+const parseMs   = Date.now() - tParse;
+
+// Generate Voice may already have encoded the episode while TTS was running
+const streamed = (items[0] && items[0].json.stream_assembly) || null;
+let assembly;
+if (streamed && streamed.path && !streamed.error) {
+  outFile  = streamed.path;
+  assembly = {
+    passes: 1, input: 'stream', ms: streamed.tail_ms, loudnorm, has_intro: hasIntro,
+    ffmpeg: streamed.ffmpeg || null, intro_bed: streamed.intro_bed || null
+  };
+} else {
+  const tmpDir = `/tmp/ep-${Date.now()}`;
+  fs.mkdirSync(tmpDir, { recursive: true });
+
+  // Raw PCM lines are byte-appended into one file — no decode per chunk and no
+  // MP3 frame padding between lines. Anything else goes through the concat list.
+  const pcmRate = items.length && items.every(i => /^pcm_/.test(i.json.audio_format || '') && i.json.sample_rate === items[0].json.sample_rate)
+    ? items[0].json.sample_rate : null;
+  let listFile = null, pcmFile = null;
+  if (pcmRate) {
+    pcmFile = `${tmpDir}/speech.pcm`;
+    const fd = fs.openSync(pcmFile, 'w');
+    for (const f of segFiles) {
+      const buf = fs.readFileSync(f);
+      fs.writeSync(fd, buf);
+      if (buf.length % 2) fs.writeSync(fd, Buffer.alloc(1));   // keep 16-bit sample alignment
+    }
+    fs.closeSync(fd);
+  } else {
+    listFile = `${tmpDir}/list.txt`;
+    fs.writeFileSync(listFile, segFiles.map(f => `file '${f}'`).join('\n'));
+  }
+
+  // Expected length (timeout, remaining-time estimate) from the timeline
+  const bed      = hasIntro ? await introBed(bedCfg, introPath, ffCfg) : null;
+  const totalSec = episodeDurationSec(speechMs / 1000, hasIntro ? await mediaDurationSec((bed && bed.path) || introPath) : null);
+
+  // Concat + intro overlay + loudness in one graph, one encode — awaited, so
+  // the worker keeps serving other executions meanwhile
+  const t0 = Date.now();
+  const ffmpeg = await runFfmpeg(
+    assemblyArgs({ listFile, pcmFile, sampleRate: pcmRate, introPath: hasIntro ? introPath : null, introBed: bed && bed.path, outFile, loudness }),
+    { durationSec: totalSec, timeoutMs: ffmpegTimeoutMs(ffCfg, totalSec), label: 'assembly' }
+  );
+  assembly = {
+    passes:    1,
+    input:     pcmRate ? `pcm_${pcmRate}` : 'mp3',
+    ms:        Date.now() - t0,
+    loudnorm,
+    has_intro: hasIntro,
+    ffmpeg,
+    intro_bed: bed,
+    ...(streamed && streamed.error ? { stream_error: streamed.error } : {})
+  };
+  try { fs.rmSync(tmpDir, { recursive: true, force: true }); } catch (e) {}
+}
+const combinedBytes = checkArtifact(outFile);
+
+const timelinePath = `${outDir}/timeline.json`;
+fs.writeFileSync(timelinePath, JSON.stringify({ file_name: fname, offset_ms: offsetMs, speech_ms: speechMs, lines: timeline }, null, 2));
+
+if ($env.SAVE_LOCAL === 'true') {
+  // Save transcript — prefer Editor Review output (corrected script), fall back to writer
+  let transcript = '';
+  try {
+    transcript = $('Editor Review').first().json.script || '';
+  } catch (_) {
+    try { transcript = $('Parse Writer Response').first().json.script || ''; } catch (_) {}
+  }
+  if (transcript) fs.writeFileSync(`${episodeDir}/transcript.txt`, transcript);
+}
+
+// Before/after numbers for the run log: what now rides in item JSON vs what
+// the base64 fields used to add to every execution
+const mb = n => Math.round(n / 1048576 * 10) / 10;
+const artifacts = {
+  dir:                   artDir,
+  tts_lines:             segFiles.length,
+  tts_bytes:             ttsBytes,
+  combined_bytes:        combinedBytes,
+  voice_item_json_bytes: items.reduce((a, i) => a + Buffer.byteLength(JSON.stringify(i.json)), 0),
+  base64_bytes_avoided:  items.reduce((a, i) => a + base64Bytes(i.json.bytes || 0), 0) + base64Bytes(combinedBytes),
+  heap_used_mb:          mb(process.memoryUsage().heapUsed),
+  max_rss_mb:            mb(process.resourceUsage().maxRSS * 1024),
+  pruned_runs:           pruned
+};
+
+return [{
+  json: {
+    file_name:      fname,
+    episode_dir:    episodeDir,
+    line_count:     items.length,
+    has_intro:      hasIntro,
+    combined_path:  outFile,
+    combined_bytes: combinedBytes,
+    timeline_path:  timelinePath,
+    timeline: {
+      lines:      timeline.length,
+      speech_ms:  speechMs,
+      offset_ms:  offsetMs,
+      parse_ms:   parseMs,
+      mp3_frames: mp3Frames
+    },
+    artifacts,
+    assembly
+  }
+}];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Concatenate Audio":
+        n["parameters"]["jsCode"] = JS_CONCAT_AUDIO
+        print("  ✓ Patched 'Concatenate Audio' — writes the per-line timeline")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
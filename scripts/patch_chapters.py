@@ -0,0 +1,566 @@
+"""
+Chapter markers and per-story timestamps from the TTS timeline — no
+re-analysis of the finished MP3.
+
+  - Story boundaries reuse the editor's segmentation (patch_editor_parallel.py)
+    on the voiced lines: cold-open tease, first line naming each curator story,
+    first deep-dive pick, Read These closers
+  - The per-line timeline (patch_audio_timeline.py, already shifted by the
+    12s intro delay) turns each boundary into start/end ms; the first chapter
+    opens at 0 so the intro belongs to the cold open
+  - Concatenate Audio writes an ID3v2.3 tag with CTOC + one CHAP per chapter
+    (TIT2, plus WXXX with the story URL) in front of the encoded frames —
+    replacing ffmpeg's TSSE-only tag, one copy pass, no re-encode. Applies to
+    the streamed and the batch episode alike; show-format.json
+    audio.chapters: false turns it off
+  - chapters go into timeline.json, the run log (chapters, timeline) and the
+    Telegram digest (⏱ mm:ss per chapter)
+
+Run from repo root: python3 scripts/patch_chapters.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import (
+    JS_STORY_INDEX, JS_ARTIFACTS, JS_FFMPEG_RUNNER, JS_AUDIO_ASSEMBLY,
+    JS_INTRO_BED, JS_AUDIO_TIMELINE
+)
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Story chapters ────────────────────────────────────────────────────────────
+# Lines carry no story labels, so boundaries come from the same matching the
+# editor uses to segment the script (patch_editor_parallel.py): the cold-open
+# tease, the first line naming each curator story, the first deep-dive pick
+# and the Read These closers from show-format.json. Run over the voiced lines,
+# each boundary is a line_index and the timeline turns it into milliseconds.
+JS_STORY_CHAPTERS = r"""
+const CHAPTER_STOP = new Set(['the', 'and', 'for', 'with', 'that', 'this', 'from', 'its', 'into', 'new', 'are', 'has', 'have', 'was', 'will', 'you', 'your', 'about', 'what', 'how', 'why', 'now', 'out']);
+const chapterNorm     = s => String(s || '').toLowerCase().replace(/[^a-z0-9' ]+/g, ' ').replace(/\s+/g, ' ').trim();
+const chapterKeywords = s => new Set(chapterNorm(s).split(' ').filter(w => w.length >= 3 && !CHAPTER_STOP.has(w)));
+
+function chapterTitleMatch(title) {
+  const kw = chapterKeywords(title);
+  if (kw.size < 2) return () => false;
+  return line => {
+    const lw = new Set(line.split(' '));
+    let hit = 0;
+    for (const w of kw) if (lw.has(w)) hit++;
+    return hit >= 2 && hit / kw.size >= 0.34;
+  };
+}
+
+// lines: [{ line_index, text }] in episode order → [{ kind, title, url, line_index }]
+function storyChapters(lines, brief, showFormat) {
+  const texts = lines.map(l => chapterNorm(l.text));
+  const N = texts.length;
+  if (!N) return [];
+  const findLine = (from, to, pred) => {
+    for (let i = Math.max(0, from); i < Math.min(to, N); i++) if (pred(texts[i])) return i;
+    return -1;
+  };
+
+  const readClose = (((showFormat || {}).segments || {}).read_these || {}).closing_lines || {};
+  const coldEnd = findLine(0, N, l => l.includes("let's get into it") || l.includes('lets get into it'));
+  const tomorrow = readClose.claire ? findLine(0, N, l => l.includes(chapterNorm(readClose.claire))) : -1;
+  const unfortunately = tomorrow >= 0 && readClose.flint_final
+    ? findLine(tomorrow + 1, tomorrow + 4, l => l.includes(chapterNorm(readClose.flint_final))) : -1;
+  const readEnd = unfortunately >= 0 ? unfortunately + 1 : (tomorrow >= 0 ? tomorrow + 1 : -1);
+
+  const chapters = [];
+  const add = (at, kind, title, url = null) => chapters.push({ kind, title, url, line_index: lines[at].line_index });
+  add(0, 'cold_open', 'Cold Open');
+  let cursor = coldEnd >= 0 ? coldEnd : 0;
+  const rapidEnd = readEnd >= 0 ? readEnd : N;
+  for (const story of (brief || {}).stories || []) {
+    const at = findLine(cursor + 1, rapidEnd, chapterTitleMatch(story.title));
+    if (at < 0) continue;
+    add(at, 'story', story.title, story.url || null);
+    cursor = at;
+  }
+  if (readEnd >= 0) {
+    const picks = ((brief || {}).deep_dive_picks || []).map(p => chapterTitleMatch(p.title));
+    const readStart = findLine(cursor + 1, readEnd, l => picks.some(m => m(l)));
+    if (readStart >= 0) add(readStart, 'read_these', 'Read These');
+    if (readEnd < N) add(readEnd, 'sign_off', 'Sign-off');
+  }
+  return chapters;
+}
+
+// Chapter times from the line timeline; the first chapter opens at 0 so the
+// intro bed belongs to the cold open
+function chapterTimes(chapters, timeline, episodeMs) {
+  const startOf = new Map(timeline.map(t => [t.line_index, t.start_ms]));
+  const out = chapters.map((c, i) => ({ ...c, start_ms: i === 0 ? 0 : startOf.get(c.line_index) }));
+  out.forEach((c, i) => { c.end_ms = i + 1 < out.length ? out[i + 1].start_ms : episodeMs; });
+  return out;
+}
+"""
+
+# ── ID3 chapter tag ───────────────────────────────────────────────────────────
+# ID3v2.3 with a CTOC (top-level, ordered) listing one CHAP per chapter; each
+# CHAP has TIT2 and, for stories, a WXXX link. The tag replaces ffmpeg's own
+# (it only holds TSSE) while the encoded frames are copied through untouched —
+# one sequential pass, no re-encode, for both the streamed and batch paths.
+JS_ID3_CHAPTERS = r"""
+function id3Frame(id, body) {
+  const head = Buffer.alloc(10);
+  head.write(id, 0, 'latin1');
+  head.writeUInt32BE(body.length, 4);
+  return Buffer.concat([head, body]);
+}
+
+// UTF-16 with BOM — the only Unicode encoding ID3v2.3 has
+function id3Text(id, text) {
+  return id3Frame(id, Buffer.concat([Buffer.from([1, 0xFF, 0xFE]), Buffer.from(String(text), 'utf16le')]));
+}
+
+function id3ChapterTag(chapters, title) {
+  const list   = chapters.slice(0, 255);
+  const ids    = list.map((c, i) => `chp${i}`);
+  const frames = [];
+  if (title) frames.push(id3Text('TIT2', title));
+  frames.push(id3Frame('CTOC', Buffer.concat([
+    Buffer.from('toc\0', 'latin1'),
+    Buffer.from([0x03, list.length]),             // top-level | ordered
+    ...ids.map(id => Buffer.from(`${id}\0`, 'latin1'))
+  ])));
+  list.forEach((c, i) => {
+    const times = Buffer.alloc(16);
+    times.writeUInt32BE(c.start_ms, 0);
+    times.writeUInt32BE(c.end_ms, 4);
+    times.writeUInt32BE(0xFFFFFFFF, 8);            // no byte offsets
+    times.writeUInt32BE(0xFFFFFFFF, 12);
+    const sub = [id3Text('TIT2', c.title)];
+    if (c.url) sub.push(id3Frame('WXXX', Buffer.concat([Buffer.from([0, 0]), Buffer.from(String(c.url).replace(/[^\x20-\x7E]/g, encodeURIComponent), 'latin1')])));
+    frames.push(id3Frame('CHAP', Buffer.concat([Buffer.from(`${ids[i]}\0`, 'latin1'), times, ...sub])));
+  });
+  const body = Buffer.concat(frames);
+  const n = body.length;
+  return Buffer.concat([
+    Buffer.from([0x49, 0x44, 0x33, 3, 0, 0, (n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F]),
+    body
+  ]);
+}
+
+// Rewrites file as tag + its audio frames (any existing ID3v2 tag dropped)
+async function writeId3Tag(file, tag) {
+  const fs   = require('fs');
+  const head = Buffer.alloc(10);
+  const fd   = fs.openSync(file, 'r');
+  fs.readSync(fd, head, 0, 10, 0);
+  fs.closeSync(fd);
+  const skip = id3v2Size(head);
+  const tmp  = `${file}.id3.tmp`;
+  fs.writeFileSync(tmp, tag);
+  try {
+    await new Promise((resolve, reject) => {
+      const rs = fs.createReadStream(file, { start: skip });
+      const ws = fs.createWriteStream(tmp, { flags: 'a' });
+      rs.on('error', reject);
+      ws.on('error', reject);
+      ws.on('finish', resolve);
+      rs.pipe(ws);
+    });
+    fs.renameSync(tmp, file);
+  } catch (e) {
+    try { fs.unlinkSync(tmp); } catch (err) {}
+    throw e;
+  }
+  return { tag_bytes: tag.length, replaced_bytes: skip };
+}
+"""
+
+# ── Concatenate Audio — assembly, timeline, chapters ──────────────────────────
+JS_CONCAT_AUDIO = (JS_ARTIFACTS + JS_AUDIO_ASSEMBLY + JS_FFMPEG_RUNNER + JS_INTRO_BED + JS_AUDIO_TIMELINE
+                   + JS_STORY_CHAPTERS + JS_ID3_CHAPTERS + r"""
+const fs    = require('fs');
+const items = $input.all();
+const date  = new Date().toISOString().split('T')[0];
+const fname = `circuit-breakers-${date}.mp3`;
+
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const artCfg   = artifactConfig(pipelineCfg);
+const ffCfg    = ffmpegConfig(pipelineCfg);
+const bedCfg   = introBedConfig(pipelineCfg);
+const showFormat = $('Fetch show-format.json').first().json;
+const loudness = loudnessConfig(showFormat);
+const pruned   = pruneArtifacts(artCfg, date);
+const artDir   = artifactRunDir(artCfg, date);
+
+// TTS segments are already on disk — hand their paths straight to ffmpeg
+const segFiles = [];
+let ttsBytes = 0;
+items.forEach(item => {
+  if (!item.json.audio_path) return;
+  ttsBytes += checkArtifact(item.json.audio_path, item.json.bytes);
+  segFiles.push(item.json.audio_path);
+});
+
+// Local runs write the episode straight into /episodes/{date}/, otherwise it
+// stays in the run's artifact dir until the uploads have read it.
+const introPath  = '/assets/intro.mp3';
+const hasIntro   = fs.existsSync(introPath);
+const episodeDir = `/episodes/${date}`;
+const outDir     = $env.SAVE_LOCAL === 'true' ? episodeDir : artDir;
+let   outFile    = `${outDir}/${fname}`;
+fs.mkdirSync(outDir, { recursive: true });
+const loudnorm   = loudness.enabled ? { I: loudness.integrated_lufs, TP: loudness.true_peak_db, LRA: loudness.lra } : null;
+
+// Exact per-line timing from the chunk bytes — PCM from its size, MP3 from
+// its frame headers. Speech starts SPEECH_DELAY_MS into the intro bed.
+const tParse = Date.now();
+let mp3Frames = 0;
+const chunks = items.filter(i => i.json.audio_path).map(i => {
+  const m = /^pcm_(\d+)$/.exec(i.json.audio_format || '');
+  const info = m ? pcmChunkInfo(i.json.bytes, Number(m[1])) : parseMp3(fs.readFileSync(i.json.audio_path));
+  mp3Frames += info.frames || 0;
+  return { line_index: i.json.line_index, speaker: i.json.speaker, samples: info.samples, sample_rate: info.sample_rate };
+});
+const offsetMs  = hasIntro ? SPEECH_DELAY_MS : 0;
+const timeline  = buildTimeline(chunks, offsetMs);
+const speechMs  = timeline.length ? timeline[timeline.length - 1].end_ms - offsetMs : 0;
+const parseMs   = Date.now() - tParse;
+
+// Generate Voice may already have encoded the episode while TTS was running
+const streamed = (items[0] && items[0].json.stream_assembly) || null;
+let assembly;
+if (streamed && streamed.path && !streamed.error) {
+  outFile  = streamed.path;
+  assembly = {
+    passes: 1, input: 'stream', ms: streamed.tail_ms, loudnorm, has_intro: hasIntro,
+    ffmpeg: streamed.ffmpeg || null, intro_bed: streamed.intro_bed || null
+  };
+} else {
+  const tmpDir = `/tmp/ep-${Date.now()}`;
+  fs.mkdirSync(tmpDir, { recursive: true });
+
+  // Raw PCM lines are byte-appended into one file — no decode per chunk and no
+  // MP3 frame padding between lines. Anything else goes through the concat list.
+  const pcmRate = items.length && items.every(i => /^pcm_/.test(i.json.audio_format || '') && i.json.sample_rate === items[0].json.sample_rate)
+    ? items[0].json.sample_rate : null;
+  let listFile = null, pcmFile = null;
+  if (pcmRate) {
+    pcmFile = `${tmpDir}/speech.pcm`;
+    const fd = fs.openSync(pcmFile, 'w');
+    for (const f of segFiles) {
+      const buf = fs.readFileSync(f);
+      fs.writeSync(fd, buf);
+      if (buf.length % 2) fs.writeSync(fd, Buffer.alloc(1));   // keep 16-bit sample alignment
+    }
+    fs.closeSync(fd);
+  } else {
+    listFile = `${tmpDir}/list.txt`;
+    fs.writeFileSync(listFile, segFiles.map(f => `file '${f}'`).join('\n'));
+  }
+
+  // Expected length (timeout, remaining-time estimate) from the timeline
+  const bed      = hasIntro ? await introBed(bedCfg, introPath, ffCfg) : null;
+  const totalSec = episodeDurationSec(speechMs / 1000, hasIntro ? await mediaDurationSec((bed && bed.path) || introPath) : null);
+
+  // Concat + intro overlay + loudness in one graph, one encode — awaited, so
+  // the worker keeps serving other executions meanwhile
+  const t0 = Date.now();
+  const ffmpeg = await runFfmpeg(
+    assemblyArgs({ listFile, pcmFile, sampleRate: pcmRate, introPath: hasIntro ? introPath : null, introBed: bed && bed.path, outFile, loudness }),
+    { durationSec: totalSec, timeoutMs: ffmpegTimeoutMs(ffCfg, totalSec), label: 'assembly' }
+  );
+  assembly = {
+    passes:    1,
+    input:     pcmRate ? `pcm_${pcmRate}` : 'mp3',
+    ms:        Date.now() - t0,
+    loudnorm,
+    has_intro: hasIntro,
+    ffmpeg,
+    intro_bed: bed,
+    ...(streamed && streamed.error ? { stream_error: streamed.error } : {})
+  };
+  try { fs.rmSync(tmpDir, { recursive: true, force: true }); } catch (e) {}
+}
+
+// Story chapters: boundaries from the voiced lines, times from the timeline.
+// Episode end is what ffmpeg actually encoded when known (a long intro bed can
+// outlast the speech).
+const texts = new Map();
+try { $('Split Script into Lines').all().forEach(i => texts.set(i.json.line_index, i.json.text)); } catch (e) {}
+const voiced     = items.map(i => ({ line_index: i.json.line_index, text: texts.get(i.json.line_index) || '' }))
+                        .sort((a, b) => a.line_index - b.line_index);
+const encodedMs  = Math.round(((assembly.ffmpeg || {}).out_time_s || 0) * 1000);
+const episodeMs  = Math.max(offsetMs + speechMs, encodedMs);
+let brief = {};
+try { brief = $('Parse Curator Response').first().json.brief || {}; } catch (e) {}
+const chapters = chapterTimes(storyChapters(voiced, brief, showFormat), timeline, episodeMs);
+
+let chaptersTag = null;
+if (((showFormat.audio || {}).chapters !== false) && chapters.length) {
+  let title = null;
+  try { title = $('Parse Writer Response').first().json.episode_title || null; } catch (e) {}
+  const t0 = Date.now();
+  try {
+    chaptersTag = { chapters: chapters.length, ...(await writeId3Tag(outFile, id3ChapterTag(chapters, title))), ms: null, error: null };
+    chaptersTag.ms = Date.now() - t0;
+  } catch (e) {
+    // The episode is still fine without chapters
+    chaptersTag = { chapters: 0, tag_bytes: 0, replaced_bytes: 0, ms: Date.now() - t0, error: String(e.message).slice(0, 300) };
+  }
+}
+const combinedBytes = checkArtifact(outFile);
+
+const timelinePath = `${outDir}/timeline.json`;
+fs.writeFileSync(timelinePath, JSON.stringify({ file_name: fname, offset_ms: offsetMs, speech_ms: speechMs, episode_ms: episodeMs, chapters, lines: timeline }, null, 2));
+
+if ($env.SAVE_LOCAL === 'true') {
+  // Save transcript — prefer Editor Review output (corrected script), fall back to writer
+  let transcript = '';
+  try {
+    transcript = $('Editor Review').first().json.script || '';
+  } catch (_) {
+    try { transcript = $('Parse Writer Response').first().json.script || ''; } catch (_) {}
+  }
+  if (transcript) fs.writeFileSync(`${episodeDir}/transcript.txt`, transcript);
+}
+
+// Before/after numbers for the run log: what now rides in item JSON vs what
+// the base64 fields used to add to every execution
+const mb = n => Math.round(n / 1048576 * 10) / 10;
+const artifacts = {
+  dir:                   artDir,
+  tts_lines:             segFiles.length,
+  tts_bytes:             ttsBytes,
+  combined_bytes:        combinedBytes,
+  voice_item_json_bytes: items.reduce((a, i) => a + Buffer.byteLength(JSON.stringify(i.json)), 0),
+  base64_bytes_avoided:  items.reduce((a, i) => a + base64Bytes(i.json.bytes || 0), 0) + base64Bytes(combinedBytes),
+  heap_used_mb:          mb(process.memoryUsage().heapUsed),
+  max_rss_mb:            mb(process.resourceUsage().maxRSS * 1024),
+  pruned_runs:           pruned
+};
+
+return [{
+  json: {
+    file_name:      fname,
+    episode_dir:    episodeDir,
+    line_count:     items.length,
+    has_intro:      hasIntro,
+    combined_path:  outFile,
+    combined_bytes: combinedBytes,
+    timeline_path:  timelinePath,
+    timeline: {
+      lines:      timeline.length,
+      speech_ms:  speechMs,
+      offset_ms:  offsetMs,
+      parse_ms:   parseMs,
+      mp3_frames: mp3Frames
+    },
+    chapters,
+    chapters_tag:   chaptersTag,
+    artifacts,
+    assembly
+  }
+}];
+""")
+
+
+# ── Write Run Log — adds timeline + chapters ──────────────────────────────────
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+let editorPatch         = null;
+let editorParallel      = null;
+let editorFacts         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+  editorPatch          = editorOut.editor_patch || null;
+  editorParallel       = editorOut.editor_parallel || null;
+  editorFacts          = editorOut.editor_fact_context || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    !!cache && String(cache).split('+').every(c => c === 'hit'),
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+let ttsSchedule     = null;
+let ttsCache        = null;
+let ttsCheckpoint   = null;
+try {
+  const voiceItems = $('Generate Voice (Sequential)').all();
+  ttsPrefetchHits  = voiceItems.filter(i => i.json.prefetched).length;
+  ttsSchedule      = (voiceItems[0] && voiceItems[0].json.tts_schedule) || null;
+  ttsCache         = (voiceItems[0] && voiceItems[0].json.tts_cache)    || null;
+  ttsCheckpoint    = (voiceItems[0] && voiceItems[0].json.tts_checkpoint) || null;
+} catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  tts_schedule:          ttsSchedule,
+  tts_cache:             ttsCache,
+  tts_checkpoint:        ttsCheckpoint,
+  artifacts:             concatOut.artifacts || null,
+  audio_assembly:        concatOut.assembly  || null,
+  timeline:              concatOut.timeline  || null,
+  chapters:              (concatOut.chapters || []).map(c => ({ kind: c.kind, title: c.title, url: c.url, start_ms: c.start_ms, end_ms: c.end_ms })),
+  chapters_tag:          concatOut.chapters_tag || null,
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  editor_patch:          editorPatch,
+  editor_parallel:       editorParallel,
+  editor_fact_context:   editorFacts,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Telegram digest text — chapter timestamps ─────────────────────────────────
+# As create_workflow_pipeline.py's TG_DIGEST_TEXT, plus a ⏱ list of chapters
+# (mm:ss) when Concatenate Audio found any. Titles lose Markdown characters so
+# one odd headline can't break the message.
+TG_DIGEST_TEXT = (
+    "={{ `📻 *Circuit Breakers — ${$('Parse Writer Response').first().json.episode_title}*\\n\\n"
+    "${$('Parse Writer Response').first().json.episode_description}\\n\\n"
+    "${(() => { const ch = $('Concatenate Audio').first().json.chapters || [];"
+    " const ts = ms => Math.floor(ms / 60000) + ':' + String(Math.floor(ms / 1000) % 60).padStart(2, '0');"
+    " return ch.length ? '⏱ *Chapters:*\\n' + ch.map(c => '• ' + ts(c.start_ms) + ' ' + String(c.title).replace(/[*_`\\[\\]]/g, '')).join('\\n') + '\\n\\n' : ''; })()}"
+    "📖 *Deep Dives:*\\n"
+    "${$('Parse Writer Response').first().json.deep_dives.map(d => '• ' + d.tease + '\\n  ' + d.url).join('\\n')}\\n\\n"
+    "🎧 ${$('Upload to Buzzsprout').first().json.audio_url || '(processing)'}` }}"
+)
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Concatenate Audio":
+        n["parameters"]["jsCode"] = JS_CONCAT_AUDIO
+        print("  ✓ Patched 'Concatenate Audio' — story chapters + ID3 CHAP/CTOC")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records timeline + chapters")
+    elif n["name"] == "Send Telegram Digest":
+        n["parameters"]["text"] = TG_DIGEST_TEXT
+        print("  ✓ Patched 'Send Telegram Digest' — chapter timestamps")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
@@ -0,0 +1,352 @@
+"""
+Adds a content-addressed response cache in front of every Claude call in the
+Daily Pipeline, so re-running a day after a TTS/upload failure doesn't pay for
+the curator, writer and editor again.
+
+  - 'Call Claude - Curator' and 'Call Claude - Writer' become Code nodes (same
+    names, same output shape as the HTTP nodes they replace) that go through
+    cachedClaude(); Editor Review uses the same helper
+  - Cache: one JSON file per sha256(model, system, messages, max_tokens) under
+    pipeline.json → claude_cache.dir, size-capped at claude_cache.max_mb with
+    least-recently-used eviction
+  - Only complete replies (stop_reason end_turn) are stored; Parse Curator
+    Response and Editor Review drop a cached reply they can't parse, so a bad
+    response is never replayed into every rerun of the day
+  - Per-run policy reuse | refresh | bypass — run the workflow through the new
+    'Rerun Trigger' with {"claude_cache_policy": "refresh"}, or set
+    CLAUDE_CACHE_POLICY (docker-compose passes it through) /
+    pipeline.json → claude_cache.policy for every run
+  - Keys only repeat if the prompts do: Ingest & Filter News replays the day's
+    feed snapshot on a same-day rerun (patch_story_index.py), so curator,
+    writer and editor all see the first run's inputs
+  - Write Run Log records claude_cache (hit/miss/refresh/bypass per agent) and
+    flags replayed usage in claude_usage
+
+Run from repo root: python3 scripts/patch_claude_cache.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX, JS_CLAUDE_CLIENT
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+JS_CALL_CURATOR = JS_CLAUDE_CLIENT + r"""
+const input = $('Build Curator Input').first().json;
+const { response, cache, key } = await cachedClaude({
+  model:      'claude-sonnet-4-6',
+  max_tokens: 4096,
+  system:     [{ type: 'text', text: input.system_prompt, cache_control: { type: 'ephemeral' } }],
+  messages:   [{ role: 'user', content: input.user_content }]
+});
+return [{ json: { ...response, _claude_cache: cache, _claude_cache_key: key } }];
+"""
+
+JS_CALL_WRITER = JS_CLAUDE_CLIENT + r"""
+const input = $('Build Writer Input').first().json;
+const { response, cache, key } = await cachedClaude({
+  model:      'claude-sonnet-4-6',
+  max_tokens: 8192,
+  system:     [{ type: 'text', text: input.system_prompt, cache_control: { type: 'ephemeral' } }],
+  messages:   [{ role: 'user', content: input.user_content }]
+});
+return [{ json: { ...response, _claude_cache: cache, _claude_cache_key: key } }];
+"""
+
+JS_PARSE_CURATOR = JS_CLAUDE_CLIENT + r"""
+function extractJson(text) {
+  // Find all ```json or ``` fences — take the last one (metadata is last for writer)
+  const fences = [...text.matchAll(/```(?:json)?\s*\n([\s\S]*?)\n```/g)];
+  if (fences.length > 0) return fences[fences.length - 1][1].trim();
+  // Fallback: first bare JSON object or array in the text
+  const bare = text.match(/(\{[\s\S]*\}|\[[\s\S]*\])/);
+  if (bare) return bare[1].trim();
+  return text.trim();
+}
+
+const reply = $input.first().json;
+let brief;
+try {
+  brief = JSON.parse(extractJson(reply.content[0].text));
+} catch (e) {
+  // The next run must ask again rather than replay a brief we can't read
+  dropClaudeCache(reply._claude_cache_key);
+  throw e;
+}
+return [{ json: { brief } }];
+"""
+
+# ── Workflow 01 Code nodes ────────────────────────────────────────────────────
+JS_EDITOR_REVIEW = JS_CLAUDE_CLIENT + r"""
+const https = require('https');
+
+const systemPrompt = $('Fetch Editor Prompt').first().json.data;
+const writerOut    = $('Parse Writer Response').first().json;
+const script       = writerOut.script || '';
+const episodeTitle = writerOut.episode_title || 'Circuit Breakers Daily';
+const ingestOut    = $('Ingest & Filter News').first().json;
+const stories      = ingestOut.stories || [];
+
+const sourceContext = stories.slice(0, 30)
+  .map(s => `- ${s.title} (${s.source}): ${(s.description || '').slice(0, 200)}`)
+  .join('\n');
+
+const userMessage = `EPISODE TITLE: ${episodeTitle}
+
+SOURCE STORIES (ground truth for fact-checking):
+${sourceContext}
+
+SCRIPT TO REVIEW:
+${script}`;
+
+const { response: result, cache: editorCache, key: editorKey } = await cachedClaude({
+  model:      'claude-sonnet-4-6',
+  max_tokens: 10000,
+  system:     [{ type: 'text', text: systemPrompt, cache_control: { type: 'ephemeral' } }],
+  messages:   [{ role: 'user', content: userMessage }]
+});
+
+const text = result.content[0].text.trim();
+let review;
+try {
+  const clean = text.replace(/^```json\s*/, '').replace(/\s*```$/, '');
+  review = JSON.parse(clean);
+} catch (e) {
+  // Pass script through unchanged on parse error; don't replay the reply
+  dropClaudeCache(editorKey);
+  return [{ json: {
+    ...writerOut,
+    editorial_changes:    [`Editor parse error: ${e.message}`],
+    hallucinations_found: [],
+    editor_approved:      false,
+    editor_usage:         result.usage || null,
+    editor_cache:         editorCache
+  } }];
+}
+
+// Send Telegram alert if hallucinations were found
+if (review.hallucinations_found && review.hallucinations_found.length > 0) {
+  const alertText = `⚠️ *Editor Alert — ${episodeTitle}*\n\nHallucinations detected:\n` +
+    review.hallucinations_found.map(h => `• ${h}`).join('\n') +
+    `\n\nThe episode will still be generated with corrections applied.`;
+
+  const tgBody = JSON.stringify({
+    chat_id:    $env.TELEGRAM_CHAT_ID,
+    text:       alertText,
+    parse_mode: 'Markdown'
+  });
+
+  await new Promise((resolve) => {
+    const req = https.request({
+      hostname: 'api.telegram.org',
+      path:     `/bot${$env.TELEGRAM_BOT_TOKEN}/sendMessage`,
+      method:   'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(tgBody) }
+    }, res => { res.on('data', () => {}); res.on('end', resolve); });
+    req.on('error', resolve); // don't block pipeline on Telegram failure
+    req.write(tgBody);
+    req.end();
+  });
+}
+
+return [{ json: {
+  ...writerOut,
+  script:               review.script || script,
+  editorial_changes:    review.changes || [],
+  hallucinations_found: review.hallucinations_found || [],
+  editor_approved:      review.approved !== false,
+  editor_usage:         result.usage || null,
+  editor_cache:         editorCache
+} }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    cache === 'hit',
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+CALL_NODES = {
+    "Call Claude - Curator": JS_CALL_CURATOR,
+    "Call Claude - Writer":  JS_CALL_WRITER,
+}
+
+# Second entry point for reruns: same wiring as Daily Schedule, but it takes
+# input ({"claude_cache_policy": "refresh"}) that claudeCacheConfig() reads
+RERUN_TRIGGER = {
+    "parameters": {},
+    "id": "rerun-trigger",
+    "name": "Rerun Trigger",
+    "type": "n8n-nodes-base.executeWorkflowTrigger",
+    "typeVersion": 1,
+    "position": [240, 500]
+}
+
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+nodes = wf["nodes"]
+for n in nodes:
+    if n["name"] in CALL_NODES:
+        # HTTP Request → Code node; name/id/position kept so wiring is untouched
+        n["type"]        = "n8n-nodes-base.code"
+        n["typeVersion"] = 2
+        n["parameters"]  = {"jsCode": CALL_NODES[n["name"]], "mode": "runOnceForAllItems"}
+        n.pop("credentials", None)
+        print(f"  ✓ Replaced '{n['name']}' with cached Code node")
+    elif n["name"] == "Parse Curator Response":
+        n["parameters"]["jsCode"] = JS_PARSE_CURATOR
+        print("  ✓ Patched 'Parse Curator Response' — drops unparseable cached replies")
+    elif n["name"] == "Editor Review":
+        n["parameters"]["jsCode"] = JS_EDITOR_REVIEW
+        print("  ✓ Patched 'Editor Review' — cached Claude call")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records claude_cache")
+
+if not any(n["name"] == "Rerun Trigger" for n in nodes):
+    nodes.append(RERUN_TRIGGER)
+    wf["connections"]["Rerun Trigger"] = {"main": [[{"node": "Fetch sources.json", "type": "main", "index": 0}]]}
+    print("  ✓ Added 'Rerun Trigger' → Fetch sources.json")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": nodes,
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
+print()
+print("Force fresh responses for one run: execute the workflow through 'Rerun Trigger'")
+print('(an Execute Workflow node, e.g. from the Concierge) with')
+print('  {"claude_cache_policy": "refresh"}   (or "bypass" to skip the cache entirely)')
+print("For every run: set CLAUDE_CACHE_POLICY or claude_cache.policy in pipeline.json")
@@ -0,0 +1,366 @@
+"""
+Adds near-duplicate story clustering after ingest so cross-coverage is
+computed locally instead of by the curator model.
+
+  - New 'Cluster Stories' node between 'Exclude Covered Stories' and
+    'Fetch Curator Prompt'
+  - Each story is shingled (title + first 40 words of description, stopwords
+    dropped; shingle_size 1 = word sets, since outlets reword and reorder the
+    same headline). Words in at least clustering.generic_df of the day's
+    stories ("ai", "openai", "model") are dropped first, so headlines can't
+    match on the day's common vocabulary alone
+  - Every pair is screened by its 128-hash MinHash estimate (no LSH banding —
+    ~100 stories is ~5k signature compares) and pairs near the threshold are
+    confirmed with exact Jaccard ≥ pipeline.json → clustering.threshold
+  - Complete linkage: clusters merge only if every cross pair matches, so a
+    chain A~B~C through shared generic words never becomes one cluster
+  - One representative per cluster (best tier, then most recent — the feed
+    order) carries source_count, sources[], related_urls[] and the max HN score
+  - Build Curator Input sends the clustered feed; Write Run Log records
+    cluster stats
+
+Run from repo root: python3 scripts/patch_cluster_stories.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Cluster Stories ───────────────────────────────────────────────────────────
+JS_CLUSTER_STORIES = r"""
+const input   = $('Exclude Covered Stories').first().json;
+const cfg     = $('Fetch pipeline.json').first().json.clustering || {};
+const SHINGLE    = cfg.shingle_size || 1;
+const NUM_HASH   = cfg.num_hashes   || 128;
+const THRESHOLD  = cfg.threshold    || 0.4;
+const GENERIC_DF = cfg.generic_df   ?? 0.2;
+const DESC_WORDS = 40;
+// A pair is only checked exactly when its MinHash estimate is within this of
+// THRESHOLD — about 3.5 standard errors at 128 hashes, so no real match is lost
+const SCREEN_MARGIN = 0.15;
+
+const STOPWORDS = new Set(('a an the and or of to in on for with at by from is are was be as its it this ' +
+  'that new how why what says after into over about vs has have will can their they we you our').split(' '));
+
+function fnv1a(str) {
+  let h = 0x811c9dc5;
+  for (let i = 0; i < str.length; i++) {
+    h ^= str.charCodeAt(i);
+    h = Math.imul(h, 0x01000193);
+  }
+  return h >>> 0;
+}
+
+// Deterministic hash family: h_i(x) = a_i * x + b_i (mod 2^32), a_i odd
+function mulberry32(seed) {
+  return () => {
+    seed = (seed + 0x6D2B79F5) | 0;
+    let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+    t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+    return (t ^ (t >>> 14)) >>> 0;
+  };
+}
+const rand   = mulberry32(42);
+const HASH_A = Array.from({ length: NUM_HASH }, () => rand() | 1);
+const HASH_B = Array.from({ length: NUM_HASH }, () => rand());
+
+function words(text) {
+  return String(text || '').toLowerCase()
+    .replace(/[^a-z0-9\s]/g, ' ')
+    .split(/\s+/)
+    .filter(w => w.length > 1 && !STOPWORDS.has(w));
+}
+
+function storyWords(story) {
+  return [...words(story.title), ...words(story.description).slice(0, DESC_WORDS)];
+}
+
+function shingles(w, generic) {
+  w = w.filter(x => !generic.has(x));
+  const out = new Set();
+  for (let i = 0; i + SHINGLE <= w.length; i++) out.add(w.slice(i, i + SHINGLE).join(' '));
+  return out;
+}
+
+function minhash(set) {
+  const sig = new Uint32Array(NUM_HASH).fill(0xFFFFFFFF);
+  for (const s of set) {
+    const x = fnv1a(s);
+    for (let i = 0; i < NUM_HASH; i++) {
+      const v = (Math.imul(HASH_A[i], x) + HASH_B[i]) >>> 0;
+      if (v < sig[i]) sig[i] = v;
+    }
+  }
+  return sig;
+}
+
+function estimate(a, b) {
+  let same = 0;
+  for (let i = 0; i < NUM_HASH; i++) if (a[i] === b[i]) same++;
+  return same / NUM_HASH;
+}
+
+function jaccard(a, b) {
+  if (!a.size || !b.size) return 0;
+  let inter = 0;
+  for (const s of a) if (b.has(s)) inter++;
+  return inter / (a.size + b.size - inter);
+}
+
+const stories = input.stories || [];
+const tokens  = stories.map(storyWords);
+
+// Words most of the day's feed shares ("ai", "openai", "model" on an AI news
+// day) say nothing about which stories are the same one; drop them before
+// shingling so two headlines can't match on them alone
+const df = new Map();
+for (const t of tokens) for (const w of new Set(t)) df.set(w, (df.get(w) || 0) + 1);
+const genericMin = Math.max(5, Math.ceil(GENERIC_DF * stories.length));
+const generic = new Set([...df].filter(([, n]) => n >= genericMin).map(([w]) => w));
+
+const sets = tokens.map(t => shingles(t, generic));
+const sigs = sets.map(minhash);
+
+// MinHash screens every pair; exact Jaccard decides the ones near THRESHOLD
+const links = [];
+let pairsCompared = 0, pairsConfirmed = 0;
+for (let i = 0; i < stories.length; i++) {
+  if (!sets[i].size) continue;
+  for (let j = i + 1; j < stories.length; j++) {
+    if (!sets[j].size) continue;
+    pairsCompared++;
+    if (estimate(sigs[i], sigs[j]) < THRESHOLD - SCREEN_MARGIN) continue;
+    pairsConfirmed++;
+    const sim = jaccard(sets[i], sets[j]);
+    if (sim >= THRESHOLD) links.push({ i, j, sim });
+  }
+}
+
+// Complete linkage: two clusters merge only if every cross pair is a link, so
+// A~B and B~C never pull an unrelated A and C together through B
+const linked  = new Set(links.map(l => `${l.i}-${l.j}`));
+const isLink  = (a, b) => linked.has(a < b ? `${a}-${b}` : `${b}-${a}`);
+const members = stories.map((_, i) => [i]);
+const owner   = stories.map((_, i) => i);
+links.sort((a, b) => b.sim - a.sim || a.i - b.i || a.j - b.j);
+for (const { i, j } of links) {
+  const ci = owner[i], cj = owner[j];
+  if (ci === cj) continue;
+  if (!members[ci].every(a => members[cj].every(b => isLink(a, b)))) continue;
+  // Keep the earlier (better tier / more recent) story's cluster
+  const [keep, drop] = ci < cj ? [ci, cj] : [cj, ci];
+  for (const m of members[drop]) owner[m] = keep;
+  members[keep].push(...members[drop]);
+  members[drop] = [];
+}
+
+// Representative = first member in feed order (already tier/recency sorted)
+const clusters = new Map();
+stories.forEach((story, i) => {
+  const root = owner[i];
+  if (!clusters.has(root)) clusters.set(root, []);
+  clusters.get(root).push(story);
+});
+
+const out = [];
+for (const members of clusters.values()) {
+  const rep     = members[0];
+  const sources = [...new Set(members.map(m => m.source))];
+  const hn      = members.map(m => m.hn_score || 0);
+  out.push({
+    ...rep,
+    hn_score:     Math.max(...hn) || null,
+    source_count: sources.length,
+    sources,
+    related_urls: members.slice(1).map(m => m.url)
+  });
+}
+
+return [{ json: {
+  stories: out,
+  total:   out.length,
+  clustering: {
+    stories_in:      stories.length,
+    clusters:        out.length,
+    merged:          stories.length - out.length,
+    multi_source:    out.filter(s => s.source_count > 1).length,
+    generic_words:   [...generic].sort(),
+    pairs_compared:  pairsCompared,
+    pairs_confirmed: pairsConfirmed
+  }
+} }];
+"""
+
+JS_BUILD_CURATOR = r"""
+const stories    = $('Cluster Stories').first().json.stories;
+const showFormat = $('Fetch show-format.json').first().json;
+const prompt     = $('Fetch Curator Prompt').first().json.data;
+
+const userMessage = [
+  `DATE: ${new Date().toISOString().split('T')[0]}`,
+  '',
+  'SHOW FORMAT REFERENCE:',
+  JSON.stringify({
+    episode_length_minutes: showFormat.episode_length_minutes,
+    segments: showFormat.segments
+  }, null, 2),
+  '',
+  `RAW FEED (${stories.length} stories, sorted by tier then recency; already-aired stories removed; ` +
+    'duplicates merged — source_count/sources list every outlet that ran the story):',
+  JSON.stringify(stories, null, 2)
+].join('\n');
+
+return [{ json: { system_prompt: prompt, user_message: userMessage } }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+} catch (e) {}
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+nodes       = wf["nodes"]
+connections = wf["connections"]
+
+exclude_node = next((n for n in nodes if n["name"] == "Exclude Covered Stories"), None)
+if not exclude_node:
+    print("  ✗ 'Exclude Covered Stories' not found — run patch_exclude_covered.py first")
+    raise SystemExit(1)
+
+if any(n["name"] == "Cluster Stories" for n in nodes):
+    for n in nodes:
+        if n["name"] == "Cluster Stories":
+            n["parameters"]["jsCode"] = JS_CLUSTER_STORIES
+    print("  ✓ Updated 'Cluster Stories' node code")
+else:
+    nodes.append({
+        "parameters": {"jsCode": JS_CLUSTER_STORIES, "mode": "runOnceForAllItems"},
+        "id":   "cluster-stories",
+        "name": "Cluster Stories",
+        "type": "n8n-nodes-base.code",
+        "typeVersion": 2,
+        "position": [exclude_node["position"][0] + 220, exclude_node["position"][1]]
+    })
+    # Exclude Covered Stories → Cluster Stories → (previous Exclude targets)
+    exclude_targets = connections.get("Exclude Covered Stories", {}).get("main", [[]])[0]
+    connections["Exclude Covered Stories"] = {
+        "main": [[{"node": "Cluster Stories", "type": "main", "index": 0}]]
+    }
+    connections["Cluster Stories"] = {
+        "main": [exclude_targets] if exclude_targets else [[]]
+    }
+    print("  ✓ Added 'Cluster Stories' after 'Exclude Covered Stories'")
+
+for n in nodes:
+    if n["name"] == "Build Curator Input":
+        n["parameters"]["jsCode"] = JS_BUILD_CURATOR
+        print("  ✓ Patched 'Build Curator Input' — clustered feed")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records clustering stats")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": nodes,
+    "connections": connections, "settings": wf["settings"]
+})
+print("  ✓ Saved")
@@ -0,0 +1,422 @@
+"""
+Gives each editor segment its own fact-check context, picked by a small
+in-process BM25 index over the day's ingested stories.
+
+  - Previously every editor call got stories.slice(0, 30) — the first 30 by
+    tier/recency, descriptions cut to 200 chars — whether or not the script
+    covered them
+  - Now the ingested stories (deduped by canonical URL) are indexed once
+    (title weighted x2 + description); each segment's text is the query and
+    the top editor.fact_context_k stories are sent, with up to
+    editor.fact_description_chars of description
+  - The index is bm25Index() from js_lib.py (JS_BM25); segmentation and line
+    patches come from JS_EDITOR_SEGMENTS / JS_EDITOR_PATCHES, and a segment
+    that fails review passes through alone, as in patch_editor_parallel.py
+  - Editor Review emits editor_fact_context (index size, context chars, share
+    of the curator's stories that reached the editor as sources); Write Run
+    Log records it
+
+Run from repo root: python3 scripts/patch_editor_fact_context.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import (JS_MAP_CONCURRENT, JS_STORY_INDEX, JS_CLAUDE_CLIENT,
+                    JS_EDITOR_PATCHES, JS_EDITOR_SEGMENTS, JS_BM25)
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Editor Review (segment-parallel, BM25-selected fact-check context) ──────
+JS_EDITOR_REVIEW = JS_MAP_CONCURRENT + JS_CLAUDE_CLIENT + JS_EDITOR_PATCHES + JS_EDITOR_SEGMENTS + JS_BM25 + r"""
+const https = require('https');
+
+const systemPrompt = $('Fetch Editor Prompt').first().json.data;
+const writerOut    = $('Parse Writer Response').first().json;
+const script       = writerOut.script || '';
+const episodeTitle = writerOut.episode_title || 'Circuit Breakers Daily';
+const ingestOut    = $('Ingest & Filter News').first().json;
+const stories      = ingestOut.stories || [];
+const showFormat   = $('Fetch show-format.json').first().json;
+const brief        = $('Parse Curator Response').first().json.brief || {};
+const editorCfg    = $('Fetch pipeline.json').first().json.editor || {};
+const MODE         = editorCfg.mode === 'full' ? 'full' : 'patch';
+const PARALLEL     = editorCfg.parallel !== false;
+const CONCURRENCY  = Math.max(1, editorCfg.concurrency || 4);
+const CHUNK_WORDS  = editorCfg.max_chunk_words || 700;
+const CONTEXT_LINES = 2;
+
+const FACT_K      = editorCfg.fact_context_k || 6;
+const FACT_CHARS  = editorCfg.fact_description_chars || 400;
+
+// ── BM25 over the ingested stories ────────────────────────────────────────────
+// Each segment's fact-check context is the top FACT_K stories for that
+// segment's text, instead of the first 30 stories of the day.
+const seenUrls = new Set();
+const factDocs = stories.filter(s => {
+  const key = s.canonical_url || s.url || s.title;
+  if (seenUrls.has(key)) return false;
+  seenUrls.add(key);
+  return true;
+});
+const bm25 = bm25Index(factDocs, s => `${s.title} ${s.title} ${s.description || ''}`);
+
+function factContext(chunk) {
+  const picked = bm25.search(scriptLines.slice(chunk.start, chunk.end).join('\n'), FACT_K);
+  const text = picked
+    .map(s => `- ${s.title} (${s.source}): ${(s.description || '').slice(0, FACT_CHARS)}`)
+    .join('\n');
+  return { picked, text: text || '(no matching source stories)' };
+}
+
+const scriptLines = script.split('\n');
+const numberLine  = i => `${String(i + 1).padStart(4, '0')}| ${scriptLines[i]}`;
+
+// ── Per-chunk review ──────────────────────────────────────────────────────────
+function userMessage(mode, chunk, sourceContext) {
+  const whole   = chunk.start === 0 && chunk.end === scriptLines.length;
+  const context = [];
+  for (let i = Math.max(0, chunk.start - CONTEXT_LINES); i < chunk.start; i++) context.push(numberLine(i));
+  const body = [];
+  for (let i = chunk.start; i < chunk.end; i++) body.push(mode === 'patch' ? numberLine(i) : scriptLines[i]);
+  return [
+    `EPISODE TITLE: ${episodeTitle}`,
+    '',
+    `OUTPUT MODE: ${mode}`,
+    ...(whole ? [] : [`SEGMENT: ${chunk.name} (lines ${chunk.start + 1}-${chunk.end} of ${scriptLines.length})`]),
+    '',
+    'SOURCE STORIES (ground truth for fact-checking):',
+    sourceContext,
+    '',
+    ...(context.length ? ['PRECEDING LINES (context only — do not patch):', ...context, ''] : []),
+    `SCRIPT TO REVIEW${mode === 'patch' ? ' (numbered — the "0001| " prefix is not part of the line)' : ''}:`,
+    ...body
+  ].join('\n');
+}
+
+async function callEditor(mode, chunk, sourceContext) {
+  const t0 = Date.now();
+  const { response, cache, key } = await cachedClaude({
+    model:      'claude-sonnet-4-6',
+    max_tokens: mode === 'patch' ? (editorCfg.patch_max_tokens || 4096) : 10000,
+    system:     [{ type: 'text', text: systemPrompt, cache_control: { type: 'ephemeral' } }],
+    messages:   [{ role: 'user', content: userMessage(mode, chunk, sourceContext) }]
+  });
+  return { mode, response, cache, key, ms: Date.now() - t0 };
+}
+
+async function reviewChunk(chunk) {
+  const calls = [];
+  const facts = factContext(chunk);
+  const stats = { name: chunk.name, lines: chunk.end - chunk.start, patches: 0, replaced: 0, deleted: 0, fallback: null,
+                  sources: facts.picked.length, source_chars: facts.text.length };
+  let review = null, lines = null, changes = [];
+
+  if (MODE === 'patch') {
+    const call = await callEditor('patch', chunk, facts.text);
+    calls.push(call);
+    try {
+      review  = parseReview(call.response);
+      const patches = review.patches || [];
+      lines   = applyPatches(scriptLines, patches, chunk.start, chunk.end);
+      changes = patches.map(p => `Line ${p.line} (${p.op}): ${p.reason || 'no reason given'}`);
+      stats.patches  = patches.length;
+      stats.replaced = patches.filter(p => p.op === 'replace').length;
+      stats.deleted  = patches.filter(p => p.op === 'delete').length;
+    } catch (e) {
+      stats.fallback = e.message;
+      dropClaudeCache(call.key);
+      review = null;
+    }
+  }
+  if (!review) {
+    const call = await callEditor('full', chunk, facts.text);
+    calls.push(call);
+    try {
+      review = parseReview(call.response);
+    } catch (e) {
+      dropClaudeCache(call.key);
+      return passThrough(chunk, calls, stats, e.message, facts);
+    }
+    lines   = String(review.script || scriptLines.slice(chunk.start, chunk.end).join('\n')).split('\n');
+    changes = review.changes || [];
+  }
+  return {
+    chunk, calls, stats, lines, changes,
+    sourceUrls:     facts.picked.map(p => p.url),
+    hallucinations: review.hallucinations_found || [],
+    approved:       review.approved !== false,
+    failed:         null
+  };
+}
+
+// A segment that couldn't be reviewed keeps the writer's lines; the other
+// segments keep their edits
+function passThrough(chunk, calls, stats, message, facts) {
+  facts = facts || factContext(chunk);
+  stats = stats || { name: chunk.name, lines: chunk.end - chunk.start, patches: 0, replaced: 0, deleted: 0, fallback: null,
+                     sources: facts.picked.length, source_chars: facts.text.length };
+  return {
+    chunk, calls, stats: { ...stats, failed: message },
+    lines:          scriptLines.slice(chunk.start, chunk.end),
+    changes:        [`Editor parse error (${chunk.name}): ${message} — segment passed through unreviewed`],
+    sourceUrls:     facts.picked.map(p => p.url),
+    hallucinations: [],
+    approved:       false,
+    failed:         message
+  };
+}
+
+// ── Run + merge ───────────────────────────────────────────────────────────────
+const chunks  = segmentScript(scriptLines, { showFormat, brief, parallel: PARALLEL, chunkWords: CHUNK_WORDS });
+const t0      = Date.now();
+const results = (await mapConcurrent(chunks, CONCURRENCY, CONCURRENCY, () => 'api.anthropic.com', reviewChunk))
+  .map((r, i) => r.error ? passThrough(chunks[i], [], null, r.error.message) : r);
+const wallMs  = Date.now() - t0;
+
+const allCalls = results.flatMap(r => r.calls);
+
+const finalScript   = results.flatMap(r => r.lines).join('\n');
+const changes       = results.flatMap(r => r.changes);
+const hallucinations = results.flatMap(r => r.hallucinations);
+const callMs        = results.map(r => r.calls.reduce((a, c) => a + c.ms, 0));
+const outTokens     = allCalls.reduce((a, c) => a + ((c.response.usage || {}).output_tokens || 0), 0);
+const fullTokens    = Math.ceil(finalScript.length / 4) + outTokens;
+const serialMs      = callMs.reduce((a, b) => a + b, 0);
+const replayed      = allCalls.every(c => c.cache === 'hit');
+
+const patchStats = {
+  mode:                   MODE,
+  patches:                results.reduce((a, r) => a + r.stats.patches, 0),
+  replaced:               results.reduce((a, r) => a + r.stats.replaced, 0),
+  deleted:                results.reduce((a, r) => a + r.stats.deleted, 0),
+  fallback:               results.filter(r => r.stats.fallback).map(r => `${r.chunk.name}: ${r.stats.fallback}`).join('; ') || null,
+  output_tokens:          outTokens,
+  est_full_output_tokens: fullTokens,
+  est_ms_saved:           !replayed && outTokens > 0 ? Math.round((fullTokens - outTokens) * (serialMs / outTokens)) : null
+};
+
+// Fact-check coverage: share of the curator's stories that reached the editor as a source
+const sentUrls   = new Set(results.flatMap(r => r.sourceUrls));
+const briefUrls  = (brief.stories || []).map(s => s.url).filter(Boolean);
+const factStats  = {
+  index_docs:     bm25.size,
+  k:              FACT_K,
+  total_chars:    results.reduce((a, r) => a + r.stats.source_chars, 0),
+  brief_coverage: briefUrls.length ? +(briefUrls.filter(u => sentUrls.has(u)).length / briefUrls.length).toFixed(2) : null
+};
+
+// Send Telegram alert if hallucinations were found
+if (hallucinations.length > 0) {
+  const alertText = `⚠️ *Editor Alert — ${episodeTitle}*\n\nHallucinations detected:\n` +
+    hallucinations.map(h => `• ${h}`).join('\n') +
+    `\n\nThe episode will still be generated with corrections applied.`;
+
+  const tgBody = JSON.stringify({
+    chat_id:    $env.TELEGRAM_CHAT_ID,
+    text:       alertText,
+    parse_mode: 'Markdown'
+  });
+
+  await new Promise((resolve) => {
+    const req = https.request({
+      hostname: 'api.telegram.org',
+      path:     `/bot${$env.TELEGRAM_BOT_TOKEN}/sendMessage`,
+      method:   'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(tgBody) }
+    }, res => { res.on('data', () => {}); res.on('end', resolve); });
+    req.on('error', resolve); // don't block pipeline on Telegram failure
+    req.write(tgBody);
+    req.end();
+  });
+}
+
+return [{ json: {
+  ...writerOut,
+  script:               finalScript,
+  editorial_changes:    changes,
+  hallucinations_found: hallucinations,
+  editor_approved:      results.every(r => r.approved),
+  editor_usage:         sumUsage(allCalls),
+  editor_cache:         allCalls.map(c => c.cache).join('+') || null,
+  editor_patch:         patchStats,
+  editor_fact_context:  factStats,
+  editor_parallel: {
+    chunks:           chunks.length,
+    concurrency:      CONCURRENCY,
+    wall_ms:          wallMs,
+    serial_ms:        serialMs,
+    longest_chunk_ms: Math.max(...callMs),
+    failed:           results.filter(r => r.failed).map(r => r.chunk.name),
+    segments:         results.map((r, i) => ({ ...r.stats, words: wordCount(scriptLines.slice(r.chunk.start, r.chunk.end).join(' ')), ms: callMs[i] }))
+  }
+} }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+let editorPatch         = null;
+let editorParallel      = null;
+let editorFacts         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+  editorPatch          = editorOut.editor_patch || null;
+  editorParallel       = editorOut.editor_parallel || null;
+  editorFacts          = editorOut.editor_fact_context || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    !!cache && String(cache).split('+').every(c => c === 'hit'),
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+try { ttsPrefetchHits = $('Generate Voice (Sequential)').all().filter(i => i.json.prefetched).length; } catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  editor_patch:          editorPatch,
+  editor_parallel:       editorParallel,
+  editor_fact_context:   editorFacts,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Editor Review":
+        n["parameters"]["jsCode"] = JS_EDITOR_REVIEW
+        print("  ✓ Patched 'Editor Review' — BM25 fact-check context per segment")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records editor_fact_context")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
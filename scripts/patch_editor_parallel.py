@@ -0,0 +1,389 @@
+"""
+Reviews the script segment by segment in parallel instead of in one long
+editor call, so editor wall-clock time tracks the longest segment.
+
+  - The script has no headers, so it is cut at the fixed lines from
+    show-format.json (the cold-open "let's get into it" tease, the Read These
+    and sign-off closers) and at the first line naming each curator story;
+    small neighbouring pieces are merged up to editor.max_chunk_words and
+    oversized ones are cut at a FLINT: line
+  - Chunks are reviewed in line-patch mode (patch_editor_patches.py) with at
+    most editor.concurrency calls in flight; patches use the global line
+    numbers and must stay inside their chunk, otherwise that chunk alone
+    falls back to a full rewrite
+  - A chunk whose full rewrite can't be parsed either (or whose call fails)
+    passes through with the writer's lines and editor_approved = false; the
+    other chunks keep their edits. Rejected replies are dropped from the
+    Claude response cache
+  - Segmentation (JS_EDITOR_SEGMENTS) and the patch helpers
+    (JS_EDITOR_PATCHES) live in js_lib.py
+  - changes / hallucinations_found are concatenated in script order and
+    approved is the AND of every chunk
+  - Write Run Log records editor_parallel (chunks, wall vs. serial ms, per
+    segment stats); editor.parallel = false reviews the whole script at once
+
+Run from repo root: python3 scripts/patch_editor_parallel.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import (JS_MAP_CONCURRENT, JS_STORY_INDEX, JS_CLAUDE_CLIENT,
+                    JS_EDITOR_PATCHES, JS_EDITOR_SEGMENTS)
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Editor Review (segment-parallel, line patches per segment) ────────────────
+JS_EDITOR_REVIEW = JS_MAP_CONCURRENT + JS_CLAUDE_CLIENT + JS_EDITOR_PATCHES + JS_EDITOR_SEGMENTS + r"""
+const https = require('https');
+
+const systemPrompt = $('Fetch Editor Prompt').first().json.data;
+const writerOut    = $('Parse Writer Response').first().json;
+const script       = writerOut.script || '';
+const episodeTitle = writerOut.episode_title || 'Circuit Breakers Daily';
+const ingestOut    = $('Ingest & Filter News').first().json;
+const stories      = ingestOut.stories || [];
+const showFormat   = $('Fetch show-format.json').first().json;
+const brief        = $('Parse Curator Response').first().json.brief || {};
+const editorCfg    = $('Fetch pipeline.json').first().json.editor || {};
+const MODE         = editorCfg.mode === 'full' ? 'full' : 'patch';
+const PARALLEL     = editorCfg.parallel !== false;
+const CONCURRENCY  = Math.max(1, editorCfg.concurrency || 4);
+const CHUNK_WORDS  = editorCfg.max_chunk_words || 700;
+const CONTEXT_LINES = 2;
+
+const sourceContext = stories.slice(0, 30)
+  .map(s => `- ${s.title} (${s.source}): ${(s.description || '').slice(0, 200)}`)
+  .join('\n');
+
+const scriptLines = script.split('\n');
+const numberLine  = i => `${String(i + 1).padStart(4, '0')}| ${scriptLines[i]}`;
+
+// ── Per-chunk review ──────────────────────────────────────────────────────────
+function userMessage(mode, chunk) {
+  const whole   = chunk.start === 0 && chunk.end === scriptLines.length;
+  const context = [];
+  for (let i = Math.max(0, chunk.start - CONTEXT_LINES); i < chunk.start; i++) context.push(numberLine(i));
+  const body = [];
+  for (let i = chunk.start; i < chunk.end; i++) body.push(mode === 'patch' ? numberLine(i) : scriptLines[i]);
+  return [
+    `EPISODE TITLE: ${episodeTitle}`,
+    '',
+    `OUTPUT MODE: ${mode}`,
+    ...(whole ? [] : [`SEGMENT: ${chunk.name} (lines ${chunk.start + 1}-${chunk.end} of ${scriptLines.length})`]),
+    '',
+    'SOURCE STORIES (ground truth for fact-checking):',
+    sourceContext,
+    '',
+    ...(context.length ? ['PRECEDING LINES (context only — do not patch):', ...context, ''] : []),
+    `SCRIPT TO REVIEW${mode === 'patch' ? ' (numbered — the "0001| " prefix is not part of the line)' : ''}:`,
+    ...body
+  ].join('\n');
+}
+
+async function callEditor(mode, chunk) {
+  const t0 = Date.now();
+  const { response, cache, key } = await cachedClaude({
+    model:      'claude-sonnet-4-6',
+    max_tokens: mode === 'patch' ? (editorCfg.patch_max_tokens || 4096) : 10000,
+    system:     [{ type: 'text', text: systemPrompt, cache_control: { type: 'ephemeral' } }],
+    messages:   [{ role: 'user', content: userMessage(mode, chunk) }]
+  });
+  return { mode, response, cache, key, ms: Date.now() - t0 };
+}
+
+async function reviewChunk(chunk) {
+  const calls = [];
+  const stats = { name: chunk.name, lines: chunk.end - chunk.start, patches: 0, replaced: 0, deleted: 0, fallback: null };
+  let review = null, lines = null, changes = [];
+
+  if (MODE === 'patch') {
+    const call = await callEditor('patch', chunk);
+    calls.push(call);
+    try {
+      review  = parseReview(call.response);
+      const patches = review.patches || [];
+      lines   = applyPatches(scriptLines, patches, chunk.start, chunk.end);
+      changes = patches.map(p => `Line ${p.line} (${p.op}): ${p.reason || 'no reason given'}`);
+      stats.patches  = patches.length;
+      stats.replaced = patches.filter(p => p.op === 'replace').length;
+      stats.deleted  = patches.filter(p => p.op === 'delete').length;
+    } catch (e) {
+      stats.fallback = e.message;
+      dropClaudeCache(call.key);
+      review = null;
+    }
+  }
+  if (!review) {
+    const call = await callEditor('full', chunk);
+    calls.push(call);
+    try {
+      review = parseReview(call.response);
+    } catch (e) {
+      dropClaudeCache(call.key);
+      return passThrough(chunk, calls, stats, e.message);
+    }
+    lines   = String(review.script || scriptLines.slice(chunk.start, chunk.end).join('\n')).split('\n');
+    changes = review.changes || [];
+  }
+  return {
+    chunk, calls, stats, lines, changes,
+    hallucinations: review.hallucinations_found || [],
+    approved:       review.approved !== false,
+    failed:         null
+  };
+}
+
+// A segment that couldn't be reviewed keeps the writer's lines; the other
+// segments keep their edits
+function passThrough(chunk, calls, stats, message) {
+  stats = stats || { name: chunk.name, lines: chunk.end - chunk.start, patches: 0, replaced: 0, deleted: 0, fallback: null };
+  return {
+    chunk, calls, stats: { ...stats, failed: message },
+    lines:          scriptLines.slice(chunk.start, chunk.end),
+    changes:        [`Editor parse error (${chunk.name}): ${message} — segment passed through unreviewed`],
+    hallucinations: [],
+    approved:       false,
+    failed:         message
+  };
+}
+
+// ── Run + merge ───────────────────────────────────────────────────────────────
+const chunks  = segmentScript(scriptLines, { showFormat, brief, parallel: PARALLEL, chunkWords: CHUNK_WORDS });
+const t0      = Date.now();
+const results = (await mapConcurrent(chunks, CONCURRENCY, CONCURRENCY, () => 'api.anthropic.com', reviewChunk))
+  .map((r, i) => r.error ? passThrough(chunks[i], [], null, r.error.message) : r);
+const wallMs  = Date.now() - t0;
+
+const allCalls = results.flatMap(r => r.calls);
+
+const finalScript   = results.flatMap(r => r.lines).join('\n');
+const changes       = results.flatMap(r => r.changes);
+const hallucinations = results.flatMap(r => r.hallucinations);
+const callMs        = results.map(r => r.calls.reduce((a, c) => a + c.ms, 0));
+const outTokens     = allCalls.reduce((a, c) => a + ((c.response.usage || {}).output_tokens || 0), 0);
+const fullTokens    = Math.ceil(finalScript.length / 4) + outTokens;
+const serialMs      = callMs.reduce((a, b) => a + b, 0);
+const replayed      = allCalls.every(c => c.cache === 'hit');
+
+const patchStats = {
+  mode:                   MODE,
+  patches:                results.reduce((a, r) => a + r.stats.patches, 0),
+  replaced:               results.reduce((a, r) => a + r.stats.replaced, 0),
+  deleted:                results.reduce((a, r) => a + r.stats.deleted, 0),
+  fallback:               results.filter(r => r.stats.fallback).map(r => `${r.chunk.name}: ${r.stats.fallback}`).join('; ') || null,
+  output_tokens:          outTokens,
+  est_full_output_tokens: fullTokens,
+  est_ms_saved:           !replayed && outTokens > 0 ? Math.round((fullTokens - outTokens) * (serialMs / outTokens)) : null
+};
+
+// Send Telegram alert if hallucinations were found
+if (hallucinations.length > 0) {
+  const alertText = `⚠️ *Editor Alert — ${episodeTitle}*\n\nHallucinations detected:\n` +
+    hallucinations.map(h => `• ${h}`).join('\n') +
+    `\n\nThe episode will still be generated with corrections applied.`;
+
+  const tgBody = JSON.stringify({
+    chat_id:    $env.TELEGRAM_CHAT_ID,
+    text:       alertText,
+    parse_mode: 'Markdown'
+  });
+
+  await new Promise((resolve) => {
+    const req = https.request({
+      hostname: 'api.telegram.org',
+      path:     `/bot${$env.TELEGRAM_BOT_TOKEN}/sendMessage`,
+      method:   'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(tgBody) }
+    }, res => { res.on('data', () => {}); res.on('end', resolve); });
+    req.on('error', resolve); // don't block pipeline on Telegram failure
+    req.write(tgBody);
+    req.end();
+  });
+}
+
+return [{ json: {
+  ...writerOut,
+  script:               finalScript,
+  editorial_changes:    changes,
+  hallucinations_found: hallucinations,
+  editor_approved:      results.every(r => r.approved),
+  editor_usage:         sumUsage(allCalls),
+  editor_cache:         allCalls.map(c => c.cache).join('+') || null,
+  editor_patch:         patchStats,
+  editor_parallel: {
+    chunks:           chunks.length,
+    concurrency:      CONCURRENCY,
+    wall_ms:          wallMs,
+    serial_ms:        serialMs,
+    longest_chunk_ms: Math.max(...callMs),
+    failed:           results.filter(r => r.failed).map(r => r.chunk.name),
+    segments:         results.map((r, i) => ({ ...r.stats, words: wordCount(scriptLines.slice(r.chunk.start, r.chunk.end).join(' ')), ms: callMs[i] }))
+  }
+} }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+let editorPatch         = null;
+let editorParallel      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+  editorPatch          = editorOut.editor_patch || null;
+  editorParallel       = editorOut.editor_parallel || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    !!cache && String(cache).split('+').every(c => c === 'hit'),
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+try { ttsPrefetchHits = $('Generate Voice (Sequential)').all().filter(i => i.json.prefetched).length; } catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  editor_patch:          editorPatch,
+  editor_parallel:       editorParallel,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Editor Review":
+        n["parameters"]["jsCode"] = JS_EDITOR_REVIEW
+        print("  ✓ Patched 'Editor Review' — segment-parallel review")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records editor_parallel")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
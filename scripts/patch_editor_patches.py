@@ -0,0 +1,325 @@
+"""
+Switches Editor Review from full-script regeneration to line-addressed patches.
+
+  - The script is sent with numbered lines and OUTPUT MODE: patch; the editor
+    returns {op: replace|delete, line, text, reason} patches that are applied
+    locally to the writer's script
+  - A patch set that doesn't validate (bad line number, duplicate line, lost
+    speaker tag, unparseable JSON) triggers one full-rewrite call
+    (OUTPUT MODE: full) — the old behaviour. Either rejected reply is
+    dropped from the Claude response cache so a rerun asks again
+  - parseReview / applyPatches / sumUsage live in js_lib.py
+    (JS_EDITOR_PATCHES), shared with the segment-parallel editor
+  - pipeline.json → editor.mode = "full" skips patch mode entirely
+  - Write Run Log records editor_patch: counts, fallback reason, output tokens
+    and an estimate of the time saved vs. regenerating the whole script
+
+prompts/editor-agent.md documents both output modes.
+
+Run from repo root: python3 scripts/patch_editor_patches.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX, JS_CLAUDE_CLIENT, JS_EDITOR_PATCHES
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Editor Review (line patches, full rewrite as fallback) ────────────────────
+JS_EDITOR_REVIEW = JS_CLAUDE_CLIENT + JS_EDITOR_PATCHES + r"""
+const https = require('https');
+
+const systemPrompt = $('Fetch Editor Prompt').first().json.data;
+const writerOut    = $('Parse Writer Response').first().json;
+const script       = writerOut.script || '';
+const episodeTitle = writerOut.episode_title || 'Circuit Breakers Daily';
+const ingestOut    = $('Ingest & Filter News').first().json;
+const stories      = ingestOut.stories || [];
+const editorCfg    = $('Fetch pipeline.json').first().json.editor || {};
+const MODE         = editorCfg.mode === 'full' ? 'full' : 'patch';
+
+const sourceContext = stories.slice(0, 30)
+  .map(s => `- ${s.title} (${s.source}): ${(s.description || '').slice(0, 200)}`)
+  .join('\n');
+
+// Patch mode numbers every line; the model addresses edits by that number
+const scriptLines = script.split('\n');
+const numbered    = scriptLines.map((l, i) => `${String(i + 1).padStart(4, '0')}| ${l}`).join('\n');
+
+function userMessage(mode) {
+  return `EPISODE TITLE: ${episodeTitle}
+
+OUTPUT MODE: ${mode}
+
+SOURCE STORIES (ground truth for fact-checking):
+${sourceContext}
+
+SCRIPT TO REVIEW${mode === 'patch' ? ' (numbered — the "0001| " prefix is not part of the line)' : ''}:
+${mode === 'patch' ? numbered : script}`;
+}
+
+async function callEditor(mode) {
+  const t0 = Date.now();
+  const { response, cache, key } = await cachedClaude({
+    model:      'claude-sonnet-4-6',
+    max_tokens: mode === 'patch' ? (editorCfg.patch_max_tokens || 4096) : 10000,
+    system:     [{ type: 'text', text: systemPrompt, cache_control: { type: 'ephemeral' } }],
+    messages:   [{ role: 'user', content: userMessage(mode) }]
+  });
+  return { mode, response, cache, key, ms: Date.now() - t0 };
+}
+
+const calls = [];
+const patchStats = { mode: MODE, patches: 0, replaced: 0, deleted: 0, fallback: null,
+                     output_tokens: null, est_full_output_tokens: null, est_ms_saved: null };
+let review = null, finalScript = script, changes = [];
+
+if (MODE === 'patch') {
+  const call = await callEditor('patch');
+  calls.push(call);
+  try {
+    review      = parseReview(call.response);
+    const patches = review.patches || [];
+    finalScript = applyPatches(scriptLines, patches).join('\n');
+    changes     = patches.map(p => `Line ${p.line} (${p.op}): ${p.reason || 'no reason given'}`);
+    patchStats.patches  = patches.length;
+    patchStats.replaced = patches.filter(p => p.op === 'replace').length;
+    patchStats.deleted  = patches.filter(p => p.op === 'delete').length;
+
+    // Time saved ≈ tokens we didn't have to generate × this call's ms per output token
+    const outTokens = (call.response.usage || {}).output_tokens || 0;
+    const fullTokens = Math.ceil(finalScript.length / 4) + outTokens;
+    patchStats.output_tokens          = outTokens;
+    patchStats.est_full_output_tokens = fullTokens;
+    if (call.cache !== 'hit' && outTokens > 0) {
+      patchStats.est_ms_saved = Math.round((fullTokens - outTokens) * (call.ms / outTokens));
+    }
+  } catch (e) {
+    patchStats.fallback = e.message;
+    dropClaudeCache(call.key);
+    review = null;
+  }
+}
+
+if (!review) {
+  const call = await callEditor('full');
+  calls.push(call);
+  try {
+    review      = parseReview(call.response);
+    finalScript = review.script || script;
+    changes     = review.changes || [];
+    if (patchStats.fallback) patchStats.est_ms_saved = -calls[0].ms;   // the failed patch call was wasted time
+  } catch (e) {
+    // Pass script through unchanged on parse error
+    dropClaudeCache(call.key);
+    return [{ json: {
+      ...writerOut,
+      editorial_changes:    [`Editor parse error: ${e.message}`],
+      hallucinations_found: [],
+      editor_approved:      false,
+      editor_usage:         sumUsage(calls),
+      editor_cache:         calls.map(c => c.cache).join('+'),
+      editor_patch:         patchStats
+    } }];
+  }
+}
+
+// Send Telegram alert if hallucinations were found
+if (review.hallucinations_found && review.hallucinations_found.length > 0) {
+  const alertText = `⚠️ *Editor Alert — ${episodeTitle}*\n\nHallucinations detected:\n` +
+    review.hallucinations_found.map(h => `• ${h}`).join('\n') +
+    `\n\nThe episode will still be generated with corrections applied.`;
+
+  const tgBody = JSON.stringify({
+    chat_id:    $env.TELEGRAM_CHAT_ID,
+    text:       alertText,
+    parse_mode: 'Markdown'
+  });
+
+  await new Promise((resolve) => {
+    const req = https.request({
+      hostname: 'api.telegram.org',
+      path:     `/bot${$env.TELEGRAM_BOT_TOKEN}/sendMessage`,
+      method:   'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(tgBody) }
+    }, res => { res.on('data', () => {}); res.on('end', resolve); });
+    req.on('error', resolve); // don't block pipeline on Telegram failure
+    req.write(tgBody);
+    req.end();
+  });
+}
+
+return [{ json: {
+  ...writerOut,
+  script:               finalScript,
+  editorial_changes:    changes,
+  hallucinations_found: review.hallucinations_found || [],
+  editor_approved:      review.approved !== false,
+  editor_usage:         sumUsage(calls),
+  editor_cache:         calls.map(c => c.cache).join('+'),
+  editor_patch:         patchStats
+} }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+let editorPatch         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+  editorPatch          = editorOut.editor_patch || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    !!cache && String(cache).split('+').every(c => c === 'hit'),
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+try { ttsPrefetchHits = $('Generate Voice (Sequential)').all().filter(i => i.json.prefetched).length; } catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  editor_patch:          editorPatch,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Editor Review":
+        n["parameters"]["jsCode"] = JS_EDITOR_REVIEW
+        print("  ✓ Patched 'Editor Review' — line patches with full-rewrite fallback")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records editor_patch")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
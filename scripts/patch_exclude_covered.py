@@ -0,0 +1,313 @@
+"""
+Filters already-aired stories locally instead of sending the history list to
+the curator.
+
+  - Adds 'Exclude Covered Stories' between 'Ingest & Filter News' and
+    'Fetch Curator Prompt'. It drops stories whose canonical URL is in the
+    story index window (covered_on, see patch_story_index.py) and stories whose
+    title is a near-duplicate of an aired story (word-set Jaccard ≥
+    pipeline.json → history.near_duplicate_threshold, default 0.6)
+  - Build Curator Input reads the filtered feed and no longer appends the
+    "PREVIOUSLY COVERED URLS" section
+  - Exclude Covered Stories also takes over the 7-day /logs/*.json pruning
+    from 'Load Episode History', and backfills index entries with no title
+    (the ones migrated from covered_urls) from the logs' covered_stories and
+    from today's feed
+  - 'Load Episode History' is removed — nothing reads it any more
+  - Write Run Log records stories removed, the estimated input tokens saved
+    and covered_stories (url + title of each aired story)
+
+Run from repo root: python3 scripts/patch_exclude_covered.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Exclude Covered Stories ───────────────────────────────────────────────────
+JS_EXCLUDE_COVERED = JS_STORY_INDEX + r"""
+const ingest     = $('Ingest & Filter News').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history || {};
+const THRESHOLD  = historyCfg.near_duplicate_threshold || 0.6;
+const { index, covered } = loadStoryIndex(historyCfg);
+
+// Per-day run logs: backfill titles the index is missing (entries migrated
+// from covered_urls have title: null), then delete logs older than 7 days to
+// keep storage bounded — this node took over that pass from Load Episode History
+const fs       = require('fs');
+const logTitles = new Map();
+const logCutoff = daysAgo(7);
+let logsPruned  = 0;
+let logFiles    = [];
+try { logFiles = fs.readdirSync('/logs').filter(f => /^\d{4}-\d{2}-\d{2}\.json$/.test(f)).sort(); } catch (e) {}
+for (const file of logFiles) {
+  try {
+    const log = JSON.parse(fs.readFileSync(`/logs/${file}`, 'utf8'));
+    for (const s of log.covered_stories || []) {
+      if (s.url && s.title) logTitles.set(canonicalUrl(s.url), s.title);
+    }
+  } catch (e) {}
+  if (file.replace('.json', '') < logCutoff) {
+    try { fs.unlinkSync(`/logs/${file}`); logsPruned++; } catch (e) {}
+  }
+}
+// Today's feed often re-lists an aired story, which carries its title too
+for (const story of ingest.stories || []) {
+  const url = canonicalUrl(story.canonical_url || story.url);
+  if (story.title && !logTitles.has(url)) logTitles.set(url, story.title);
+}
+let titlesBackfilled = 0;
+for (const [url, e] of Object.entries(index.urls)) {
+  if (!e.title && logTitles.has(url)) { e.title = logTitles.get(url); titlesBackfilled++; }
+}
+if (titlesBackfilled) {
+  try { saveStoryIndex(historyCfg, index); } catch (e) { console.error('Story index write failed:', e.message); }
+}
+
+const STOPWORDS = new Set(('a an the and or of to in on for with at by from is are was be as its it this ' +
+  'that new how why what says after into over about vs').split(' '));
+
+function titleTokens(title) {
+  return new Set(String(title || '').toLowerCase()
+    .replace(/[^a-z0-9\s]/g, ' ')
+    .split(/\s+/)
+    .filter(w => w.length > 1 && !STOPWORDS.has(w)));
+}
+
+function jaccard(a, b) {
+  if (!a.size || !b.size) return 0;
+  let inter = 0;
+  for (const w of a) if (b.has(w)) inter++;
+  return inter / (a.size + b.size - inter);
+}
+
+const airedTitles = [...covered.entries()]
+  .filter(([, e]) => e.title)
+  .map(([url, e]) => ({ url, date: e.date, tokens: titleTokens(e.title) }));
+
+const kept    = [];
+const removed = [];
+for (const story of ingest.stories || []) {
+  if (story.covered_on || covered.has(story.canonical_url || story.url)) {
+    removed.push({ story, reason: 'covered', match: story.canonical_url || story.url });
+    continue;
+  }
+  const tokens = titleTokens(story.title);
+  let best = null, bestScore = 0;
+  for (const aired of airedTitles) {
+    const score = jaccard(tokens, aired.tokens);
+    if (score > bestScore) { best = aired; bestScore = score; }
+  }
+  if (best && bestScore >= THRESHOLD) {
+    removed.push({ story, reason: 'near_duplicate', match: best.url, similarity: +bestScore.toFixed(2) });
+    continue;
+  }
+  kept.push(story);
+}
+
+// What the curator prompt no longer carries: the removed feed entries (same
+// serialization as Build Curator Input) plus the old covered-URL section
+const removedChars = JSON.stringify(removed.map(r => r.story), null, 2).length
+  + [...covered.keys()].join('\n').length;
+
+return [{ json: {
+  stories: kept,
+  total:   kept.length,
+  exclusion: {
+    stories_in:       (ingest.stories || []).length,
+    stories_removed:  removed.length,
+    covered:          removed.filter(r => r.reason === 'covered').length,
+    near_duplicate:   removed.filter(r => r.reason === 'near_duplicate').length,
+    chars_removed:    removedChars,
+    est_tokens_saved: Math.ceil(removedChars / 4),
+    titles_backfilled: titlesBackfilled,
+    logs_pruned:      logsPruned,
+    removed: removed.map(r => ({
+      title: r.story.title, url: r.story.url, reason: r.reason,
+      match: r.match, similarity: r.similarity ?? null
+    }))
+  }
+} }];
+"""
+
+# ── Build Curator Input (updated: filtered feed, no history section) ──────────
+JS_BUILD_CURATOR = r"""
+const stories    = $('Exclude Covered Stories').first().json.stories;
+const showFormat = $('Fetch show-format.json').first().json;
+const prompt     = $('Fetch Curator Prompt').first().json.data;
+
+const userMessage = [
+  `DATE: ${new Date().toISOString().split('T')[0]}`,
+  '',
+  'SHOW FORMAT REFERENCE:',
+  JSON.stringify({
+    episode_length_minutes: showFormat.episode_length_minutes,
+    segments: showFormat.segments
+  }, null, 2),
+  '',
+  `RAW FEED (${stories.length} stories, sorted by tier then recency; already-aired stories removed):`,
+  JSON.stringify(stories, null, 2)
+].join('\n');
+
+return [{ json: { system_prompt: prompt, user_message: userMessage } }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+} catch (e) {}
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  covered_stories:       (brief.stories || []).filter(s => s.url).map(s => ({ url: s.url, title: s.title || null })),
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+nodes       = wf["nodes"]
+connections = wf["connections"]
+
+ingest_node = next((n for n in nodes if n["name"] == "Ingest & Filter News"), None)
+if not ingest_node:
+    print("  ✗ 'Ingest & Filter News' node not found")
+    raise SystemExit(1)
+
+# Add or update Exclude Covered Stories
+if any(n["name"] == "Exclude Covered Stories" for n in nodes):
+    for n in nodes:
+        if n["name"] == "Exclude Covered Stories":
+            n["parameters"]["jsCode"] = JS_EXCLUDE_COVERED
+    print("  ✓ Updated 'Exclude Covered Stories' node code")
+else:
+    nodes.append({
+        "parameters": {"jsCode": JS_EXCLUDE_COVERED, "mode": "runOnceForAllItems"},
+        "id":   "exclude-covered-stories",
+        "name": "Exclude Covered Stories",
+        "type": "n8n-nodes-base.code",
+        "typeVersion": 2,
+        "position": [ingest_node["position"][0] + 110, ingest_node["position"][1] + 160]
+    })
+    # Ingest → Exclude Covered Stories → (previous Ingest targets)
+    ingest_targets = connections.get("Ingest & Filter News", {}).get("main", [[]])[0]
+    connections["Ingest & Filter News"] = {
+        "main": [[{"node": "Exclude Covered Stories", "type": "main", "index": 0}]]
+    }
+    connections["Exclude Covered Stories"] = {
+        "main": [ingest_targets] if ingest_targets else [[]]
+    }
+    print("  ✓ Added 'Exclude Covered Stories' after 'Ingest & Filter News'")
+
+# Remove Load Episode History and its wiring
+nodes = [n for n in nodes if n["name"] != "Load Episode History"]
+connections.pop("Load Episode History", None)
+for src in connections.values():
+    for branch in src.get("main", []):
+        branch[:] = [c for c in branch if c["node"] != "Load Episode History"]
+print("  ✓ Removed 'Load Episode History'")
+
+for n in nodes:
+    if n["name"] == "Build Curator Input":
+        n["parameters"]["jsCode"] = JS_BUILD_CURATOR
+        print("  ✓ Patched 'Build Curator Input' — filtered feed, no history section")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records exclusion stats")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": nodes,
+    "connections": connections, "settings": wf["settings"]
+})
+print("  ✓ Saved")
@@ -0,0 +1,291 @@
+"""
+Replaces the per-tag RegExp parseRss in 'Ingest & Filter News' with a
+single-pass streaming RSS 2.0 / Atom parser.
+
+  - One precompiled tokenizer regex walks the document once; no RegExp is
+    built per item or per tag
+  - Handles RSS <item> and Atom <entry> (link href, id, summary/content,
+    published/updated), CDATA and XML entities
+  - Body chunks are parsed as they arrive. Feeds are newest-first, so once
+    ingest.early_stop_stale_run consecutive items are older than MAX_AGE_MS
+    the download is aborted (0 disables early stop)
+  - Per-feed parse_ms and truncated are added to feed_timings
+
+Builds on patch_ingest_feed_cache.py — conditional GET and the feed cache are
+unchanged. Benchmark against the old parser: python3 scripts/bench_feed_parser.py
+
+Run from repo root: python3 scripts/patch_feed_parser.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_MAP_CONCURRENT, JS_FEED_PARSER
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Ingest & Filter News ──────────────────────────────────────────────────────
+JS_INGEST = JS_MAP_CONCURRENT + JS_FEED_PARSER + r"""
+const https = require('https');
+const http  = require('http');
+const zlib  = require('zlib');
+const fs    = require('fs');
+const path  = require('path');
+
+const sourcesData = $('Fetch sources.json').first().json;
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const ingestCfg   = pipelineCfg.ingest || {};
+const TIMEOUT_MS  = ingestCfg.timeout_ms || 15000;
+const MAX_CONCURRENCY = ingestCfg.mode === 'sequential' ? 1 : (ingestCfg.max_concurrency || 6);
+const PER_HOST        = ingestCfg.per_host_concurrency || 1;
+const CONDITIONAL_GET = ingestCfg.conditional_get !== false;
+const CACHE_PATH      = ingestCfg.cache_path || '/logs/cache/feeds.json';
+const STALE_RUN       = ingestCfg.early_stop_stale_run ?? 3;
+
+// Feed cache: { [rss url]: { etag, last_modified, items, fetched_at } }
+let feedCache = {};
+try { feedCache = JSON.parse(fs.readFileSync(CACHE_PATH, 'utf8')); } catch (e) {}
+
+// Fetch a feed following redirects, handles gzip, and streams the body into
+// `parser` as it arrives. Resolves with { status, headers, wire_bytes,
+// parse_ms, truncated } — the request is aborted once parser.done is set.
+function fetchFeed(url, extraHeaders, parser, maxRedirects) {
+  if (maxRedirects === undefined) maxRedirects = 5;
+  return new Promise((resolve, reject) => {
+    if (maxRedirects < 0) return reject(new Error('Too many redirects'));
+    const lib = url.startsWith('https') ? https : http;
+    const opts = {
+      headers: {
+        'User-Agent': 'Mozilla/5.0 (compatible; CircuitBreakers/1.0; +https://github.com/msangui/podcast)',
+        'Accept': 'application/rss+xml, application/atom+xml, application/xml, text/xml, */*',
+        'Accept-Encoding': 'gzip, deflate',
+        ...extraHeaders
+      },
+      timeout: TIMEOUT_MS
+    };
+    let settled = false;
+    const settle = (fn, v) => { if (!settled) { settled = true; fn(v); } };
+    const req = lib.get(url, opts, (res) => {
+      if (res.statusCode >= 300 && res.statusCode < 400 && res.statusCode !== 304 && res.headers.location) {
+        res.resume();
+        const next = new URL(res.headers.location, url).toString();
+        return fetchFeed(next, extraHeaders, parser, maxRedirects - 1)
+          .then(v => settle(resolve, v)).catch(e => settle(reject, e));
+      }
+      if (res.statusCode === 304) {
+        res.resume();
+        return settle(resolve, { status: 304, headers: res.headers, wire_bytes: 0, parse_ms: 0, truncated: false });
+      }
+      if (res.statusCode !== 200) {
+        res.resume();
+        return settle(reject, new Error(`HTTP ${res.statusCode}`));
+      }
+      let wireBytes = 0;
+      let parseMs   = 0;
+      res.on('data',  chunk => { wireBytes += chunk.length; });
+      res.on('error', e => settle(reject, e));
+      let stream = res;
+      const enc = (res.headers['content-encoding'] || '').toLowerCase();
+      if (enc === 'gzip')    stream = res.pipe(zlib.createGunzip());
+      if (enc === 'deflate') stream = res.pipe(zlib.createInflate());
+      stream.setEncoding('utf8');
+      const finish = (truncated) => settle(resolve, {
+        status: 200, headers: res.headers, wire_bytes: wireBytes, parse_ms: parseMs, truncated
+      });
+      stream.on('data', text => {
+        if (settled) return;
+        const t0 = Date.now();
+        parser.write(text);
+        parseMs += Date.now() - t0;
+        if (parser.done) {
+          finish(true);
+          req.destroy();
+        }
+      });
+      stream.on('end', () => {
+        const t0 = Date.now();
+        parser.end();
+        parseMs += Date.now() - t0;
+        finish(false);
+      });
+      stream.on('error', e => settle(reject, e));
+    });
+    req.on('error', e => settle(reject, e));
+    req.on('timeout', () => { req.destroy(); settle(reject, new Error('Request timed out')); });
+  });
+}
+
+function conditionalHeaders(entry) {
+  const h = {};
+  if (!CONDITIONAL_GET || !entry || !Array.isArray(entry.items)) return h;
+  if (entry.etag)          h['If-None-Match']     = entry.etag;
+  if (entry.last_modified) h['If-Modified-Since'] = entry.last_modified;
+  return h;
+}
+
+function hostOf(source) {
+  try { return new URL(source.rss).hostname; } catch (e) { return source.rss; }
+}
+
+const sources = [...sourcesData.sources, ...(sourcesData.rotation_pool || [])]
+  .filter(s => s.active && s.rss && (s.type || 'rss') === 'rss');
+const hnSource = sourcesData.sources.find(s => s.name === 'Hacker News');
+const HN_KEYWORDS = hnSource?.keywords || [];
+const MAX_AGE_MS = 36 * 3600 * 1000;
+const now = Date.now();
+const ingestStart = Date.now();
+
+const fetched = await mapConcurrent(sources, MAX_CONCURRENCY, PER_HOST, hostOf, async (source) => {
+  const started = Date.now();
+  const parser  = new FeedParser({ cutoff: now - MAX_AGE_MS, staleRun: STALE_RUN });
+  try {
+    const res = await fetchFeed(source.rss, conditionalHeaders(feedCache[source.rss]), parser);
+    return { ...res, items: parser.items, started, ms: Date.now() - started };
+  } catch (err) {
+    // Degrade gracefully — one bad feed must not kill the pipeline
+    console.error('Feed error:', source.name, err.message);
+    return { error: err, started, ms: Date.now() - started };
+  }
+});
+
+// Merge in sources.json order so dedup and sort are independent of fetch timing
+const allStories  = [];
+const seenUrls    = new Set();
+const feedTimings = [];
+const cacheStats  = { hits: 0, misses: 0, wire_bytes: 0 };
+
+sources.forEach((source, i) => {
+  const res    = fetched[i] || {};
+  const timing = {
+    source:     source.name,
+    host:       hostOf(source),
+    start_ms:   res.started ? res.started - ingestStart : null,
+    fetch_ms:   res.ms ?? null,
+    parse_ms:   res.parse_ms ?? null,
+    status:     res.error ? 'error' : 'ok',
+    cache:      res.error ? null : (res.status === 304 ? 'hit' : 'miss'),
+    truncated:  !!res.truncated,
+    wire_bytes: res.wire_bytes || 0,
+    items:      0,
+    kept:       0
+  };
+  if (res.error) {
+    timing.error = res.error.message;
+    feedTimings.push(timing);
+    return;
+  }
+
+  let items;
+  if (res.status === 304) {
+    items = feedCache[source.rss].items;
+    cacheStats.hits++;
+  } else {
+    items = res.items;
+    cacheStats.misses++;
+    feedCache[source.rss] = {
+      etag:          res.headers.etag || null,
+      last_modified: res.headers['last-modified'] || null,
+      items,
+      fetched_at:    new Date().toISOString()
+    };
+  }
+  cacheStats.wire_bytes += timing.wire_bytes;
+  timing.items = items.length;
+  items = items.filter(item => (now - item.published) <= MAX_AGE_MS);
+
+  if (source.name === 'Hacker News') {
+    items = items.filter(item => {
+      if (item.score < 100) return false;
+      const text = (item.title + ' ' + item.description).toLowerCase();
+      return HN_KEYWORDS.some(kw => text.includes(kw.toLowerCase()));
+    });
+  }
+
+  for (const item of items) {
+    if (!item.link || seenUrls.has(item.link)) continue;
+    seenUrls.add(item.link);
+    timing.kept++;
+    allStories.push({
+      title:       item.title,
+      url:         item.link,
+      description: item.description,
+      published:   new Date(item.published).toISOString(),
+      source:      source.name,
+      source_tier: source.tier,
+      hn_score:    item.score || null
+    });
+  }
+  feedTimings.push(timing);
+});
+
+allStories.sort((a, b) => {
+  if (a.source_tier !== b.source_tier) return a.source_tier - b.source_tier;
+  return new Date(b.published) - new Date(a.published);
+});
+
+// Persist the cache atomically; drop entries for feeds no longer configured
+try {
+  const active = new Set(sources.map(s => s.rss));
+  for (const url of Object.keys(feedCache)) if (!active.has(url)) delete feedCache[url];
+  fs.mkdirSync(path.dirname(CACHE_PATH), { recursive: true });
+  fs.writeFileSync(`${CACHE_PATH}.tmp`, JSON.stringify(feedCache));
+  fs.renameSync(`${CACHE_PATH}.tmp`, CACHE_PATH);
+} catch (e) {
+  console.error('Feed cache write failed:', e.message);
+}
+
+return [{ json: {
+  stories:      allStories,
+  total:        allStories.length,
+  fetched_at:   new Date().toISOString(),
+  ingest_mode:  MAX_CONCURRENCY === 1 ? 'sequential' : 'concurrent',
+  ingest_ms:    Date.now() - ingestStart,
+  feed_timings: feedTimings,
+  feed_cache:   cacheStats
+} }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for node in wf["nodes"]:
+    if node["name"] == "Ingest & Filter News":
+        node["parameters"]["jsCode"] = JS_INGEST
+        node["parameters"]["mode"]   = "runOnceForAllItems"
+        print("  ✓ Patched 'Ingest & Filter News' — streaming RSS/Atom parser")
+        break
+else:
+    print("  ✗ 'Ingest & Filter News' node not found")
+    raise SystemExit(1)
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
@@ -0,0 +1,321 @@
+"""
+Fetches all active RSS feeds in parallel in 'Ingest & Filter News'.
+
+  - Concurrency is capped by pipeline.json → ingest.max_concurrency, and no host
+    gets more than ingest.per_host_concurrency requests in flight at once
+  - ingest.mode = "sequential" restores the old one-feed-at-a-time behaviour
+  - Active rotation_pool sources are ingested too
+  - Feeds are merged in sources.json order after all fetches settle, so the
+    deduplicated, tier/recency-sorted stories array is the same as before
+  - Per-feed timings are returned as feed_timings and recorded by Write Run Log
+  - Pipeline settings (ingest, history, tts, …) live in config/pipeline.json;
+    sources.json is the feed list only. Adds 'Fetch pipeline.json' after
+    'Fetch sources.json' if the workflow doesn't have it yet
+
+Run from repo root: python3 scripts/patch_ingest_concurrent.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_MAP_CONCURRENT
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+# ── Ingest & Filter News ──────────────────────────────────────────────────────
+JS_INGEST = JS_MAP_CONCURRENT + r"""
+const https = require('https');
+const http  = require('http');
+const zlib  = require('zlib');
+
+const sourcesData = $('Fetch sources.json').first().json;
+const ingestCfg   = $('Fetch pipeline.json').first().json.ingest || {};
+const TIMEOUT_MS  = ingestCfg.timeout_ms || 15000;
+const MAX_CONCURRENCY = ingestCfg.mode === 'sequential' ? 1 : (ingestCfg.max_concurrency || 6);
+const PER_HOST        = ingestCfg.per_host_concurrency || 1;
+
+// Fetch a URL following redirects, handles gzip, returns text
+function fetchUrl(url, maxRedirects) {
+  if (maxRedirects === undefined) maxRedirects = 5;
+  return new Promise((resolve, reject) => {
+    if (maxRedirects < 0) return reject(new Error('Too many redirects'));
+    const lib = url.startsWith('https') ? https : http;
+    const opts = {
+      headers: {
+        'User-Agent': 'Mozilla/5.0 (compatible; CircuitBreakers/1.0; +https://github.com/msangui/podcast)',
+        'Accept': 'application/rss+xml, application/xml, text/xml, */*',
+        'Accept-Encoding': 'gzip, deflate'
+      },
+      timeout: TIMEOUT_MS
+    };
+    const req = lib.get(url, opts, (res) => {
+      if (res.statusCode >= 300 && res.statusCode < 400 && res.headers.location) {
+        res.resume();
+        const next = new URL(res.headers.location, url).toString();
+        return fetchUrl(next, maxRedirects - 1).then(resolve).catch(reject);
+      }
+      if (res.statusCode !== 200) {
+        res.resume();
+        return reject(new Error(`HTTP ${res.statusCode}`));
+      }
+      const chunks = [];
+      let stream = res;
+      const enc = (res.headers['content-encoding'] || '').toLowerCase();
+      if (enc === 'gzip')    stream = res.pipe(zlib.createGunzip());
+      if (enc === 'deflate') stream = res.pipe(zlib.createInflate());
+      stream.on('data', chunk => chunks.push(Buffer.isBuffer(chunk) ? chunk : Buffer.from(chunk)));
+      stream.on('end',  () => resolve(Buffer.concat(chunks).toString('utf8')));
+      stream.on('error', reject);
+    });
+    req.on('error', reject);
+    req.on('timeout', () => { req.destroy(); reject(new Error('Request timed out')); });
+  });
+}
+
+function hostOf(source) {
+  try { return new URL(source.rss).hostname; } catch (e) { return source.rss; }
+}
+
+function parseRss(xml) {
+  const items = [];
+  const itemRe = /<item>([\s\S]*?)<\/item>/g;
+  let m;
+  while ((m = itemRe.exec(xml)) !== null) {
+    const block = m[1];
+    const get = (tag) => {
+      const r = new RegExp(
+        `<${tag}[^>]*><!\\[CDATA\\[([\\s\\S]*?)\\]\\]></${tag}>|<${tag}[^>]*>([\\s\\S]*?)</${tag}>`
+      ).exec(block);
+      return r ? (r[1] || r[2] || '').trim() : '';
+    };
+    const pubDate = get('pubDate');
+    const rawLink = get('link') || get('guid');
+    const link = (rawLink.match(/https?:\/\/[^\s<"]+/) || [rawLink])[0];
+    items.push({
+      title: get('title'),
+      link,
+      description: get('description').replace(/<[^>]+>/g, '').substring(0, 400),
+      published: pubDate ? new Date(pubDate).getTime() : Date.now(),
+      score: parseInt(get('score') || '0', 10)
+    });
+  }
+  return items;
+}
+
+const sources = [...sourcesData.sources, ...(sourcesData.rotation_pool || [])]
+  .filter(s => s.active && s.rss && (s.type || 'rss') === 'rss');
+const hnSource = sourcesData.sources.find(s => s.name === 'Hacker News');
+const HN_KEYWORDS = hnSource?.keywords || [];
+const MAX_AGE_MS = 36 * 3600 * 1000;
+const now = Date.now();
+const ingestStart = Date.now();
+
+const fetched = await mapConcurrent(sources, MAX_CONCURRENCY, PER_HOST, hostOf, async (source) => {
+  const started = Date.now();
+  try {
+    const xml = await fetchUrl(source.rss);
+    return { xml, started, ms: Date.now() - started };
+  } catch (err) {
+    // Degrade gracefully — one bad feed must not kill the pipeline
+    console.error('Feed error:', source.name, err.message);
+    return { error: err, started, ms: Date.now() - started };
+  }
+});
+
+// Merge in sources.json order so dedup and sort are independent of fetch timing
+const allStories  = [];
+const seenUrls    = new Set();
+const feedTimings = [];
+
+sources.forEach((source, i) => {
+  const res    = fetched[i] || {};
+  const timing = {
+    source:   source.name,
+    host:     hostOf(source),
+    start_ms: res.started ? res.started - ingestStart : null,
+    fetch_ms: res.ms ?? null,
+    status:   res.error ? 'error' : 'ok',
+    items:    0,
+    kept:     0
+  };
+  if (res.error) {
+    timing.error = res.error.message;
+    feedTimings.push(timing);
+    return;
+  }
+
+  const parseStart = Date.now();
+  let items = parseRss(res.xml);
+  timing.items = items.length;
+  items = items.filter(item => (now - item.published) <= MAX_AGE_MS);
+
+  if (source.name === 'Hacker News') {
+    items = items.filter(item => {
+      if (item.score < 100) return false;
+      const text = (item.title + ' ' + item.description).toLowerCase();
+      return HN_KEYWORDS.some(kw => text.includes(kw.toLowerCase()));
+    });
+  }
+
+  for (const item of items) {
+    if (!item.link || seenUrls.has(item.link)) continue;
+    seenUrls.add(item.link);
+    timing.kept++;
+    allStories.push({
+      title:       item.title,
+      url:         item.link,
+      description: item.description,
+      published:   new Date(item.published).toISOString(),
+      source:      source.name,
+      source_tier: source.tier,
+      hn_score:    item.score || null
+    });
+  }
+  timing.parse_ms = Date.now() - parseStart;
+  feedTimings.push(timing);
+});
+
+allStories.sort((a, b) => {
+  if (a.source_tier !== b.source_tier) return a.source_tier - b.source_tier;
+  return new Date(b.published) - new Date(a.published);
+});
+
+return [{ json: {
+  stories:      allStories,
+  total:        allStories.length,
+  fetched_at:   new Date().toISOString(),
+  ingest_mode:  MAX_CONCURRENCY === 1 ? 'sequential' : 'concurrent',
+  ingest_ms:    Date.now() - ingestStart,
+  feed_timings: feedTimings
+} }];
+"""
+
+# ── Write Run Log (updated: per-feed ingest timings) ──────────────────────────
+JS_WRITE_LOG = r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+} catch (e) {}
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+# Fetch pipeline.json: Fetch sources.json → Fetch pipeline.json → (its old targets)
+if not any(n["name"] == "Fetch pipeline.json" for n in wf["nodes"]):
+    src = next((n for n in wf["nodes"] if n["name"] == "Fetch sources.json"), None)
+    if not src:
+        print("  ✗ 'Fetch sources.json' node not found")
+        raise SystemExit(1)
+    wf["nodes"].append({
+        "parameters": {
+            "url": "={{ $env.GITHUB_RAW_BASE_URL }}/config/pipeline.json",
+            "options": {"response": {"response": {"responseFormat": "json"}}}
+        },
+        "id":   "fetch-pipeline",
+        "name": "Fetch pipeline.json",
+        "type": "n8n-nodes-base.httpRequest",
+        "typeVersion": 4.2,
+        "position": [src["position"][0] + 110, src["position"][1] + 160]
+    })
+    targets = wf["connections"].get("Fetch sources.json", {}).get("main", [[]])[0]
+    wf["connections"]["Fetch sources.json"] = {
+        "main": [[{"node": "Fetch pipeline.json", "type": "main", "index": 0}]]
+    }
+    wf["connections"]["Fetch pipeline.json"] = {"main": [targets]}
+    print("  ✓ Added 'Fetch pipeline.json' after 'Fetch sources.json'")
+
+patched = set()
+for node in wf["nodes"]:
+    if node["name"] == "Ingest & Filter News":
+        node["parameters"]["jsCode"] = JS_INGEST
+        node["parameters"]["mode"]   = "runOnceForAllItems"
+        patched.add(node["name"])
+        print("  ✓ Patched 'Ingest & Filter News' — feeds fetched concurrently")
+    elif node["name"] == "Write Run Log":
+        node["parameters"]["jsCode"] = JS_WRITE_LOG
+        patched.add(node["name"])
+        print("  ✓ Patched 'Write Run Log' — records feed_timings")
+
+missing = {"Ingest & Filter News", "Write Run Log"} - patched
+if missing:
+    print(f"  ✗ Nodes not found: {missing}")
+    raise SystemExit(1)
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
+print()
+print("Tune concurrency in config/pipeline.json → ingest (push to GitHub, next run picks it up)")
@@ -0,0 +1,355 @@
+"""
+Adds a persistent HTTP conditional-GET cache to 'Ingest & Filter News'.
+
+Each feed's ETag, Last-Modified and last parsed items are kept in
+pipeline.json → ingest.cache_path (default /logs/cache/feeds.json). The next
+run sends If-None-Match / If-Modified-Since; on a 304 the cached parse is
+reused, so unchanged feeds cost one empty round-trip and no parsing.
+
+Set ingest.conditional_get = false to always download full bodies (the cache
+is still refreshed). Write Run Log records hit/miss counts and bytes fetched.
+
+Builds on patch_ingest_concurrent.py — concurrency settings are unchanged.
+
+Run from repo root: python3 scripts/patch_ingest_feed_cache.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_MAP_CONCURRENT
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+# ── Ingest & Filter News ──────────────────────────────────────────────────────
+JS_INGEST = JS_MAP_CONCURRENT + r"""
+const https = require('https');
+const http  = require('http');
+const zlib  = require('zlib');
+const fs    = require('fs');
+const path  = require('path');
+
+const sourcesData = $('Fetch sources.json').first().json;
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const ingestCfg   = pipelineCfg.ingest || {};
+const TIMEOUT_MS  = ingestCfg.timeout_ms || 15000;
+const MAX_CONCURRENCY = ingestCfg.mode === 'sequential' ? 1 : (ingestCfg.max_concurrency || 6);
+const PER_HOST        = ingestCfg.per_host_concurrency || 1;
+const CONDITIONAL_GET = ingestCfg.conditional_get !== false;
+const CACHE_PATH      = ingestCfg.cache_path || '/logs/cache/feeds.json';
+
+// Feed cache: { [rss url]: { etag, last_modified, items, fetched_at } }
+let feedCache = {};
+try { feedCache = JSON.parse(fs.readFileSync(CACHE_PATH, 'utf8')); } catch (e) {}
+
+// Fetch a URL following redirects, handles gzip. Resolves with
+// { status, body, headers, wire_bytes } — status 304 has an empty body.
+function fetchUrl(url, extraHeaders, maxRedirects) {
+  if (maxRedirects === undefined) maxRedirects = 5;
+  return new Promise((resolve, reject) => {
+    if (maxRedirects < 0) return reject(new Error('Too many redirects'));
+    const lib = url.startsWith('https') ? https : http;
+    const opts = {
+      headers: {
+        'User-Agent': 'Mozilla/5.0 (compatible; CircuitBreakers/1.0; +https://github.com/msangui/podcast)',
+        'Accept': 'application/rss+xml, application/xml, text/xml, */*',
+        'Accept-Encoding': 'gzip, deflate',
+        ...extraHeaders
+      },
+      timeout: TIMEOUT_MS
+    };
+    const req = lib.get(url, opts, (res) => {
+      if (res.statusCode >= 300 && res.statusCode < 400 && res.statusCode !== 304 && res.headers.location) {
+        res.resume();
+        const next = new URL(res.headers.location, url).toString();
+        return fetchUrl(next, extraHeaders, maxRedirects - 1).then(resolve).catch(reject);
+      }
+      if (res.statusCode === 304) {
+        res.resume();
+        return resolve({ status: 304, body: '', headers: res.headers, wire_bytes: 0 });
+      }
+      if (res.statusCode !== 200) {
+        res.resume();
+        return reject(new Error(`HTTP ${res.statusCode}`));
+      }
+      const chunks = [];
+      let wireBytes = 0;
+      res.on('data', chunk => { wireBytes += chunk.length; });
+      let stream = res;
+      const enc = (res.headers['content-encoding'] || '').toLowerCase();
+      if (enc === 'gzip')    stream = res.pipe(zlib.createGunzip());
+      if (enc === 'deflate') stream = res.pipe(zlib.createInflate());
+      stream.on('data', chunk => chunks.push(Buffer.isBuffer(chunk) ? chunk : Buffer.from(chunk)));
+      stream.on('end',  () => resolve({
+        status: 200, body: Buffer.concat(chunks).toString('utf8'),
+        headers: res.headers, wire_bytes: wireBytes
+      }));
+      stream.on('error', reject);
+    });
+    req.on('error', reject);
+    req.on('timeout', () => { req.destroy(); reject(new Error('Request timed out')); });
+  });
+}
+
+function conditionalHeaders(entry) {
+  const h = {};
+  if (!CONDITIONAL_GET || !entry || !Array.isArray(entry.items)) return h;
+  if (entry.etag)          h['If-None-Match']     = entry.etag;
+  if (entry.last_modified) h['If-Modified-Since'] = entry.last_modified;
+  return h;
+}
+
+function hostOf(source) {
+  try { return new URL(source.rss).hostname; } catch (e) { return source.rss; }
+}
+
+function parseRss(xml) {
+  const items = [];
+  const itemRe = /<item>([\s\S]*?)<\/item>/g;
+  let m;
+  while ((m = itemRe.exec(xml)) !== null) {
+    const block = m[1];
+    const get = (tag) => {
+      const r = new RegExp(
+        `<${tag}[^>]*><!\\[CDATA\\[([\\s\\S]*?)\\]\\]></${tag}>|<${tag}[^>]*>([\\s\\S]*?)</${tag}>`
+      ).exec(block);
+      return r ? (r[1] || r[2] || '').trim() : '';
+    };
+    const pubDate = get('pubDate');
+    const rawLink = get('link') || get('guid');
+    const link = (rawLink.match(/https?:\/\/[^\s<"]+/) || [rawLink])[0];
+    items.push({
+      title: get('title'),
+      link,
+      description: get('description').replace(/<[^>]+>/g, '').substring(0, 400),
+      published: pubDate ? new Date(pubDate).getTime() : Date.now(),
+      score: parseInt(get('score') || '0', 10)
+    });
+  }
+  return items;
+}
+
+const sources = [...sourcesData.sources, ...(sourcesData.rotation_pool || [])]
+  .filter(s => s.active && s.rss && (s.type || 'rss') === 'rss');
+const hnSource = sourcesData.sources.find(s => s.name === 'Hacker News');
+const HN_KEYWORDS = hnSource?.keywords || [];
+const MAX_AGE_MS = 36 * 3600 * 1000;
+const now = Date.now();
+const ingestStart = Date.now();
+
+const fetched = await mapConcurrent(sources, MAX_CONCURRENCY, PER_HOST, hostOf, async (source) => {
+  const started = Date.now();
+  try {
+    const res = await fetchUrl(source.rss, conditionalHeaders(feedCache[source.rss]));
+    return { ...res, started, ms: Date.now() - started };
+  } catch (err) {
+    // Degrade gracefully — one bad feed must not kill the pipeline
+    console.error('Feed error:', source.name, err.message);
+    return { error: err, started, ms: Date.now() - started };
+  }
+});
+
+// Merge in sources.json order so dedup and sort are independent of fetch timing
+const allStories  = [];
+const seenUrls    = new Set();
+const feedTimings = [];
+const cacheStats  = { hits: 0, misses: 0, wire_bytes: 0 };
+
+sources.forEach((source, i) => {
+  const res    = fetched[i] || {};
+  const timing = {
+    source:     source.name,
+    host:       hostOf(source),
+    start_ms:   res.started ? res.started - ingestStart : null,
+    fetch_ms:   res.ms ?? null,
+    status:     res.error ? 'error' : 'ok',
+    cache:      res.error ? null : (res.status === 304 ? 'hit' : 'miss'),
+    wire_bytes: res.wire_bytes || 0,
+    items:      0,
+    kept:       0
+  };
+  if (res.error) {
+    timing.error = res.error.message;
+    feedTimings.push(timing);
+    return;
+  }
+
+  const parseStart = Date.now();
+  let items;
+  if (res.status === 304) {
+    items = feedCache[source.rss].items;
+    cacheStats.hits++;
+  } else {
+    items = parseRss(res.body);
+    cacheStats.misses++;
+    feedCache[source.rss] = {
+      etag:          res.headers.etag || null,
+      last_modified: res.headers['last-modified'] || null,
+      items,
+      fetched_at:    new Date().toISOString()
+    };
+  }
+  cacheStats.wire_bytes += timing.wire_bytes;
+  timing.items = items.length;
+  items = items.filter(item => (now - item.published) <= MAX_AGE_MS);
+
+  if (source.name === 'Hacker News') {
+    items = items.filter(item => {
+      if (item.score < 100) return false;
+      const text = (item.title + ' ' + item.description).toLowerCase();
+      return HN_KEYWORDS.some(kw => text.includes(kw.toLowerCase()));
+    });
+  }
+
+  for (const item of items) {
+    if (!item.link || seenUrls.has(item.link)) continue;
+    seenUrls.add(item.link);
+    timing.kept++;
+    allStories.push({
+      title:       item.title,
+      url:         item.link,
+      description: item.description,
+      published:   new Date(item.published).toISOString(),
+      source:      source.name,
+      source_tier: source.tier,
+      hn_score:    item.score || null
+    });
+  }
+  timing.parse_ms = Date.now() - parseStart;
+  feedTimings.push(timing);
+});
+
+allStories.sort((a, b) => {
+  if (a.source_tier !== b.source_tier) return a.source_tier - b.source_tier;
+  return new Date(b.published) - new Date(a.published);
+});
+
+// Persist the cache atomically; drop entries for feeds no longer configured
+try {
+  const active = new Set(sources.map(s => s.rss));
+  for (const url of Object.keys(feedCache)) if (!active.has(url)) delete feedCache[url];
+  fs.mkdirSync(path.dirname(CACHE_PATH), { recursive: true });
+  fs.writeFileSync(`${CACHE_PATH}.tmp`, JSON.stringify(feedCache));
+  fs.renameSync(`${CACHE_PATH}.tmp`, CACHE_PATH);
+} catch (e) {
+  console.error('Feed cache write failed:', e.message);
+}
+
+return [{ json: {
+  stories:      allStories,
+  total:        allStories.length,
+  fetched_at:   new Date().toISOString(),
+  ingest_mode:  MAX_CONCURRENCY === 1 ? 'sequential' : 'concurrent',
+  ingest_ms:    Date.now() - ingestStart,
+  feed_timings: feedTimings,
+  feed_cache:   cacheStats
+} }];
+"""
+
+# ── Write Run Log (updated: feed cache hit/miss counts) ───────────────────────
+JS_WRITE_LOG = r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+} catch (e) {}
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+patched = set()
+for node in wf["nodes"]:
+    if node["name"] == "Ingest & Filter News":
+        node["parameters"]["jsCode"] = JS_INGEST
+        node["parameters"]["mode"]   = "runOnceForAllItems"
+        patched.add(node["name"])
+        print("  ✓ Patched 'Ingest & Filter News' — conditional GET with persistent feed cache")
+    elif node["name"] == "Write Run Log":
+        node["parameters"]["jsCode"] = JS_WRITE_LOG
+        patched.add(node["name"])
+        print("  ✓ Patched 'Write Run Log' — records feed_cache stats")
+
+missing = {"Ingest & Filter News", "Write Run Log"} - patched
+if missing:
+    print(f"  ✗ Nodes not found: {missing}")
+    raise SystemExit(1)
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
+print()
+print("Verification: run the workflow twice — the second run's /logs/{date}.json")
+print("should show feed_cache.hits > 0 and wire_bytes near zero for unchanged feeds")
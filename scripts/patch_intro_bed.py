@@ -0,0 +1,403 @@
+"""
+Pre-renders the ducked intro bed once and reuses it. Until now every run, and
+both assembly paths, applied the same volume envelope (INTRO_VOLUME) to
+/assets/intro.mp3 inside the mix graph.
+
+  - introBed() renders intro.mp3 through INTRO_VOLUME into a 16-bit WAV
+    (lossless, so the bed is not encoded twice) under intro_bed.dir
+  - The file is keyed by sha256(intro.mp3 bytes + envelope + render format):
+    replacing the intro or editing the envelope gives a new key, the next run
+    renders it and older beds are deleted
+  - assemblyArgs() takes introBed: the per-episode graph then only delays the
+    speech and overlays it (amix), with no per-frame volume expression
+  - Used by Generate Voice's streaming encoder and Concatenate Audio's batch
+    path; a failed render falls back to the live envelope
+  - intro_bed {hit, key, render_ms, error} goes to the run log under
+    audio_assembly
+
+Run from repo root: python3 scripts/patch_intro_bed.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import (
+    JS_TTS, JS_TTS_SCHEDULER, JS_TTS_CACHE, JS_TTS_CHECKPOINT, JS_ARTIFACTS,
+    JS_FFMPEG_RUNNER, JS_AUDIO_ASSEMBLY, JS_INTRO_BED, JS_STREAM_ENCODER
+)
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Generate Voice (Sequential) — TTS + streaming assembly ────────────────────
+JS_GENERATE_VOICE = (JS_TTS + JS_TTS_SCHEDULER + JS_TTS_CACHE + JS_TTS_CHECKPOINT + JS_ARTIFACTS
+                     + JS_AUDIO_ASSEMBLY + JS_FFMPEG_RUNNER + JS_INTRO_BED + JS_STREAM_ENCODER + r"""
+const fs = require('fs');
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const prefetchDir = (pipelineCfg.writer_stream || {}).prefetch_dir || '/tmp/tts-prefetch';
+const ttsCfg      = pipelineCfg.tts || {};
+const format      = ttsFormat(ttsCfg);
+const cache       = ttsCacheConfig(ttsCfg);
+const ckptCfg     = ttsCheckpointConfig(ttsCfg);
+const artCfg      = artifactConfig(pipelineCfg);
+const streamCfg   = ttsCfg.stream_assembly || {};
+const ffCfg       = ffmpegConfig(pipelineCfg);
+const bedCfg      = introBedConfig(pipelineCfg);
+
+const lines  = $input.all().map(i => i.json);
+const apiKey = $env.ELEVENLABS_API_KEY;
+const t0     = Date.now();
+const keys   = lines.map(l => ttsKey(l, l.text, format));
+
+// One episode per day, so the date identifies the run across retries
+const runId  = new Date().toISOString().split('T')[0];
+const pruned = pruneTtsCheckpoints(ckptCfg, runId);
+const ckpt   = openTtsCheckpoint(ckptCfg, runId, lines.length);
+
+// Resume order: this run's checkpoints, lines the streaming writer already
+// synthesized, the persistent cache — only the rest go to ElevenLabs
+const audio  = new Array(lines.length).fill(null);
+const source = new Array(lines.length).fill('api');
+lines.forEach((l, i) => {
+  audio[i] = ckpt.load(l.line_index, keys[i]);
+  if (audio[i]) { source[i] = 'checkpoint'; return; }
+  try { audio[i] = fs.readFileSync(`${prefetchDir}/${keys[i]}.${format.ext}`); source[i] = 'prefetch'; } catch (e) {}
+  if (!audio[i]) {
+    audio[i] = readTtsCache(cache, keys[i]);
+    if (audio[i]) source[i] = 'cache';
+  }
+  if (audio[i]) ckpt.save(l.line_index, keys[i], l.text.length, audio[i], source[i]);
+});
+const resumed = source.filter(s => s === 'checkpoint').length;
+
+// Streaming assembly (PCM only): one encoder for the whole run, fed in
+// line_index order — lines that are already here go in straight away
+const order = lines.map((l, i) => i).sort((a, b) => lines[a].line_index - lines[b].line_index);
+let encoder = null, encoderOut = null, introSec = null, bed = null, fed = 0;
+if (format.pcm && streamCfg.enabled !== false && lines.length) {
+  const introPath = '/assets/intro.mp3';
+  const hasIntro  = fs.existsSync(introPath);
+  bed = hasIntro ? await introBed(bedCfg, introPath, ffCfg) : null;
+  const outDir    = $env.SAVE_LOCAL === 'true' ? `/episodes/${runId}` : artifactRunDir(artCfg, runId);
+  const fname     = `circuit-breakers-${runId}.mp3`;
+  fs.mkdirSync(outDir, { recursive: true });
+  encoderOut = { path: `${outDir}/${fname}`, partial: `${outDir}/.partial-${fname}` };
+  encoder = startStreamingEncoder(assemblyArgs({
+    pcmFile:    'pipe:0',
+    sampleRate: format.sample_rate,
+    introPath:  hasIntro ? introPath : null,
+    introBed:   bed && bed.path,
+    outFile:    encoderOut.partial,
+    loudness:   loudnessConfig($('Fetch show-format.json').first().json)
+  }));
+  // Probed while TTS runs; only needed for the tail timeout
+  introSec = hasIntro ? mediaDurationSec((bed && bed.path) || introPath) : null;
+}
+function feed() {
+  if (!encoder || encoder.error) return;
+  while (fed < order.length && audio[order[fed]]) encoder.push(audio[order[fed++]]);
+}
+feed();
+
+// With an encoder waiting, synthesize in episode order so the front of the
+// queue unblocks it; otherwise longest-first keeps the tail short
+const pending = order.filter(i => !audio[i]);
+let results, stats;
+try {
+  ({ results, stats } = await runTtsSchedule(pending.map(i => ({
+    cost: lines[i].text.length,
+    run:  async () => {
+      const buf = await postElevenlabs(lines[i].voice_id, lines[i].text, lines[i].voice_settings, lines[i].speed, apiKey, format);
+      ckpt.save(lines[i].line_index, keys[i], lines[i].text.length, buf, 'api');
+      audio[i] = buf;
+      feed();
+      return buf;
+    }
+  })), { ...ttsCfg, dispatch: encoder ? 'in_order' : ttsCfg.dispatch }));
+} catch (e) {
+  if (encoder) {
+    encoder.abort();
+    try { fs.unlinkSync(encoderOut.partial); } catch (err) {}
+  }
+  if (ckptCfg.enabled) {
+    e.message = `${e.message} — ${ckpt.count()}/${lines.length} lines checkpointed in ${ckpt.dir}; retry to resume`;
+  }
+  throw e;
+}
+const attempts = new Array(lines.length).fill(0);
+pending.forEach((i, k) => { audio[i] = results[k].value; attempts[i] = results[k].attempts; });
+
+// Last line is in — close stdin and wait for the encoder to flush the tail.
+// On failure Concatenate Audio assembles from the line files instead.
+let streamAssembly = null;
+if (encoder) {
+  const tTail    = Date.now();
+  const totalSec = episodeDurationSec(lineDurationSec(encoder.bytes, format.name), await introSec);
+  const leftSec  = totalSec != null ? Math.max(0, totalSec - encoder.stats.out_time_s) : null;
+  try {
+    await encoder.finish(totalSec, ffmpegTimeoutMs(ffCfg, leftSec));
+    fs.renameSync(encoderOut.partial, encoderOut.path);
+    streamAssembly = {
+      path:      encoderOut.path,
+      bytes:     fs.statSync(encoderOut.path).size,
+      pcm_bytes: encoder.bytes,
+      tail_ms:   Date.now() - tTail,
+      ffmpeg:    { ...encoder.stats },
+      intro_bed: bed,
+      error:     null
+    };
+  } catch (e) {
+    encoder.abort();
+    try { fs.unlinkSync(encoderOut.partial); } catch (err) {}
+    streamAssembly = {
+      path: null, bytes: null, pcm_bytes: encoder.bytes, tail_ms: null,
+      ffmpeg: { ...encoder.stats }, intro_bed: bed, error: String(e.message).slice(0, 300)
+    };
+  }
+}
+
+// Everything synthesized (this attempt, an earlier one, or by the writer) goes into the cache
+lines.forEach((l, i) => { if (source[i] !== 'cache') writeTtsCache(cache, keys[i], audio[i]); });
+const evicted = evictTtsCache(cache);
+
+const hits = lines.filter((l, i) => source[i] === 'cache');
+const ttsCache = {
+  enabled:     cache.enabled,
+  hits:        hits.length,
+  misses:      lines.length - hits.length,
+  chars_saved: hits.reduce((a, l) => a + l.text.length, 0),
+  evicted
+};
+const ttsCheckpoint = {
+  enabled:       ckptCfg.enabled,
+  run_id:        runId,
+  dir:           ckptCfg.enabled ? ckpt.dir : null,
+  resumed,
+  resumed_chars: lines.reduce((a, l, i) => a + (source[i] === 'checkpoint' ? l.text.length : 0), 0),
+  written:       ckpt.written,
+  pruned_runs:   pruned
+};
+// Hand downstream nodes a file per line: the checkpoint chunk when it holds
+// exactly this audio, otherwise a copy in the run's artifact dir
+const artDir = artifactRunDir(artCfg, runId);
+const audioPaths = lines.map((l, i) => {
+  const name = `${String(l.line_index).padStart(4, '0')}.${format.ext}`;
+  if (ckptCfg.enabled) {
+    try {
+      if (fs.statSync(`${ckpt.dir}/${name}`).size === audio[i].length) return `${ckpt.dir}/${name}`;
+    } catch (e) {}
+  }
+  return writeArtifact(`${artDir}/tts/${name}`, audio[i]).path;
+});
+
+const schedule = {
+  ...stats,
+  output_format: format.name,
+  dispatch:      encoder ? 'in_order' : (ttsCfg.dispatch || 'longest_first'),
+  lines:         lines.length,
+  prefetched:    source.filter(s => s === 'prefetch').length,
+  wall_ms:       Date.now() - t0
+};
+
+return lines
+  .map((l, i) => ({ l, i }))
+  .sort((a, b) => a.l.line_index - b.l.line_index)
+  .map(({ l, i }, n) => ({
+    json: {
+      speaker:       l.speaker,
+      line_index:    l.line_index,
+      total_lines:   l.total_lines,
+      episode_title: l.episode_title,
+      prefetched:    source[i] === 'prefetch',
+      tts_source:    source[i],
+      tts_attempts:  attempts[i],
+      bytes:         audio[i].length,
+      audio_path:    audioPaths[i],
+      audio_format:  format.name,
+      sample_rate:   format.sample_rate,
+      // run-level stats ride on the first item
+      ...(n === 0 ? { tts_schedule: schedule, tts_cache: ttsCache, tts_checkpoint: ttsCheckpoint, stream_assembly: streamAssembly } : {})
+    }
+  }));
+""")
+
+# ── Concatenate Audio — streamed episode or awaited batch assembly ───────────
+JS_CONCAT_AUDIO = JS_ARTIFACTS + JS_AUDIO_ASSEMBLY + JS_FFMPEG_RUNNER + JS_INTRO_BED + r"""
+const fs    = require('fs');
+const items = $input.all();
+const date  = new Date().toISOString().split('T')[0];
+const fname = `circuit-breakers-${date}.mp3`;
+
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const artCfg   = artifactConfig(pipelineCfg);
+const ffCfg    = ffmpegConfig(pipelineCfg);
+const bedCfg   = introBedConfig(pipelineCfg);
+const loudness = loudnessConfig($('Fetch show-format.json').first().json);
+const pruned   = pruneArtifacts(artCfg, date);
+const artDir   = artifactRunDir(artCfg, date);
+
+// TTS segments are already on disk — hand their paths straight to ffmpeg
+const segFiles = [];
+let ttsBytes = 0;
+items.forEach(item => {
+  if (!item.json.audio_path) return;
+  ttsBytes += checkArtifact(item.json.audio_path, item.json.bytes);
+  segFiles.push(item.json.audio_path);
+});
+
+// Local runs write the episode straight into /episodes/{date}/, otherwise it
+// stays in the run's artifact dir until the uploads have read it.
+const introPath  = '/assets/intro.mp3';
+const hasIntro   = fs.existsSync(introPath);
+const episodeDir = `/episodes/${date}`;
+const outDir     = $env.SAVE_LOCAL === 'true' ? episodeDir : artDir;
+let   outFile    = `${outDir}/${fname}`;
+fs.mkdirSync(outDir, { recursive: true });
+const loudnorm   = loudness.enabled ? { I: loudness.integrated_lufs, TP: loudness.true_peak_db, LRA: loudness.lra } : null;
+
+// Generate Voice may already have encoded the episode while TTS was running
+const streamed = (items[0] && items[0].json.stream_assembly) || null;
+let assembly;
+if (streamed && streamed.path && !streamed.error) {
+  outFile  = streamed.path;
+  assembly = {
+    passes: 1, input: 'stream', ms: streamed.tail_ms, loudnorm, has_intro: hasIntro,
+    ffmpeg: streamed.ffmpeg || null, intro_bed: streamed.intro_bed || null
+  };
+} else {
+  const tmpDir = `/tmp/ep-${Date.now()}`;
+  fs.mkdirSync(tmpDir, { recursive: true });
+
+  // Raw PCM lines are byte-appended into one file — no decode per chunk and no
+  // MP3 frame padding between lines. Anything else goes through the concat list.
+  const pcmRate = items.length && items.every(i => /^pcm_/.test(i.json.audio_format || '') && i.json.sample_rate === items[0].json.sample_rate)
+    ? items[0].json.sample_rate : null;
+  let listFile = null, pcmFile = null;
+  if (pcmRate) {
+    pcmFile = `${tmpDir}/speech.pcm`;
+    const fd = fs.openSync(pcmFile, 'w');
+    for (const f of segFiles) {
+      const buf = fs.readFileSync(f);
+      fs.writeSync(fd, buf);
+      if (buf.length % 2) fs.writeSync(fd, Buffer.alloc(1));   // keep 16-bit sample alignment
+    }
+    fs.closeSync(fd);
+  } else {
+    listFile = `${tmpDir}/list.txt`;
+    fs.writeFileSync(listFile, segFiles.map(f => `file '${f}'`).join('\n'));
+  }
+
+  // Expected length from the line sizes; lines of an unknown format fall back
+  // to ffprobe. It drives the timeout and the remaining-time estimate.
+  let speechSec = 0;
+  for (const item of items) {
+    if (!item.json.audio_path) continue;
+    const sec = lineDurationSec(item.json.bytes, item.json.audio_format) ?? await mediaDurationSec(item.json.audio_path);
+    if (sec == null) { speechSec = null; break; }
+    speechSec += sec;
+  }
+  const bed      = hasIntro ? await introBed(bedCfg, introPath, ffCfg) : null;
+  const totalSec = episodeDurationSec(speechSec, hasIntro ? await mediaDurationSec((bed && bed.path) || introPath) : null);
+
+  // Concat + intro overlay + loudness in one graph, one encode — awaited, so
+  // the worker keeps serving other executions meanwhile
+  const t0 = Date.now();
+  const ffmpeg = await runFfmpeg(
+    assemblyArgs({ listFile, pcmFile, sampleRate: pcmRate, introPath: hasIntro ? introPath : null, introBed: bed && bed.path, outFile, loudness }),
+    { durationSec: totalSec, timeoutMs: ffmpegTimeoutMs(ffCfg, totalSec), label: 'assembly' }
+  );
+  assembly = {
+    passes:    1,
+    input:     pcmRate ? `pcm_${pcmRate}` : 'mp3',
+    ms:        Date.now() - t0,
+    loudnorm,
+    has_intro: hasIntro,
+    ffmpeg,
+    intro_bed: bed,
+    ...(streamed && streamed.error ? { stream_error: streamed.error } : {})
+  };
+  try { fs.rmSync(tmpDir, { recursive: true, force: true }); } catch (e) {}
+}
+const combinedBytes = checkArtifact(outFile);
+
+if ($env.SAVE_LOCAL === 'true') {
+  // Save transcript — prefer Editor Review output (corrected script), fall back to writer
+  let transcript = '';
+  try {
+    transcript = $('Editor Review').first().json.script || '';
+  } catch (_) {
+    try { transcript = $('Parse Writer Response').first().json.script || ''; } catch (_) {}
+  }
+  if (transcript) fs.writeFileSync(`${episodeDir}/transcript.txt`, transcript);
+}
+
+// Before/after numbers for the run log: what now rides in item JSON vs what
+// the base64 fields used to add to every execution
+const mb = n => Math.round(n / 1048576 * 10) / 10;
+const artifacts = {
+  dir:                   artDir,
+  tts_lines:             segFiles.length,
+  tts_bytes:             ttsBytes,
+  combined_bytes:        combinedBytes,
+  voice_item_json_bytes: items.reduce((a, i) => a + Buffer.byteLength(JSON.stringify(i.json)), 0),
+  base64_bytes_avoided:  items.reduce((a, i) => a + base64Bytes(i.json.bytes || 0), 0) + base64Bytes(combinedBytes),
+  heap_used_mb:          mb(process.memoryUsage().heapUsed),
+  max_rss_mb:            mb(process.resourceUsage().maxRSS * 1024),
+  pruned_runs:           pruned
+};
+
+return [{
+  json: {
+    file_name:      fname,
+    episode_dir:    episodeDir,
+    line_count:     items.length,
+    has_intro:      hasIntro,
+    combined_path:  outFile,
+    combined_bytes: combinedBytes,
+    artifacts,
+    assembly
+  }
+}];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Generate Voice (Sequential)":
+        n["parameters"]["jsCode"] = JS_GENERATE_VOICE
+        print("  ✓ Patched 'Generate Voice (Sequential)' — streams over the cached intro bed")
+    elif n["name"] == "Concatenate Audio":
+        n["parameters"]["jsCode"] = JS_CONCAT_AUDIO
+        print("  ✓ Patched 'Concatenate Audio' — overlays the cached intro bed")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
@@ -36,7 +36,7 @@ def n8n(method, path, data=None):
 
 # Nodes that fetch .json config files — GitHub serves them as text/plain
 # so n8n won't auto-parse; force responseFormat: json
-JSON_FETCH_NODES = {"Fetch sources.json", "Fetch show-format.json"}
+JSON_FETCH_NODES = {"Fetch sources.json", "Fetch pipeline.json", "Fetch show-format.json"}
 
 print(f"→ Fetching Workflow {WF_ID}...")
 wf = n8n("GET", f"/workflows/{WF_ID}")
@@ -0,0 +1,448 @@
+"""
+Turns on Anthropic prompt caching for every Claude call that resends the same
+system prompt: curator, writer, editor (Workflow 01) and concierge (Workflow 02).
+
+  - System prompts are sent as a text block with cache_control: ephemeral
+  - Curator and writer also put the show-format block first in the user
+    message with its own breakpoint, so system prompt + show format are one
+    cached prefix and only the feed / brief is billed at the full rate
+  - Editor Review returns editor_usage; Write Run Log records claude_usage
+    (input/output/cache_creation/cache_read tokens) for curator, writer, editor
+  - Concierge: Parse Claude Response logs cache reads/writes and passes _usage
+
+Prompts shorter than the model's minimum cacheable length (1024 tokens for
+Sonnet) are sent as normal — the API ignores the breakpoint, nothing breaks.
+
+Run from repo root: python3 scripts/patch_prompt_caching.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX, JS_PROMPT_ENCODING
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL      = "http://localhost:5678/api/v1"
+N8N_API_KEY  = env["N8N_API_KEY"]
+WF_ID        = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+CONCIERGE_ID = env["N8N_WORKFLOW_ID_CONCIERGE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Claude request bodies (HTTP Request nodes) ────────────────────────────────
+CURATOR_BODY = (
+    "={{ JSON.stringify({"
+    " model: 'claude-sonnet-4-6',"
+    " max_tokens: 4096,"
+    " system: [{ type: 'text', text: $('Build Curator Input').first().json.system_prompt,"
+    " cache_control: { type: 'ephemeral' } }],"
+    " messages: [{ role: 'user', content: $('Build Curator Input').first().json.user_content }]"
+    " }) }}"
+)
+
+WRITER_BODY = (
+    "={{ JSON.stringify({"
+    " model: 'claude-sonnet-4-6',"
+    " max_tokens: 8192,"
+    " system: [{ type: 'text', text: $('Build Writer Input').first().json.system_prompt,"
+    " cache_control: { type: 'ephemeral' } }],"
+    " messages: [{ role: 'user', content: $('Build Writer Input').first().json.user_content }]"
+    " }) }}"
+)
+
+CONCIERGE_BODY = (
+    "={{ JSON.stringify({"
+    " model: 'claude-sonnet-4-6',"
+    " max_tokens: 1024,"
+    " system: [{ type: 'text', text: $('Fetch Concierge Prompt').item.json.data,"
+    " cache_control: { type: 'ephemeral' } }],"
+    " messages: [{ role: 'user', content: $('Telegram Trigger').item.json.message.text }]"
+    " }) }}"
+)
+
+# ── Concierge: Parse Claude Response (adds cache usage) ───────────────────────
+JS_PARSE_CONCIERGE = r"""
+// Extract JSON from Claude's response
+const claudeOutput = $input.first().json;
+const rawText = claudeOutput.content[0].text.trim();
+const usage   = claudeOutput.usage || null;
+if (usage) {
+  console.log(`[Concierge] tokens in=${usage.input_tokens} out=${usage.output_tokens} ` +
+    `cache_read=${usage.cache_read_input_tokens || 0} cache_write=${usage.cache_creation_input_tokens || 0}`);
+}
+
+// Strip markdown code fences if Claude wrapped the JSON
+let jsonStr = rawText;
+const fenceMatch = jsonStr.match(/^```(?:json)?\n?([\s\S]*?)\n?```$/);
+if (fenceMatch) jsonStr = fenceMatch[1].trim();
+
+const parsed = JSON.parse(jsonStr);
+
+// Attach Telegram context for downstream nodes
+const tgMsg = $('Telegram Trigger').first().json.message;
+return [{
+  json: {
+    route:                 parsed.route,
+    action:                parsed.action || '',
+    response:              parsed.response,
+    requires_confirmation: parsed.requires_confirmation || false,
+    _chat_id:              String(tgMsg.chat.id),
+    _message_id:           tgMsg.message_id,
+    _original_text:        tgMsg.text,
+    _usage:                usage
+  }
+}];
+"""
+
+# ── Workflow 01 Code nodes ────────────────────────────────────────────────────
+JS_BUILD_CURATOR = JS_PROMPT_ENCODING + r"""
+const stories    = $('Score Stories').first().json.stories;
+const showFormat = $('Fetch show-format.json').first().json;
+const prompt     = $('Fetch Curator Prompt').first().json.data;
+const mode       = promptEncoding(showFormat, 'curator');
+
+const formatBlock = encodeValue({
+  episode_length_minutes: showFormat.episode_length_minutes,
+  segments: showFormat.segments
+}, mode);
+const feedBlock = encodeValue(stories, mode);
+const feedNote  = mode === 'columnar'
+  ? 'one story per row, tab-separated, header first; list cells are "; "-joined'
+  : 'JSON array';
+
+// Static prefix first so the cache breakpoint covers system prompt + show format;
+// everything that changes daily goes after it
+const staticBlock = ['SHOW FORMAT REFERENCE:', formatBlock].join('\n');
+const dynamicBlock = [
+  `DATE: ${new Date().toISOString().split('T')[0]}`,
+  '',
+  `RAW FEED (${stories.length} stories, highest local_score first; already-aired stories removed; ` +
+    'duplicates merged — source_count/sources list every outlet that ran the story; ' +
+    `local_score/score_components are precomputed from the scoring rubric; ${feedNote}):`,
+  feedBlock
+].join('\n');
+
+const userContent = [
+  { type: 'text', text: staticBlock, cache_control: { type: 'ephemeral' } },
+  { type: 'text', text: dynamicBlock }
+];
+const userMessage = `${staticBlock}\n\n${dynamicBlock}`;
+
+const promptStats = measurePrompt('curator', mode, prompt, userMessage, {
+  show_format: formatBlock, raw_feed: feedBlock
+});
+
+return [{ json: {
+  system_prompt: prompt,
+  user_message:  userMessage,
+  user_content:  userContent,
+  prompt_stats:  promptStats
+} }];
+"""
+
+JS_BUILD_WRITER = JS_PROMPT_ENCODING + r"""
+const brief      = $('Parse Curator Response').first().json.brief;
+const showFormat = $('Fetch show-format.json').first().json;
+const prompt     = $('Fetch Writer Prompt').first().json.data;
+const mode       = promptEncoding(showFormat, 'writer');
+
+const briefBlock  = encodeValue(brief, mode);
+const formatBlock = encodeValue({
+  hosts: showFormat.hosts,
+  segments: showFormat.segments,
+  target_word_count: showFormat.target_word_count,
+  words_per_minute: showFormat.words_per_minute
+}, mode);
+
+// Show format is identical every day — send it first, marked cacheable
+const staticBlock  = ['SHOW FORMAT:', formatBlock].join('\n');
+const dynamicBlock = ['CURATOR BRIEF:', briefBlock].join('\n');
+
+const userContent = [
+  { type: 'text', text: staticBlock, cache_control: { type: 'ephemeral' } },
+  { type: 'text', text: dynamicBlock }
+];
+const userMessage = `${staticBlock}\n\n${dynamicBlock}`;
+
+const promptStats = measurePrompt('writer', mode, prompt, userMessage, {
+  brief: briefBlock, show_format: formatBlock
+});
+
+return [{ json: {
+  system_prompt: prompt,
+  user_message:  userMessage,
+  user_content:  userContent,
+  prompt_stats:  promptStats
+} }];
+"""
+
+JS_EDITOR_REVIEW = r"""
+const https = require('https');
+
+const systemPrompt = $('Fetch Editor Prompt').first().json.data;
+const writerOut    = $('Parse Writer Response').first().json;
+const script       = writerOut.script || '';
+const episodeTitle = writerOut.episode_title || 'Circuit Breakers Daily';
+const ingestOut    = $('Ingest & Filter News').first().json;
+const stories      = ingestOut.stories || [];
+
+const sourceContext = stories.slice(0, 30)
+  .map(s => `- ${s.title} (${s.source}): ${(s.description || '').slice(0, 200)}`)
+  .join('\n');
+
+const userMessage = `EPISODE TITLE: ${episodeTitle}
+
+SOURCE STORIES (ground truth for fact-checking):
+${sourceContext}
+
+SCRIPT TO REVIEW:
+${script}`;
+
+const body = JSON.stringify({
+  model:      'claude-sonnet-4-6',
+  max_tokens: 10000,
+  system:     [{ type: 'text', text: systemPrompt, cache_control: { type: 'ephemeral' } }],
+  messages:   [{ role: 'user', content: userMessage }]
+});
+
+const result = await new Promise((resolve, reject) => {
+  const req = https.request({
+    hostname: 'api.anthropic.com',
+    path:     '/v1/messages',
+    method:   'POST',
+    headers: {
+      'x-api-key':         $env.ANTHROPIC_API_KEY,
+      'anthropic-version': '2023-06-01',
+      'Content-Type':      'application/json',
+      'Content-Length':    Buffer.byteLength(body)
+    }
+  }, res => {
+    let d = '';
+    res.on('data', c => d += c);
+    res.on('end', () => {
+      if (res.statusCode >= 200 && res.statusCode < 300) resolve(JSON.parse(d));
+      else reject(new Error(`Anthropic HTTP ${res.statusCode}: ${d}`));
+    });
+  });
+  req.on('error', reject);
+  req.write(body);
+  req.end();
+});
+
+const text = result.content[0].text.trim();
+let review;
+try {
+  const clean = text.replace(/^```json\s*/, '').replace(/\s*```$/, '');
+  review = JSON.parse(clean);
+} catch (e) {
+  // Pass script through unchanged on parse error
+  return [{ json: {
+    ...writerOut,
+    editorial_changes:    [`Editor parse error: ${e.message}`],
+    hallucinations_found: [],
+    editor_approved:      false,
+    editor_usage:         result.usage || null
+  } }];
+}
+
+// Send Telegram alert if hallucinations were found
+if (review.hallucinations_found && review.hallucinations_found.length > 0) {
+  const alertText = `⚠️ *Editor Alert — ${episodeTitle}*\n\nHallucinations detected:\n` +
+    review.hallucinations_found.map(h => `• ${h}`).join('\n') +
+    `\n\nThe episode will still be generated with corrections applied.`;
+
+  const tgBody = JSON.stringify({
+    chat_id:    $env.TELEGRAM_CHAT_ID,
+    text:       alertText,
+    parse_mode: 'Markdown'
+  });
+
+  await new Promise((resolve) => {
+    const req = https.request({
+      hostname: 'api.telegram.org',
+      path:     `/bot${$env.TELEGRAM_BOT_TOKEN}/sendMessage`,
+      method:   'POST',
+      headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(tgBody) }
+    }, res => { res.on('data', () => {}); res.on('end', resolve); });
+    req.on('error', resolve); // don't block pipeline on Telegram failure
+    req.write(tgBody);
+    req.end();
+  });
+}
+
+return [{ json: {
+  ...writerOut,
+  script:               review.script || script,
+  editorial_changes:    review.changes || [],
+  hallucinations_found: review.hallucinations_found || [],
+  editor_approved:      review.approved !== false,
+  editor_usage:         result.usage || null
+} }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+function claudeUsage(u) {
+  if (!u) return null;
+  return {
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage)
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+def put_wf(wf_id, wf):
+    n8n("PUT", f"/workflows/{wf_id}", {
+        "name": wf["name"], "nodes": wf["nodes"],
+        "connections": wf["connections"], "settings": wf["settings"]
+    })
+
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+if not any(n["name"] == "Score Stories" for n in wf["nodes"]):
+    print("  ✗ 'Score Stories' not found — run patch_score_stories.py first")
+    raise SystemExit(1)
+
+for n in wf["nodes"]:
+    if n["name"] == "Build Curator Input":
+        n["parameters"]["jsCode"] = JS_BUILD_CURATOR
+        print("  ✓ Patched 'Build Curator Input' — cacheable show-format block")
+    elif n["name"] == "Build Writer Input":
+        n["parameters"]["jsCode"] = JS_BUILD_WRITER
+        print("  ✓ Patched 'Build Writer Input' — cacheable show-format block")
+    elif n["name"] == "Call Claude - Curator":
+        n["parameters"]["jsonBody"] = CURATOR_BODY
+        print("  ✓ Patched 'Call Claude - Curator' — cached system prompt")
+    elif n["name"] == "Call Claude - Writer":
+        n["parameters"]["jsonBody"] = WRITER_BODY
+        print("  ✓ Patched 'Call Claude - Writer' — cached system prompt")
+    elif n["name"] == "Editor Review":
+        n["parameters"]["jsCode"] = JS_EDITOR_REVIEW
+        print("  ✓ Patched 'Editor Review' — cached system prompt + usage")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records claude_usage")
+put_wf(WF_ID, wf)
+print("  ✓ Saved")
+
+print(f"→ Fetching Workflow {CONCIERGE_ID}...")
+wf = n8n("GET", f"/workflows/{CONCIERGE_ID}")
+for n in wf["nodes"]:
+    if n["name"] == "Call Claude - Concierge":
+        n["parameters"]["jsonBody"] = CONCIERGE_BODY
+        print("  ✓ Patched 'Call Claude - Concierge' — cached system prompt")
+    elif n["name"] == "Parse Claude Response":
+        n["parameters"]["jsCode"] = JS_PARSE_CONCIERGE
+        print("  ✓ Patched 'Parse Claude Response' — logs cache usage")
+put_wf(CONCIERGE_ID, wf)
+print("  ✓ Saved")
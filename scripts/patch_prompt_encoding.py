@@ -0,0 +1,215 @@
+"""
+Adds a compact prompt encoding for the curator and writer inputs, selectable
+per agent, plus per-section size measurement.
+
+  - show-format.json → prompt_encoding.{curator,writer}: pretty | compact |
+    columnar (see JS_PROMPT_ENCODING below)
+  - Build Curator Input / Build Writer Input emit prompt_stats (chars and
+    ~tokens for the system prompt, user message and each section)
+  - Write Run Log records prompt_stats per agent so the savings show up in
+    /logs/{date}.json
+
+Run from repo root: python3 scripts/patch_prompt_encoding.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX, JS_PROMPT_ENCODING
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+JS_BUILD_CURATOR = JS_PROMPT_ENCODING + r"""
+const stories    = $('Score Stories').first().json.stories;
+const showFormat = $('Fetch show-format.json').first().json;
+const prompt     = $('Fetch Curator Prompt').first().json.data;
+const mode       = promptEncoding(showFormat, 'curator');
+
+const formatBlock = encodeValue({
+  episode_length_minutes: showFormat.episode_length_minutes,
+  segments: showFormat.segments
+}, mode);
+const feedBlock = encodeValue(stories, mode);
+const feedNote  = mode === 'columnar'
+  ? 'one story per row, tab-separated, header first; list cells are "; "-joined'
+  : 'JSON array';
+
+const userMessage = [
+  `DATE: ${new Date().toISOString().split('T')[0]}`,
+  '',
+  'SHOW FORMAT REFERENCE:',
+  formatBlock,
+  '',
+  `RAW FEED (${stories.length} stories, highest local_score first; already-aired stories removed; ` +
+    'duplicates merged — source_count/sources list every outlet that ran the story; ' +
+    `local_score/score_components are precomputed from the scoring rubric; ${feedNote}):`,
+  feedBlock
+].join('\n');
+
+const promptStats = measurePrompt('curator', mode, prompt, userMessage, {
+  show_format: formatBlock, raw_feed: feedBlock
+});
+
+return [{ json: { system_prompt: prompt, user_message: userMessage, prompt_stats: promptStats } }];
+"""
+
+JS_BUILD_WRITER = JS_PROMPT_ENCODING + r"""
+const brief      = $('Parse Curator Response').first().json.brief;
+const showFormat = $('Fetch show-format.json').first().json;
+const prompt     = $('Fetch Writer Prompt').first().json.data;
+const mode       = promptEncoding(showFormat, 'writer');
+
+const briefBlock  = encodeValue(brief, mode);
+const formatBlock = encodeValue({
+  hosts: showFormat.hosts,
+  segments: showFormat.segments,
+  target_word_count: showFormat.target_word_count,
+  words_per_minute: showFormat.words_per_minute
+}, mode);
+
+const userMessage = [
+  'CURATOR BRIEF:',
+  briefBlock,
+  '',
+  'SHOW FORMAT:',
+  formatBlock
+].join('\n');
+
+const promptStats = measurePrompt('writer', mode, prompt, userMessage, {
+  brief: briefBlock, show_format: formatBlock
+});
+
+return [{ json: { system_prompt: prompt, user_message: userMessage, prompt_stats: promptStats } }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+} catch (e) {}
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+nodes = wf["nodes"]
+if not any(n["name"] == "Score Stories" for n in nodes):
+    print("  ✗ 'Score Stories' not found — run patch_score_stories.py first")
+    raise SystemExit(1)
+
+for n in nodes:
+    if n["name"] == "Build Curator Input":
+        n["parameters"]["jsCode"] = JS_BUILD_CURATOR
+        print("  ✓ Patched 'Build Curator Input' — prompt encoding + stats")
+    elif n["name"] == "Build Writer Input":
+        n["parameters"]["jsCode"] = JS_BUILD_WRITER
+        print("  ✓ Patched 'Build Writer Input' — prompt encoding + stats")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records prompt_stats")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": nodes,
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
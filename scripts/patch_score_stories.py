@@ -0,0 +1,277 @@
+"""
+Scores stories locally before the curator call and caps the feed it sees.
+
+  - New 'Score Stories' node between 'Cluster Stories' and
+    'Fetch Curator Prompt'
+  - Computes the mechanical parts of the curator rubric (recency buckets,
+    cross-coverage from source_count, source tier, HN points) and attaches
+    local_score + score_components to every story; recency is measured from
+    the ingest's fetched_at, so a replayed feed scores the same
+  - Keeps every tier-0 story plus the top pipeline.json → scoring.top_k of the
+    rest, so the curator prompt stays the same size as sources are added
+  - Build Curator Input sends the scored feed; Write Run Log records
+    scoring stats
+
+Run from repo root: python3 scripts/patch_score_stories.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Score Stories ─────────────────────────────────────────────────────────────
+# Mirrors the mechanical part of the Scoring Logic in prompts/curator-agent.md.
+# Comedy potential (+1) still needs judgment and stays with the curator.
+JS_SCORE_STORIES = r"""
+const stories = $('Cluster Stories').first().json.stories || [];
+const cfg     = $('Fetch pipeline.json').first().json.scoring || {};
+const TOP_K   = cfg.top_k ?? 30;
+const ALWAYS  = new Set(cfg.always_include_tiers || [0]);
+// Recency is measured from when the feed was fetched, not from now: a
+// same-day rerun replays the ingest snapshot and must score it identically
+const now     = Date.parse($('Ingest & Filter News').first().json.fetched_at) || Date.now();
+
+function recencyPoints(published) {
+  const ageH = (now - new Date(published).getTime()) / 3600000;
+  if (ageH <= 12) return 3;
+  if (ageH <= 24) return 2;
+  if (ageH <= 36) return 1;
+  return 0;
+}
+
+function coveragePoints(n) {
+  if (n >= 3) return 3;
+  if (n === 2) return 1;
+  return 0;
+}
+
+function tierPoints(tier) {
+  if (tier === 0) return 3;
+  if (tier === 1) return 1;
+  return 0;
+}
+
+function hnPoints(score) {
+  if (score >= 300) return 2;
+  if (score >= 100) return 1;
+  return 0;
+}
+
+const scored = stories.map((story, feedIndex) => {
+  const components = {
+    recency:        recencyPoints(story.published),
+    cross_coverage: coveragePoints(story.source_count || 1),
+    source_tier:    tierPoints(story.source_tier),
+    hn_signal:      hnPoints(story.hn_score || 0)
+  };
+  const total = Object.values(components).reduce((a, b) => a + b, 0);
+  return {
+    story: { ...story, local_score: Math.max(1, Math.min(10, total)), score_components: components },
+    feedIndex
+  };
+});
+
+// Highest score first; ties keep feed order (tier, then recency)
+scored.sort((a, b) => (b.story.local_score - a.story.local_score) || (a.feedIndex - b.feedIndex));
+
+const kept = [];
+let ranked = 0;
+for (const { story } of scored) {
+  if (ALWAYS.has(story.source_tier)) {
+    kept.push(story);
+  } else if (ranked < TOP_K) {
+    kept.push(story);
+    ranked++;
+  }
+}
+
+const dropped = stories.length - kept.length;
+return [{ json: {
+  stories: kept,
+  total:   kept.length,
+  scoring: {
+    stories_in:     stories.length,
+    stories_kept:   kept.length,
+    dropped,
+    top_k:          TOP_K,
+    min_kept_score: kept.length ? Math.min(...kept.map(s => s.local_score)) : null
+  }
+} }];
+"""
+
+JS_BUILD_CURATOR = r"""
+const stories    = $('Score Stories').first().json.stories;
+const showFormat = $('Fetch show-format.json').first().json;
+const prompt     = $('Fetch Curator Prompt').first().json.data;
+
+const userMessage = [
+  `DATE: ${new Date().toISOString().split('T')[0]}`,
+  '',
+  'SHOW FORMAT REFERENCE:',
+  JSON.stringify({
+    episode_length_minutes: showFormat.episode_length_minutes,
+    segments: showFormat.segments
+  }, null, 2),
+  '',
+  `RAW FEED (${stories.length} stories, highest local_score first; already-aired stories removed; ` +
+    'duplicates merged — source_count/sources list every outlet that ran the story; ' +
+    'local_score/score_components are precomputed from the scoring rubric):',
+  JSON.stringify(stories, null, 2)
+].join('\n');
+
+return [{ json: { system_prompt: prompt, user_message: userMessage } }];
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+} catch (e) {}
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+nodes       = wf["nodes"]
+connections = wf["connections"]
+
+cluster_node = next((n for n in nodes if n["name"] == "Cluster Stories"), None)
+if not cluster_node:
+    print("  ✗ 'Cluster Stories' not found — run patch_cluster_stories.py first")
+    raise SystemExit(1)
+
+if any(n["name"] == "Score Stories" for n in nodes):
+    for n in nodes:
+        if n["name"] == "Score Stories":
+            n["parameters"]["jsCode"] = JS_SCORE_STORIES
+    print("  ✓ Updated 'Score Stories' node code")
+else:
+    nodes.append({
+        "parameters": {"jsCode": JS_SCORE_STORIES, "mode": "runOnceForAllItems"},
+        "id":   "score-stories",
+        "name": "Score Stories",
+        "type": "n8n-nodes-base.code",
+        "typeVersion": 2,
+        "position": [cluster_node["position"][0] + 220, cluster_node["position"][1]]
+    })
+    # Cluster Stories → Score Stories → (previous Cluster targets)
+    cluster_targets = connections.get("Cluster Stories", {}).get("main", [[]])[0]
+    connections["Cluster Stories"] = {
+        "main": [[{"node": "Score Stories", "type": "main", "index": 0}]]
+    }
+    connections["Score Stories"] = {
+        "main": [cluster_targets] if cluster_targets else [[]]
+    }
+    print("  ✓ Added 'Score Stories' after 'Cluster Stories'")
+
+for n in nodes:
+    if n["name"] == "Build Curator Input":
+        n["parameters"]["jsCode"] = JS_BUILD_CURATOR
+        print("  ✓ Patched 'Build Curator Input' — scored, top-K feed")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records scoring stats")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": nodes,
+    "connections": connections, "settings": wf["settings"]
+})
+print("  ✓ Saved")
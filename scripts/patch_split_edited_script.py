@@ -0,0 +1,96 @@
+"""
+Voices the script the editor approved. Split Script into Lines still read
+Parse Writer Response, so Editor Review's corrections reached the transcript
+(Concatenate Audio uses the edited script) but never the audio.
+
+  - Split Script into Lines reads the Editor Review script and falls back to
+    the writer's when the editor produced none
+  - Voices, speed and settings still come from show-format.json via
+    hostVoices()
+
+Run from repo root: python3 scripts/patch_split_edited_script.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_TTS
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Split Script into Lines ───────────────────────────────────────────────────
+JS_SPLIT = JS_TTS + r"""
+// Prefer the editor's corrected script, same as the transcript in Concatenate Audio
+let writerOut;
+try { writerOut = $('Editor Review').first().json; } catch (e) {}
+if (!writerOut || !writerOut.script) writerOut = $('Parse Writer Response').first().json;
+const voices = hostVoices($('Fetch show-format.json').first().json);
+
+const lines = writerOut.script
+  .split('\n')
+  .map(l => l.trim())
+  .filter(l => l.startsWith('CLAIRE:') || l.startsWith('FLINT:'));
+
+return lines.map((line, index) => {
+  const speaker = line.startsWith('CLAIRE:') ? 'CLAIRE' : 'FLINT';
+  const text    = line.replace(/^(CLAIRE|FLINT):\s*/, '').trim();
+  const voice   = voices[speaker];
+  return {
+    json: {
+      text,
+      voice_id:       voice.voice_id,
+      voice_settings: voice.voice_settings,
+      speed:          voice.speed,
+      speaker,
+      line_index:     index,
+      total_lines:    lines.length,
+      episode_title:  writerOut.episode_title
+    }
+  };
+});
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+nodes = wf["nodes"]
+if not any(n["name"] == "Editor Review" for n in nodes):
+    print("  ✗ 'Editor Review' not found — run patch_editor.py first")
+    raise SystemExit(1)
+
+for n in nodes:
+    if n["name"] == "Split Script into Lines":
+        n["parameters"]["jsCode"] = JS_SPLIT
+        print("  ✓ Patched 'Split Script into Lines' — voices the edited script")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": nodes,
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
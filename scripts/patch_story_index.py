@@ -0,0 +1,445 @@
+"""
+Replaces linear covered_urls scanning with a canonical-URL story index.
+
+  - canonicalUrl() normalizes scheme, host (www./m./amp.), trailing slashes,
+    /amp suffixes and tracking params (utm_*, fbclid, gclid, ...) and sorts
+    the rest, so ?utm_source variants and trailing slashes dedupe
+  - Aired stories live in one index file, pipeline.json → history.index_path
+    (default /logs/index/covered-urls.json): { urls: { <canonical>: { date, title } } }
+  - Ingest & Filter News dedupes on canonical URL and looks each story up in
+    the index (Map, O(1)); stories aired inside history.window_days get
+    covered_on set
+  - Load Episode History reads the index instead of every /logs/*.json file;
+    the first run migrates covered_urls from existing logs into the index
+  - Write Run Log upserts today's covered URLs and prunes entries older than
+    history.retain_days; entries dated today don't count as covered, so a
+    same-day rerun doesn't exclude its own stories
+  - Ingest stores the day's feed under ingest.snapshot_dir and a same-day
+    rerun replays it (same policy as the Claude cache — Rerun Trigger input,
+    CLAUDE_CACHE_POLICY, claude_cache.policy: refresh refetches, bypass skips
+    the snapshot), keeping the Claude cache keys of patch_claude_cache.py
+    stable
+
+Builds on patch_feed_parser.py and patch_dedup_history.py.
+
+Run from repo root: python3 scripts/patch_story_index.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_MAP_CONCURRENT, JS_FEED_PARSER, JS_STORY_INDEX
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Ingest & Filter News ──────────────────────────────────────────────────────
+JS_INGEST = JS_MAP_CONCURRENT + JS_FEED_PARSER + JS_STORY_INDEX + r"""
+const https = require('https');
+const http  = require('http');
+const zlib  = require('zlib');
+const fs    = require('fs');
+const path  = require('path');
+
+const sourcesData = $('Fetch sources.json').first().json;
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const ingestCfg   = pipelineCfg.ingest || {};
+const TIMEOUT_MS  = ingestCfg.timeout_ms || 15000;
+const MAX_CONCURRENCY = ingestCfg.mode === 'sequential' ? 1 : (ingestCfg.max_concurrency || 6);
+const PER_HOST        = ingestCfg.per_host_concurrency || 1;
+const CONDITIONAL_GET = ingestCfg.conditional_get !== false;
+const CACHE_PATH      = ingestCfg.cache_path || '/logs/cache/feeds.json';
+const STALE_RUN       = ingestCfg.early_stop_stale_run ?? 3;
+const SNAPSHOT_DIR    = ingestCfg.snapshot_dir || '/logs/cache/ingest';
+
+// Day feed snapshot: a same-day rerun replays what the first run ingested
+// instead of refetching, so scoring, the prompts and every Claude response
+// cache key downstream match the first run. Same policy as the Claude cache:
+// refresh refetches and overwrites, bypass refetches and leaves it alone.
+const runDate        = new Date().toISOString().split('T')[0];
+const snapshotPath   = `${SNAPSHOT_DIR}/${runDate}.json`;
+let rawPolicy        = $env.CLAUDE_CACHE_POLICY || (pipelineCfg.claude_cache || {}).policy || 'reuse';
+try { rawPolicy = $('Rerun Trigger').first().json.claude_cache_policy || rawPolicy; } catch (e) {}
+rawPolicy            = String(rawPolicy).toLowerCase();
+const snapshotPolicy = ['refresh', 'bypass'].includes(rawPolicy) ? rawPolicy : 'reuse';
+if (snapshotPolicy === 'reuse') {
+  try {
+    const snapshot = JSON.parse(fs.readFileSync(snapshotPath, 'utf8'));
+    return [{ json: { ...snapshot, snapshot: 'replayed' } }];
+  } catch (e) {}
+}
+
+// Feed cache: { [rss url]: { etag, last_modified, items, fetched_at } }
+let feedCache = {};
+try { feedCache = JSON.parse(fs.readFileSync(CACHE_PATH, 'utf8')); } catch (e) {}
+
+// Canonical URLs aired inside the history window — O(1) lookup per story
+const { covered } = loadStoryIndex(pipelineCfg.history);
+
+// Fetch a feed following redirects, handles gzip, and streams the body into
+// `parser` as it arrives. Resolves with { status, headers, wire_bytes,
+// parse_ms, truncated } — the request is aborted once parser.done is set.
+function fetchFeed(url, extraHeaders, parser, maxRedirects) {
+  if (maxRedirects === undefined) maxRedirects = 5;
+  return new Promise((resolve, reject) => {
+    if (maxRedirects < 0) return reject(new Error('Too many redirects'));
+    const lib = url.startsWith('https') ? https : http;
+    const opts = {
+      headers: {
+        'User-Agent': 'Mozilla/5.0 (compatible; CircuitBreakers/1.0; +https://github.com/msangui/podcast)',
+        'Accept': 'application/rss+xml, application/atom+xml, application/xml, text/xml, */*',
+        'Accept-Encoding': 'gzip, deflate',
+        ...extraHeaders
+      },
+      timeout: TIMEOUT_MS
+    };
+    let settled = false;
+    const settle = (fn, v) => { if (!settled) { settled = true; fn(v); } };
+    const req = lib.get(url, opts, (res) => {
+      if (res.statusCode >= 300 && res.statusCode < 400 && res.statusCode !== 304 && res.headers.location) {
+        res.resume();
+        const next = new URL(res.headers.location, url).toString();
+        return fetchFeed(next, extraHeaders, parser, maxRedirects - 1)
+          .then(v => settle(resolve, v)).catch(e => settle(reject, e));
+      }
+      if (res.statusCode === 304) {
+        res.resume();
+        return settle(resolve, { status: 304, headers: res.headers, wire_bytes: 0, parse_ms: 0, truncated: false });
+      }
+      if (res.statusCode !== 200) {
+        res.resume();
+        return settle(reject, new Error(`HTTP ${res.statusCode}`));
+      }
+      let wireBytes = 0;
+      let parseMs   = 0;
+      res.on('data',  chunk => { wireBytes += chunk.length; });
+      res.on('error', e => settle(reject, e));
+      let stream = res;
+      const enc = (res.headers['content-encoding'] || '').toLowerCase();
+      if (enc === 'gzip')    stream = res.pipe(zlib.createGunzip());
+      if (enc === 'deflate') stream = res.pipe(zlib.createInflate());
+      stream.setEncoding('utf8');
+      const finish = (truncated) => settle(resolve, {
+        status: 200, headers: res.headers, wire_bytes: wireBytes, parse_ms: parseMs, truncated
+      });
+      stream.on('data', text => {
+        if (settled) return;
+        const t0 = Date.now();
+        parser.write(text);
+        parseMs += Date.now() - t0;
+        if (parser.done) {
+          finish(true);
+          req.destroy();
+        }
+      });
+      stream.on('end', () => {
+        const t0 = Date.now();
+        parser.end();
+        parseMs += Date.now() - t0;
+        finish(false);
+      });
+      stream.on('error', e => settle(reject, e));
+    });
+    req.on('error', e => settle(reject, e));
+    req.on('timeout', () => { req.destroy(); settle(reject, new Error('Request timed out')); });
+  });
+}
+
+function conditionalHeaders(entry) {
+  const h = {};
+  if (!CONDITIONAL_GET || !entry || !Array.isArray(entry.items)) return h;
+  if (entry.etag)          h['If-None-Match']     = entry.etag;
+  if (entry.last_modified) h['If-Modified-Since'] = entry.last_modified;
+  return h;
+}
+
+function hostOf(source) {
+  try { return new URL(source.rss).hostname; } catch (e) { return source.rss; }
+}
+
+const sources = [...sourcesData.sources, ...(sourcesData.rotation_pool || [])]
+  .filter(s => s.active && s.rss && (s.type || 'rss') === 'rss');
+const hnSource = sourcesData.sources.find(s => s.name === 'Hacker News');
+const HN_KEYWORDS = hnSource?.keywords || [];
+const MAX_AGE_MS = 36 * 3600 * 1000;
+const now = Date.now();
+const ingestStart = Date.now();
+
+const fetched = await mapConcurrent(sources, MAX_CONCURRENCY, PER_HOST, hostOf, async (source) => {
+  const started = Date.now();
+  const parser  = new FeedParser({ cutoff: now - MAX_AGE_MS, staleRun: STALE_RUN });
+  try {
+    const res = await fetchFeed(source.rss, conditionalHeaders(feedCache[source.rss]), parser);
+    return { ...res, items: parser.items, started, ms: Date.now() - started };
+  } catch (err) {
+    // Degrade gracefully — one bad feed must not kill the pipeline
+    console.error('Feed error:', source.name, err.message);
+    return { error: err, started, ms: Date.now() - started };
+  }
+});
+
+// Merge in sources.json order so dedup and sort are independent of fetch timing
+const allStories  = [];
+const seenUrls    = new Set();
+const feedTimings = [];
+const cacheStats  = { hits: 0, misses: 0, wire_bytes: 0 };
+
+sources.forEach((source, i) => {
+  const res    = fetched[i] || {};
+  const timing = {
+    source:     source.name,
+    host:       hostOf(source),
+    start_ms:   res.started ? res.started - ingestStart : null,
+    fetch_ms:   res.ms ?? null,
+    parse_ms:   res.parse_ms ?? null,
+    status:     res.error ? 'error' : 'ok',
+    cache:      res.error ? null : (res.status === 304 ? 'hit' : 'miss'),
+    truncated:  !!res.truncated,
+    wire_bytes: res.wire_bytes || 0,
+    items:      0,
+    kept:       0,
+    previously_covered: 0
+  };
+  if (res.error) {
+    timing.error = res.error.message;
+    feedTimings.push(timing);
+    return;
+  }
+
+  let items;
+  if (res.status === 304) {
+    items = feedCache[source.rss].items;
+    cacheStats.hits++;
+  } else {
+    items = res.items;
+    cacheStats.misses++;
+    feedCache[source.rss] = {
+      etag:          res.headers.etag || null,
+      last_modified: res.headers['last-modified'] || null,
+      items,
+      fetched_at:    new Date().toISOString()
+    };
+  }
+  cacheStats.wire_bytes += timing.wire_bytes;
+  timing.items = items.length;
+  items = items.filter(item => (now - item.published) <= MAX_AGE_MS);
+
+  if (source.name === 'Hacker News') {
+    items = items.filter(item => {
+      if (item.score < 100) return false;
+      const text = (item.title + ' ' + item.description).toLowerCase();
+      return HN_KEYWORDS.some(kw => text.includes(kw.toLowerCase()));
+    });
+  }
+
+  for (const item of items) {
+    const canonical = canonicalUrl(item.link);
+    if (!canonical || seenUrls.has(canonical)) continue;
+    seenUrls.add(canonical);
+    const aired = covered.get(canonical);
+    if (aired) timing.previously_covered++;
+    timing.kept++;
+    allStories.push({
+      title:         item.title,
+      url:           item.link,
+      canonical_url: canonical,
+      description:   item.description,
+      published:     new Date(item.published).toISOString(),
+      source:        source.name,
+      source_tier:   source.tier,
+      hn_score:      item.score || null,
+      covered_on:    aired ? aired.date : null
+    });
+  }
+  feedTimings.push(timing);
+});
+
+allStories.sort((a, b) => {
+  if (a.source_tier !== b.source_tier) return a.source_tier - b.source_tier;
+  return new Date(b.published) - new Date(a.published);
+});
+
+// Persist the cache atomically; drop entries for feeds no longer configured
+try {
+  const active = new Set(sources.map(s => s.rss));
+  for (const url of Object.keys(feedCache)) if (!active.has(url)) delete feedCache[url];
+  fs.mkdirSync(path.dirname(CACHE_PATH), { recursive: true });
+  fs.writeFileSync(`${CACHE_PATH}.tmp`, JSON.stringify(feedCache));
+  fs.renameSync(`${CACHE_PATH}.tmp`, CACHE_PATH);
+} catch (e) {
+  console.error('Feed cache write failed:', e.message);
+}
+
+const result = {
+  stories:      allStories,
+  total:        allStories.length,
+  fetched_at:   new Date(now).toISOString(),
+  ingest_mode:  MAX_CONCURRENCY === 1 ? 'sequential' : 'concurrent',
+  ingest_ms:    Date.now() - ingestStart,
+  feed_timings: feedTimings,
+  feed_cache:   cacheStats,
+  previously_covered: allStories.filter(s => s.covered_on).length
+};
+
+// Only today's snapshot is ever read; earlier days are dropped
+let snapshot = 'bypass';
+if (snapshotPolicy !== 'bypass') {
+  try {
+    fs.mkdirSync(SNAPSHOT_DIR, { recursive: true });
+    fs.writeFileSync(`${snapshotPath}.tmp`, JSON.stringify(result));
+    fs.renameSync(`${snapshotPath}.tmp`, snapshotPath);
+    for (const f of fs.readdirSync(SNAPSHOT_DIR)) {
+      if (f.endsWith('.json') && f !== `${runDate}.json`) fs.unlinkSync(`${SNAPSHOT_DIR}/${f}`);
+    }
+    snapshot = 'stored';
+  } catch (e) {
+    console.error('Ingest snapshot write failed:', e.message);
+    snapshot = 'error';
+  }
+}
+
+return [{ json: { ...result, snapshot } }];
+"""
+
+# ── Load Episode History ──────────────────────────────────────────────────────
+# Reads the index (no directory scan) and hands the in-window canonical URLs
+# to Build Curator Input
+JS_LOAD_HISTORY = JS_STORY_INDEX + r"""
+// Runs on its own branch off Daily Schedule — config may not be loaded yet
+let historyCfg;
+try { historyCfg = $('Fetch pipeline.json').first().json.history; } catch (e) {}
+const { index, covered } = loadStoryIndex(historyCfg);
+const coveredUrls = [...covered.keys()];
+
+return [{ json: {
+  covered_urls: coveredUrls,
+  count:        coveredUrls.length,
+  index_size:   Object.keys(index.urls).length,
+  window_days:  storyIndexConfig(historyCfg).windowDays
+} }];
+"""
+
+# ── Write Run Log (updated: upsert covered URLs into the story index) ─────────
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+} catch (e) {}
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+PATCHES = {
+    "Ingest & Filter News": (JS_INGEST,       "dedupes on canonical URL, marks covered_on from the index"),
+    "Load Episode History": (JS_LOAD_HISTORY, "reads the story index instead of scanning /logs"),
+    "Write Run Log":        (JS_WRITE_LOG,    "upserts covered URLs into the story index"),
+}
+
+patched = set()
+for node in wf["nodes"]:
+    if node["name"] in PATCHES:
+        code, note = PATCHES[node["name"]]
+        node["parameters"]["jsCode"] = code
+        node["parameters"]["mode"]   = "runOnceForAllItems"
+        patched.add(node["name"])
+        print(f"  ✓ Patched '{node['name']}' — {note}")
+
+missing = set(PATCHES) - patched
+if missing:
+    print(f"  ✗ Nodes not found: {missing} (run patch_dedup_history.py first)")
+    raise SystemExit(1)
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
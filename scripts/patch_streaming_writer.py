@@ -0,0 +1,338 @@
+"""
+Streams the writer's output and starts text-to-speech while the script is
+still being generated, overlapping the two longest stages of the pipeline.
+
+  - 'Call Claude - Writer' consumes the Messages API SSE stream; every
+    complete CLAIRE:/FLINT: line is handed to a small ElevenLabs pool
+    (pipeline.json → writer_stream.prefetch_concurrency) and the audio lands in
+    writer_stream.prefetch_dir, keyed by ttsKey(voice, text). Lines inside the
+    trailing ```json metadata fence are skipped; Parse Writer Response still
+    reads the metadata from the assembled text
+  - When the stream ends, lines not yet started are dropped and the few
+    calls in flight are awaited, so the pool never runs alongside Generate
+    Voice: no line is paid for twice and the two never share ElevenLabs'
+    concurrent-request limit
+  - The streamed response goes through the same Claude response cache as before
+  - Generate Voice (Sequential) reuses prefetched audio whenever the final
+    line is unchanged — lines the editor rewrote are synthesized as usual
+  - Write Run Log records writer_stream timings and prefetch hits
+
+Set writer_stream.enabled = false to go back to a single blocking call.
+
+Run from repo root: python3 scripts/patch_streaming_writer.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX, JS_CLAUDE_CLIENT, JS_CLAUDE_STREAM, JS_TTS
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Call Claude - Writer (streaming + TTS prefetch) ───────────────────────────
+JS_CALL_WRITER = JS_CLAUDE_CLIENT + JS_CLAUDE_STREAM + JS_TTS + r"""
+const fs         = require('fs');
+const input      = $('Build Writer Input').first().json;
+const showFormat = $('Fetch show-format.json').first().json;
+const cfg        = $('Fetch pipeline.json').first().json.writer_stream || {};
+const STREAM     = cfg.enabled !== false;
+const PREFETCH   = STREAM && cfg.prefetch_tts !== false && !!$env.ELEVENLABS_API_KEY;
+const CONCURRENCY  = Math.max(1, cfg.prefetch_concurrency || 2);
+const PREFETCH_DIR = cfg.prefetch_dir || '/tmp/tts-prefetch';
+const voices     = hostVoices(showFormat);
+const t0         = Date.now();
+
+const body = {
+  model:      'claude-sonnet-4-6',
+  max_tokens: 8192,
+  system:     [{ type: 'text', text: input.system_prompt, cache_control: { type: 'ephemeral' } }],
+  messages:   [{ role: 'user', content: input.user_content }]
+};
+
+// Drop prefetched audio from previous days
+if (PREFETCH) {
+  fs.mkdirSync(PREFETCH_DIR, { recursive: true });
+  for (const f of fs.readdirSync(PREFETCH_DIR)) {
+    try {
+      const p = `${PREFETCH_DIR}/${f}`;
+      if (Date.now() - fs.statSync(p).mtimeMs > 48 * 3600 * 1000) fs.unlinkSync(p);
+    } catch (e) {}
+  }
+}
+
+// Speculative TTS — synthesize each complete host line while the rest streams
+const stats = { lines_seen: 0, prefetched: 0, already_present: 0, errors: 0, dropped: 0, drain_ms: 0, first_line_ms: null };
+const queue = [], running = new Set();
+
+async function synthesize({ speaker, text }) {
+  const voice = voices[speaker];
+  const file  = `${PREFETCH_DIR}/${ttsKey(voice, text)}.mp3`;
+  if (fs.existsSync(file)) { stats.already_present++; return; }
+  try {
+    const audio = await postElevenlabs(voice.voice_id, text, voice.voice_settings, voice.speed, $env.ELEVENLABS_API_KEY);
+    fs.writeFileSync(`${file}.tmp`, audio);
+    fs.renameSync(`${file}.tmp`, file);
+    stats.prefetched++;
+  } catch (e) {
+    stats.errors++;   // Generate Voice will synthesize this line normally
+  }
+}
+
+function pump() {
+  while (running.size < CONCURRENCY && queue.length) {
+    const p = synthesize(queue.shift()).finally(() => { running.delete(p); pump(); });
+    running.add(p);
+  }
+}
+
+let pending = '', inFence = false;
+function takeLine(raw) {
+  const line = raw.trim();
+  if (line.startsWith('```')) { inFence = !inFence; return; }   // metadata fence
+  if (inFence) return;
+  const m = line.match(/^(CLAIRE|FLINT):\s*(.*)$/);
+  if (!m || !m[2].trim()) return;
+  stats.lines_seen++;
+  if (stats.first_line_ms === null) stats.first_line_ms = Date.now() - t0;
+  if (PREFETCH) { queue.push({ speaker: m[1], text: m[2].trim() }); pump(); }
+}
+
+function onText(delta) {
+  pending += delta;
+  let nl;
+  while ((nl = pending.indexOf('\n')) !== -1) {
+    takeLine(pending.slice(0, nl));
+    pending = pending.slice(nl + 1);
+  }
+}
+
+const { response, cache, key } = STREAM
+  ? await cachedClaude(body, b => streamClaude(b, onText))
+  : await cachedClaude(body);
+if (pending) takeLine(pending);
+
+const streamMs = Date.now() - t0;
+
+// Nothing may outlive this node: a line still synthesizing when Generate Voice
+// reaches it would be paid for twice, and the pool would hold ElevenLabs slots
+// next to the TTS scheduler's. Lines not started yet are dropped (Generate
+// Voice synthesizes them as usual); the at most CONCURRENCY calls in flight
+// are awaited, which costs one request's latency, not the backlog's.
+stats.dropped = queue.splice(0).length;
+const drainStart = Date.now();
+await Promise.allSettled([...running]);
+stats.drain_ms = Date.now() - drainStart;
+
+return [{ json: {
+  ...response,
+  _claude_cache:     cache,
+  _claude_cache_key: key,
+  _writer_stream: {
+    mode:             cache === 'hit' ? 'cached' : (STREAM ? 'stream' : 'blocking'),
+    stream_ms:        streamMs,
+    ...stats
+  }
+} }];
+"""
+
+# ── Generate Voice (Sequential) — uses prefetched audio when the line matches ─
+JS_GENERATE_VOICE = JS_TTS + r"""
+const fs = require('fs');
+let prefetchDir = '/tmp/tts-prefetch';
+try { prefetchDir = ($('Fetch pipeline.json').first().json.writer_stream || {}).prefetch_dir || prefetchDir; } catch (e) {}
+
+const lines  = $input.all();
+const apiKey = $env.ELEVENLABS_API_KEY;
+const results = [];
+
+for (const item of lines) {
+  const { text, voice_id, voice_settings, speed, speaker, line_index, total_lines, episode_title } = item.json;
+  const file = `${prefetchDir}/${ttsKey({ voice_id, voice_settings, speed }, text)}.mp3`;
+
+  let audioBuffer = null;
+  try { audioBuffer = fs.readFileSync(file); } catch (e) {}
+  const prefetched = !!audioBuffer;
+  if (!prefetched) audioBuffer = await postElevenlabs(voice_id, text, voice_settings, speed, apiKey);
+
+  results.push({
+    json: {
+      speaker, line_index, total_lines, episode_title, prefetched,
+      bytes: audioBuffer.length,
+      audio_b64: audioBuffer.toString('base64')
+    }
+  });
+  if (!prefetched && line_index < total_lines - 1) {
+    await new Promise(r => setTimeout(r, 300));
+  }
+}
+
+return results;
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    cache === 'hit',
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+try { ttsPrefetchHits = $('Generate Voice (Sequential)').all().filter(i => i.json.prefetched).length; } catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+nodes  = wf["nodes"]
+writer = next((n for n in nodes if n["name"] == "Call Claude - Writer"), None)
+if not writer or writer["type"] != "n8n-nodes-base.code":
+    print("  ✗ 'Call Claude - Writer' is not a Code node — run patch_claude_cache.py first")
+    raise SystemExit(1)
+
+for n in nodes:
+    if n["name"] == "Call Claude - Writer":
+        n["parameters"]["jsCode"] = JS_CALL_WRITER
+        print("  ✓ Patched 'Call Claude - Writer' — streaming + TTS prefetch")
+    elif n["name"] == "Generate Voice (Sequential)":
+        n["parameters"]["jsCode"] = JS_GENERATE_VOICE
+        print("  ✓ Patched 'Generate Voice (Sequential)' — reuses prefetched lines")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records writer_stream")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": nodes,
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
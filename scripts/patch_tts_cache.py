@@ -0,0 +1,271 @@
+"""
+Adds a persistent, content-addressed TTS audio cache so recurring lines (the
+show-format.json closing lines, stock transitions) are paid for once.
+
+  - Key: sha256(voice_id, model_id, voice_settings, speed, normalized text) —
+    text is NFC-normalized with whitespace collapsed
+  - Generate Voice (Sequential) looks in the writer prefetch dir, then the
+    cache, and only schedules the remaining lines with ElevenLabs; everything
+    synthesized is written back
+  - Stored under pipeline.json → tts.cache.dir with an LRU byte budget
+    (tts.cache.max_mb); hit/miss counts and characters saved go to the run log
+    as tts_cache
+  - scripts/test_voices.py uses the same key and directory
+
+Run from repo root: python3 scripts/patch_tts_cache.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import JS_STORY_INDEX, JS_TTS, JS_TTS_SCHEDULER, JS_TTS_CACHE
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Generate Voice (Sequential) — prefetch → audio cache → scheduler ──────────
+JS_GENERATE_VOICE = JS_TTS + JS_TTS_SCHEDULER + JS_TTS_CACHE + r"""
+const fs = require('fs');
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const prefetchDir = (pipelineCfg.writer_stream || {}).prefetch_dir || '/tmp/tts-prefetch';
+const ttsCfg      = pipelineCfg.tts || {};
+const cache       = ttsCacheConfig(ttsCfg);
+
+const lines  = $input.all().map(i => i.json);
+const apiKey = $env.ELEVENLABS_API_KEY;
+const t0     = Date.now();
+const keys   = lines.map(l => ttsKey(l, l.text));
+
+// Lines already synthesized by the streaming writer skip the queue
+const audio  = new Array(lines.length).fill(null);
+const source = new Array(lines.length).fill('api');
+lines.forEach((l, i) => {
+  try { audio[i] = fs.readFileSync(`${prefetchDir}/${keys[i]}.mp3`); source[i] = 'prefetch'; } catch (e) {}
+  if (!audio[i]) {
+    audio[i] = readTtsCache(cache, keys[i]);
+    if (audio[i]) source[i] = 'cache';
+  }
+});
+
+const pending = lines.map((l, i) => i).filter(i => !audio[i]);
+const { results, stats } = await runTtsSchedule(pending.map(i => ({
+  cost: lines[i].text.length,
+  run:  () => postElevenlabs(lines[i].voice_id, lines[i].text, lines[i].voice_settings, lines[i].speed, apiKey)
+})), ttsCfg);
+const attempts = new Array(lines.length).fill(0);
+pending.forEach((i, k) => { audio[i] = results[k].value; attempts[i] = results[k].attempts; });
+
+// Everything synthesized this run (here or by the writer) goes into the cache
+lines.forEach((l, i) => { if (source[i] !== 'cache') writeTtsCache(cache, keys[i], audio[i]); });
+const evicted = evictTtsCache(cache);
+
+const hits = lines.filter((l, i) => source[i] === 'cache');
+const ttsCache = {
+  enabled:     cache.enabled,
+  hits:        hits.length,
+  misses:      lines.length - hits.length,
+  chars_saved: hits.reduce((a, l) => a + l.text.length, 0),
+  evicted
+};
+const schedule = {
+  ...stats,
+  lines:      lines.length,
+  prefetched: source.filter(s => s === 'prefetch').length,
+  wall_ms:    Date.now() - t0
+};
+
+return lines
+  .map((l, i) => ({ l, i }))
+  .sort((a, b) => a.l.line_index - b.l.line_index)
+  .map(({ l, i }, n) => ({
+    json: {
+      speaker:       l.speaker,
+      line_index:    l.line_index,
+      total_lines:   l.total_lines,
+      episode_title: l.episode_title,
+      prefetched:    source[i] === 'prefetch',
+      tts_source:    source[i],
+      tts_attempts:  attempts[i],
+      bytes:         audio[i].length,
+      audio_b64:     audio[i].toString('base64'),
+      // run-level stats ride on the first item
+      ...(n === 0 ? { tts_schedule: schedule, tts_cache: ttsCache } : {})
+    }
+  }));
+"""
+
+JS_WRITE_LOG = JS_STORY_INDEX + r"""
+const fs        = require('fs');
+const writerOut = $('Parse Writer Response').first().json;
+const buzzOut   = $('Upload to Buzzsprout').first().json;
+const driveOut  = $('Upload to Google Drive').first().json;
+const ingest    = $('Ingest & Filter News').first().json;
+const brief     = $('Parse Curator Response').first().json.brief;
+const concatOut = $('Concatenate Audio').first().json;
+const historyCfg = $('Fetch pipeline.json').first().json.history;
+const exclusion = $('Exclude Covered Stories').first().json.exclusion;
+const clustering = $('Cluster Stories').first().json.clustering;
+const scoring   = $('Score Stories').first().json.scoring;
+const promptStats = {
+  curator: $('Build Curator Input').first().json.prompt_stats || null,
+  writer:  $('Build Writer Input').first().json.prompt_stats  || null
+};
+const today     = new Date().toISOString().split('T')[0];
+
+const coveredUrls = (brief.stories || []).map(s => s.url).filter(Boolean);
+
+// Record today's stories in the canonical-URL index
+let indexSize = null;
+try {
+  const { index } = loadStoryIndex(historyCfg);
+  for (const s of brief.stories || []) {
+    if (!s.url) continue;
+    index.urls[canonicalUrl(s.url)] = { date: today, title: s.title || null };
+  }
+  saveStoryIndex(historyCfg, index);
+  indexSize = Object.keys(index.urls).length;
+} catch (e) {
+  console.error('Story index update failed:', e.message);
+}
+
+const episodeDir     = concatOut.episode_dir || `/episodes/${today}`;
+const localPath      = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/${concatOut.file_name}` : null;
+const transcriptPath = $env.SAVE_LOCAL === 'true' ? `${episodeDir}/transcript.txt` : null;
+
+let editorialChanges    = [];
+let hallucinationsFound = [];
+let editorApproved      = null;
+let editorUsage         = null;
+let editorCache         = null;
+let editorPatch         = null;
+let editorParallel      = null;
+let editorFacts         = null;
+try {
+  const editorOut      = $('Editor Review').first().json;
+  editorialChanges     = editorOut.editorial_changes    || [];
+  hallucinationsFound  = editorOut.hallucinations_found || [];
+  editorApproved       = editorOut.editor_approved ?? true;
+  editorUsage          = editorOut.editor_usage || null;
+  editorCache          = editorOut.editor_cache || null;
+  editorPatch          = editorOut.editor_patch || null;
+  editorParallel       = editorOut.editor_parallel || null;
+  editorFacts          = editorOut.editor_fact_context || null;
+} catch (e) {}
+
+// Token usage incl. prompt-cache reads/writes, straight from the Messages API
+// replayed = served from the local response cache, no tokens were spent this run
+function claudeUsage(u, cache) {
+  if (!u) return null;
+  return {
+    replayed:                    !!cache && String(cache).split('+').every(c => c === 'hit'),
+    input_tokens:                u.input_tokens ?? null,
+    output_tokens:               u.output_tokens ?? null,
+    cache_creation_input_tokens: u.cache_creation_input_tokens ?? 0,
+    cache_read_input_tokens:     u.cache_read_input_tokens ?? 0
+  };
+}
+let writerStream = null;
+try { writerStream = $('Call Claude - Writer').first().json._writer_stream || null; } catch (e) {}
+let ttsPrefetchHits = null;
+let ttsSchedule     = null;
+let ttsCache        = null;
+try {
+  const voiceItems = $('Generate Voice (Sequential)').all();
+  ttsPrefetchHits  = voiceItems.filter(i => i.json.prefetched).length;
+  ttsSchedule      = (voiceItems[0] && voiceItems[0].json.tts_schedule) || null;
+  ttsCache         = (voiceItems[0] && voiceItems[0].json.tts_cache)    || null;
+} catch (e) {}
+
+const cacheOf = name => { try { return $(name).first().json._claude_cache || null; } catch (e) { return null; } };
+const usageOf = name => { try { return claudeUsage($(name).first().json.usage, cacheOf(name)); } catch (e) { return null; } };
+
+const log = {
+  date:                  today,
+  run_at:                new Date().toISOString(),
+  episode_title:         writerOut.episode_title,
+  story_count:           writerOut.story_count,
+  covered_urls:          coveredUrls,
+  stories_ingested:      ingest.total,
+  previously_covered:    ingest.previously_covered ?? null,
+  exclusion:             exclusion || null,
+  clustering:            clustering || null,
+  scoring:               scoring    || null,
+  prompt_stats:          promptStats,
+  claude_usage: {
+    curator: usageOf('Call Claude - Curator'),
+    writer:  usageOf('Call Claude - Writer'),
+    editor:  claudeUsage(editorUsage, editorCache)
+  },
+  tts_schedule:          ttsSchedule,
+  tts_cache:             ttsCache,
+  writer_stream:         writerStream ? { ...writerStream, tts_prefetch_hits: ttsPrefetchHits } : null,
+  claude_cache: {
+    curator: cacheOf('Call Claude - Curator'),
+    writer:  cacheOf('Call Claude - Writer'),
+    editor:  editorCache
+  },
+  story_index_size:      indexSize,
+  ingest_mode:           ingest.ingest_mode || 'sequential',
+  ingest_ms:             ingest.ingest_ms ?? null,
+  feed_timings:          ingest.feed_timings || [],
+  feed_cache:            ingest.feed_cache   || null,
+  buzzsprout_episode_id: buzzOut.id,
+  buzzsprout_audio_url:  buzzOut.audio_url,
+  local_path:            localPath,
+  transcript_path:       transcriptPath,
+  editorial_changes:     editorialChanges,
+  hallucinations_found:  hallucinationsFound,
+  editor_approved:       editorApproved,
+  editor_patch:          editorPatch,
+  editor_parallel:       editorParallel,
+  editor_fact_context:   editorFacts,
+  google_drive_url:      driveOut.webViewLink || null,
+  status:                'success'
+};
+
+fs.mkdirSync('/logs', { recursive: true });
+fs.writeFileSync(`/logs/${today}.json`, JSON.stringify(log, null, 2));
+return [{ json: log }];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Generate Voice (Sequential)":
+        n["parameters"]["jsCode"] = JS_GENERATE_VOICE
+        print("  ✓ Patched 'Generate Voice (Sequential)' — persistent audio cache")
+    elif n["name"] == "Write Run Log":
+        n["parameters"]["jsCode"] = JS_WRITE_LOG
+        print("  ✓ Patched 'Write Run Log' — records tts_cache")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
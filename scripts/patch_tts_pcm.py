@@ -0,0 +1,416 @@
+"""
+Adds a raw PCM output mode to the TTS stage. With audio/mpeg every line is an
+MP3 that ffmpeg has to decode before the final encode, and each one carries
+encoder padding that shows up as tiny gaps between lines.
+
+  - pipeline.json → tts.output_format: 'pcm_24000' (or 'pcm_16000',
+    'pcm_22050', 'pcm_44100' on plans that allow it) requests headerless s16le
+    mono from ElevenLabs; 'mp3_44100_128' keeps the old behaviour
+  - The format is part of the TTS key for anything but MP3 (existing MP3
+    cache entries stay valid); cache, checkpoint and prefetch files use .pcm
+  - Call Claude - Writer prefetches in the same format (and picks up the
+    normalized ttsKey from patch_tts_cache.py)
+  - Generate Voice (Sequential) writes NNNN.pcm line files and tags items
+    with audio_format + sample_rate
+  - Concatenate Audio appends the PCM files byte-for-byte into one input and
+    runs the single-pass graph from patch_audio_assembly.py — one encode
+  - scripts/test_voices.py follows tts.output_format (PCM previews are saved
+    as .wav) and shares the cache
+
+Run from repo root: python3 scripts/patch_tts_pcm.py
+"""
+import json, urllib.request, urllib.error
+from js_lib import (
+    JS_CLAUDE_CLIENT, JS_CLAUDE_STREAM, JS_TTS, JS_TTS_SCHEDULER, JS_TTS_CACHE,
+    JS_TTS_CHECKPOINT, JS_ARTIFACTS, JS_AUDIO_ASSEMBLY
+)
+
+def load_env(path="./.env"):
+    env = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                k, _, v = line.partition("=")
+                env[k.strip()] = v.strip()
+    return env
+
+env = load_env()
+N8N_URL     = "http://localhost:5678/api/v1"
+N8N_API_KEY = env["N8N_API_KEY"]
+WF_ID       = env["N8N_WORKFLOW_ID_DAILY_PIPELINE"]
+
+def n8n(method, path, data=None):
+    body = json.dumps(data).encode() if data else None
+    req  = urllib.request.Request(
+        f"{N8N_URL}{path}", data=body,
+        headers={"X-N8N-API-KEY": N8N_API_KEY, "Content-Type": "application/json"},
+        method=method
+    )
+    try:
+        with urllib.request.urlopen(req) as r:
+            return json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        print(f"  ✗ HTTP {e.code}: {e.read().decode()}")
+        raise
+
+
+# ── Call Claude - Writer (prefetches in tts.output_format) ────────────────────
+JS_CALL_WRITER = JS_CLAUDE_CLIENT + JS_CLAUDE_STREAM + JS_TTS + r"""
+const fs         = require('fs');
+const input      = $('Build Writer Input').first().json;
+const showFormat = $('Fetch show-format.json').first().json;
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const cfg        = pipelineCfg.writer_stream || {};
+const format     = ttsFormat(pipelineCfg.tts);
+const STREAM     = cfg.enabled !== false;
+const PREFETCH   = STREAM && cfg.prefetch_tts !== false && !!$env.ELEVENLABS_API_KEY;
+const CONCURRENCY  = Math.max(1, cfg.prefetch_concurrency || 2);
+const PREFETCH_DIR = cfg.prefetch_dir || '/tmp/tts-prefetch';
+const voices     = hostVoices(showFormat);
+const t0         = Date.now();
+
+const body = {
+  model:      'claude-sonnet-4-6',
+  max_tokens: 8192,
+  system:     [{ type: 'text', text: input.system_prompt, cache_control: { type: 'ephemeral' } }],
+  messages:   [{ role: 'user', content: input.user_content }]
+};
+
+// Drop prefetched audio from previous days
+if (PREFETCH) {
+  fs.mkdirSync(PREFETCH_DIR, { recursive: true });
+  for (const f of fs.readdirSync(PREFETCH_DIR)) {
+    try {
+      const p = `${PREFETCH_DIR}/${f}`;
+      if (Date.now() - fs.statSync(p).mtimeMs > 48 * 3600 * 1000) fs.unlinkSync(p);
+    } catch (e) {}
+  }
+}
+
+// Speculative TTS — synthesize each complete host line while the rest streams
+const stats = { lines_seen: 0, prefetched: 0, already_present: 0, errors: 0, dropped: 0, drain_ms: 0, first_line_ms: null };
+const queue = [], running = new Set();
+
+async function synthesize({ speaker, text }) {
+  const voice = voices[speaker];
+  const file  = `${PREFETCH_DIR}/${ttsKey(voice, text, format)}.${format.ext}`;
+  if (fs.existsSync(file)) { stats.already_present++; return; }
+  try {
+    const audio = await postElevenlabs(voice.voice_id, text, voice.voice_settings, voice.speed, $env.ELEVENLABS_API_KEY, format);
+    fs.writeFileSync(`${file}.tmp`, audio);
+    fs.renameSync(`${file}.tmp`, file);
+    stats.prefetched++;
+  } catch (e) {
+    stats.errors++;   // Generate Voice will synthesize this line normally
+  }
+}
+
+function pump() {
+  while (running.size < CONCURRENCY && queue.length) {
+    const p = synthesize(queue.shift()).finally(() => { running.delete(p); pump(); });
+    running.add(p);
+  }
+}
+
+let pending = '', inFence = false;
+function takeLine(raw) {
+  const line = raw.trim();
+  if (line.startsWith('```')) { inFence = !inFence; return; }   // metadata fence
+  if (inFence) return;
+  const m = line.match(/^(CLAIRE|FLINT):\s*(.*)$/);
+  if (!m || !m[2].trim()) return;
+  stats.lines_seen++;
+  if (stats.first_line_ms === null) stats.first_line_ms = Date.now() - t0;
+  if (PREFETCH) { queue.push({ speaker: m[1], text: m[2].trim() }); pump(); }
+}
+
+function onText(delta) {
+  pending += delta;
+  let nl;
+  while ((nl = pending.indexOf('\n')) !== -1) {
+    takeLine(pending.slice(0, nl));
+    pending = pending.slice(nl + 1);
+  }
+}
+
+const { response, cache, key } = STREAM
+  ? await cachedClaude(body, b => streamClaude(b, onText))
+  : await cachedClaude(body);
+if (pending) takeLine(pending);
+
+const streamMs = Date.now() - t0;
+
+// Nothing may outlive this node: a line still synthesizing when Generate Voice
+// reaches it would be paid for twice, and the pool would hold ElevenLabs slots
+// next to the TTS scheduler's. Lines not started yet are dropped (Generate
+// Voice synthesizes them as usual); the at most CONCURRENCY calls in flight
+// are awaited, which costs one request's latency, not the backlog's.
+stats.dropped = queue.splice(0).length;
+const drainStart = Date.now();
+await Promise.allSettled([...running]);
+stats.drain_ms = Date.now() - drainStart;
+
+return [{ json: {
+  ...response,
+  _claude_cache:     cache,
+  _claude_cache_key: key,
+  _writer_stream: {
+    mode:             cache === 'hit' ? 'cached' : (STREAM ? 'stream' : 'blocking'),
+    stream_ms:        streamMs,
+    ...stats
+  }
+} }];
+"""
+
+# ── Generate Voice (Sequential) — line files in tts.output_format ─────────────
+JS_GENERATE_VOICE = JS_TTS + JS_TTS_SCHEDULER + JS_TTS_CACHE + JS_TTS_CHECKPOINT + JS_ARTIFACTS + r"""
+const fs = require('fs');
+const pipelineCfg = $('Fetch pipeline.json').first().json;
+const prefetchDir = (pipelineCfg.writer_stream || {}).prefetch_dir || '/tmp/tts-prefetch';
+const ttsCfg      = pipelineCfg.tts || {};
+const format      = ttsFormat(ttsCfg);
+const cache       = ttsCacheConfig(ttsCfg);
+const ckptCfg     = ttsCheckpointConfig(ttsCfg);
+const artCfg      = artifactConfig(pipelineCfg);
+
+const lines  = $input.all().map(i => i.json);
+const apiKey = $env.ELEVENLABS_API_KEY;
+const t0     = Date.now();
+const keys   = lines.map(l => ttsKey(l, l.text, format));
+
+// One episode per day, so the date identifies the run across retries
+const runId  = new Date().toISOString().split('T')[0];
+const pruned = pruneTtsCheckpoints(ckptCfg, runId);
+const ckpt   = openTtsCheckpoint(ckptCfg, runId, lines.length);
+
+// Resume order: this run's checkpoints, lines the streaming writer already
+// synthesized, the persistent cache — only the rest go to ElevenLabs
+const audio  = new Array(lines.length).fill(null);
+const source = new Array(lines.length).fill('api');
+lines.forEach((l, i) => {
+  audio[i] = ckpt.load(l.line_index, keys[i]);
+  if (audio[i]) { source[i] = 'checkpoint'; return; }
+  try { audio[i] = fs.readFileSync(`${prefetchDir}/${keys[i]}.${format.ext}`); source[i] = 'prefetch'; } catch (e) {}
+  if (!audio[i]) {
+    audio[i] = readTtsCache(cache, keys[i]);
+    if (audio[i]) source[i] = 'cache';
+  }
+  if (audio[i]) ckpt.save(l.line_index, keys[i], l.text.length, audio[i], source[i]);
+});
+const resumed = source.filter(s => s === 'checkpoint').length;
+
+const pending = lines.map((l, i) => i).filter(i => !audio[i]);
+let results, stats;
+try {
+  ({ results, stats } = await runTtsSchedule(pending.map(i => ({
+    cost: lines[i].text.length,
+    run:  async () => {
+      const buf = await postElevenlabs(lines[i].voice_id, lines[i].text, lines[i].voice_settings, lines[i].speed, apiKey, format);
+      ckpt.save(lines[i].line_index, keys[i], lines[i].text.length, buf, 'api');
+      return buf;
+    }
+  })), ttsCfg));
+} catch (e) {
+  if (ckptCfg.enabled) {
+    e.message = `${e.message} — ${ckpt.count()}/${lines.length} lines checkpointed in ${ckpt.dir}; retry to resume`;
+  }
+  throw e;
+}
+const attempts = new Array(lines.length).fill(0);
+pending.forEach((i, k) => { audio[i] = results[k].value; attempts[i] = results[k].attempts; });
+
+// Everything synthesized (this attempt, an earlier one, or by the writer) goes into the cache
+lines.forEach((l, i) => { if (source[i] !== 'cache') writeTtsCache(cache, keys[i], audio[i]); });
+const evicted = evictTtsCache(cache);
+
+const hits = lines.filter((l, i) => source[i] === 'cache');
+const ttsCache = {
+  enabled:     cache.enabled,
+  hits:        hits.length,
+  misses:      lines.length - hits.length,
+  chars_saved: hits.reduce((a, l) => a + l.text.length, 0),
+  evicted
+};
+const ttsCheckpoint = {
+  enabled:       ckptCfg.enabled,
+  run_id:        runId,
+  dir:           ckptCfg.enabled ? ckpt.dir : null,
+  resumed,
+  resumed_chars: lines.reduce((a, l, i) => a + (source[i] === 'checkpoint' ? l.text.length : 0), 0),
+  written:       ckpt.written,
+  pruned_runs:   pruned
+};
+// Hand downstream nodes a file per line: the checkpoint chunk when it holds
+// exactly this audio, otherwise a copy in the run's artifact dir
+const artDir = artifactRunDir(artCfg, runId);
+const audioPaths = lines.map((l, i) => {
+  const name = `${String(l.line_index).padStart(4, '0')}.${format.ext}`;
+  if (ckptCfg.enabled) {
+    try {
+      if (fs.statSync(`${ckpt.dir}/${name}`).size === audio[i].length) return `${ckpt.dir}/${name}`;
+    } catch (e) {}
+  }
+  return writeArtifact(`${artDir}/tts/${name}`, audio[i]).path;
+});
+
+const schedule = {
+  ...stats,
+  output_format: format.name,
+  lines:      lines.length,
+  prefetched: source.filter(s => s === 'prefetch').length,
+  wall_ms:    Date.now() - t0
+};
+
+return lines
+  .map((l, i) => ({ l, i }))
+  .sort((a, b) => a.l.line_index - b.l.line_index)
+  .map(({ l, i }, n) => ({
+    json: {
+      speaker:       l.speaker,
+      line_index:    l.line_index,
+      total_lines:   l.total_lines,
+      episode_title: l.episode_title,
+      prefetched:    source[i] === 'prefetch',
+      tts_source:    source[i],
+      tts_attempts:  attempts[i],
+      bytes:         audio[i].length,
+      audio_path:    audioPaths[i],
+      audio_format:  format.name,
+      sample_rate:   format.sample_rate,
+      // run-level stats ride on the first item
+      ...(n === 0 ? { tts_schedule: schedule, tts_cache: ttsCache, tts_checkpoint: ttsCheckpoint } : {})
+    }
+  }));
+"""
+
+# ── Concatenate Audio — byte-append PCM, single encode ────────────────────────
+JS_CONCAT_AUDIO = JS_ARTIFACTS + JS_AUDIO_ASSEMBLY + r"""
+const fs           = require('fs');
+const { execFileSync } = require('child_process');
+const items = $input.all();
+const date  = new Date().toISOString().split('T')[0];
+const fname = `circuit-breakers-${date}.mp3`;
+
+const artCfg   = artifactConfig($('Fetch pipeline.json').first().json);
+const loudness = loudnessConfig($('Fetch show-format.json').first().json);
+const pruned = pruneArtifacts(artCfg, date);
+const artDir = artifactRunDir(artCfg, date);
+
+const tmpDir = `/tmp/ep-${Date.now()}`;
+fs.mkdirSync(tmpDir, { recursive: true });
+
+// TTS segments are already on disk — hand their paths straight to ffmpeg
+const segFiles = [];
+let ttsBytes = 0;
+items.forEach(item => {
+  if (!item.json.audio_path) return;
+  ttsBytes += checkArtifact(item.json.audio_path, item.json.bytes);
+  segFiles.push(item.json.audio_path);
+});
+
+// Raw PCM lines are byte-appended into one file — no decode per chunk and no
+// MP3 frame padding between lines. Anything else goes through the concat list.
+const pcmRate = items.length && items.every(i => /^pcm_/.test(i.json.audio_format || '') && i.json.sample_rate === items[0].json.sample_rate)
+  ? items[0].json.sample_rate : null;
+let listFile = null, pcmFile = null;
+if (pcmRate) {
+  pcmFile = `${tmpDir}/speech.pcm`;
+  const fd = fs.openSync(pcmFile, 'w');
+  for (const f of segFiles) {
+    const buf = fs.readFileSync(f);
+    fs.writeSync(fd, buf);
+    if (buf.length % 2) fs.writeSync(fd, Buffer.alloc(1));   // keep 16-bit sample alignment
+  }
+  fs.closeSync(fd);
+} else {
+  listFile = `${tmpDir}/list.txt`;
+  fs.writeFileSync(listFile, segFiles.map(f => `file '${f}'`).join('\n'));
+}
+
+// Concat + intro duck + loudness in one graph, one encode. Local runs write
+// the episode straight into /episodes/{date}/, otherwise it stays in the
+// run's artifact dir until the uploads have read it.
+const introPath  = '/assets/intro.mp3';
+const hasIntro   = fs.existsSync(introPath);
+const episodeDir = `/episodes/${date}`;
+const outDir     = $env.SAVE_LOCAL === 'true' ? episodeDir : artDir;
+const outFile    = `${outDir}/${fname}`;
+fs.mkdirSync(outDir, { recursive: true });
+
+const t0 = Date.now();
+execFileSync(FFMPEG, assemblyArgs({ listFile, pcmFile, sampleRate: pcmRate, introPath: hasIntro ? introPath : null, outFile, loudness }), {
+  timeout:   300000,
+  maxBuffer: 16 * 1024 * 1024
+});
+const assembly = {
+  passes:    1,
+  input:     pcmRate ? `pcm_${pcmRate}` : 'mp3',
+  ms:        Date.now() - t0,
+  loudnorm:  loudness.enabled ? { I: loudness.integrated_lufs, TP: loudness.true_peak_db, LRA: loudness.lra } : null,
+  has_intro: hasIntro
+};
+const combinedBytes = checkArtifact(outFile);
+
+if ($env.SAVE_LOCAL === 'true') {
+  // Save transcript — prefer Editor Review output (corrected script), fall back to writer
+  let transcript = '';
+  try {
+    transcript = $('Editor Review').first().json.script || '';
+  } catch (_) {
+    try { transcript = $('Parse Writer Response').first().json.script || ''; } catch (_) {}
+  }
+  if (transcript) fs.writeFileSync(`${episodeDir}/transcript.txt`, transcript);
+}
+
+try { fs.rmSync(tmpDir, { recursive: true, force: true }); } catch (e) {}
+
+// Before/after numbers for the run log: what now rides in item JSON vs what
+// the base64 fields used to add to every execution
+const mb = n => Math.round(n / 1048576 * 10) / 10;
+const artifacts = {
+  dir:                   artDir,
+  tts_lines:             segFiles.length,
+  tts_bytes:             ttsBytes,
+  combined_bytes:        combinedBytes,
+  voice_item_json_bytes: items.reduce((a, i) => a + Buffer.byteLength(JSON.stringify(i.json)), 0),
+  base64_bytes_avoided:  items.reduce((a, i) => a + base64Bytes(i.json.bytes || 0), 0) + base64Bytes(combinedBytes),
+  heap_used_mb:          mb(process.memoryUsage().heapUsed),
+  max_rss_mb:            mb(process.resourceUsage().maxRSS * 1024),
+  pruned_runs:           pruned
+};
+
+return [{
+  json: {
+    file_name:      fname,
+    episode_dir:    episodeDir,
+    line_count:     items.length,
+    has_intro:      hasIntro,
+    combined_path:  outFile,
+    combined_bytes: combinedBytes,
+    artifacts,
+    assembly
+  }
+}];
+"""
+
+# ── Apply patches ──────────────────────────────────────────────────────────────
+print(f"→ Fetching Workflow {WF_ID}...")
+wf = n8n("GET", f"/workflows/{WF_ID}")
+
+for n in wf["nodes"]:
+    if n["name"] == "Call Claude - Writer":
+        n["parameters"]["jsCode"] = JS_CALL_WRITER
+        print("  ✓ Patched 'Call Claude - Writer' — prefetch in tts.output_format")
+    elif n["name"] == "Generate Voice (Sequential)":
+        n["parameters"]["jsCode"] = JS_GENERATE_VOICE
+        print("  ✓ Patched 'Generate Voice (Sequential)' — PCM line files")
+    elif n["name"] == "Concatenate Audio":
+        n["parameters"]["jsCode"] = JS_CONCAT_AUDIO
+        print("  ✓ Patched 'Concatenate Audio' — byte-append PCM, single encode")
+
+n8n("PUT", f"/workflows/{WF_ID}", {
+    "name": wf["name"], "nodes": wf["nodes"],
+    "connections": wf["connections"], "settings": wf["settings"]
+})
+print("  ✓ Saved")
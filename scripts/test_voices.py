@@ -7,12 +7,21 @@ Usage:
   python3 scripts/test_voices.py claire         # test Hans only
   python3 scripts/test_voices.py flint        # test Flint only
 
-Output: assets/test-claire.mp3 and/or assets/test-flint.mp3
+Output: assets/test-claire.mp3 and/or assets/test-flint.mp3 — .wav instead when
+config/pipeline.json → tts.output_format is a raw PCM format (e.g. pcm_24000)
 
 Iterate fast: edit config/show-format.json → run this script → listen → repeat.
 No GitHub push, no n8n restart needed.
+
+Clips go through the pipeline's TTS audio cache (./logs/cache/tts, mounted at
+/logs/cache/tts in n8n), so re-running with unchanged settings costs no
+ElevenLabs characters. Add --no-cache to force a fresh render.
 """
-import json, sys, os, urllib.request, urllib.error
+import hashlib, json, re, sys, os, unicodedata, urllib.request, urllib.error, wave
+from audio_timeline import chunk_info
+
+TTS_MODEL_ID   = "eleven_multilingual_v2"
+TTS_MP3_FORMAT = "mp3_44100_128"
 
 # ── Test sentences (chosen to exercise each character's personality) ──────────
 TEST_LINES = {
@@ -38,19 +47,69 @@ def load_show_format(path="./config/show-format.json"):
     with open(path) as f:
         return json.load(f)
 
-def call_elevenlabs(voice_id, text, voice_settings, api_key):
-    payload = json.dumps({
+def load_tts_config(path="./config/pipeline.json"):
+    with open(path) as f:
+        return json.load(f).get("tts", {})
+
+def pcm_sample_rate(output_format):
+    m = re.fullmatch(r"pcm_(\d+)", output_format)
+    return int(m.group(1)) if m else None
+
+def js_numbers(value):
+    """Integral floats as ints, so json.dumps writes 1 like JSON.stringify(1.0)
+    rather than 1.0 — speed and voice settings are often written as 1.0."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: js_numbers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [js_numbers(v) for v in value]
+    return value
+
+# Must stay in step with ttsKey() in scripts/js_lib.py
+def tts_cache_key(voice_id, voice_settings, speed, text, output_format=TTS_MP3_FORMAT):
+    text = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    key = {
+        "voice_id":       voice_id,
+        "model_id":       TTS_MODEL_ID,
+        "voice_settings": voice_settings,          # JS keeps {} (truthy); only None → null
+        "speed":          speed or None,
+        "text":           text
+    }
+    if output_format != TTS_MP3_FORMAT:
+        key["output_format"] = output_format
+    return hashlib.sha256(json.dumps(js_numbers(key), separators=(",", ":"), ensure_ascii=False).encode()).hexdigest()
+
+def evict_tts_cache(cache_dir, max_bytes):
+    # Least recently used first — a cache hit bumps the file's mtime
+    entries = sorted((os.stat(p).st_mtime, os.path.getsize(p), p)
+                     for p in (os.path.join(cache_dir, n) for n in os.listdir(cache_dir))
+                     if p.endswith((".mp3", ".pcm")))
+    total = sum(size for _, size, _ in entries)
+    for _, size, p in entries:
+        if total <= max_bytes:
+            break
+        os.remove(p)
+        total -= size
+
+def call_elevenlabs(voice_id, text, voice_settings, api_key, speed=None, output_format=TTS_MP3_FORMAT):
+    body = {
         "text": text,
-        "model_id": "eleven_multilingual_v2",
+        "model_id": TTS_MODEL_ID,
         "voice_settings": voice_settings
-    }).encode()
+    }
+    if speed:
+        body["speed"] = speed
+    payload = json.dumps(body).encode()
+    pcm = pcm_sample_rate(output_format) is not None
     req = urllib.request.Request(
-        f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
+        f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        + (f"?output_format={output_format}" if pcm else ""),
         data=payload,
         headers={
             "xi-api-key":   api_key,
             "Content-Type": "application/json",
-            "Accept":       "audio/mpeg"
+            "Accept":       "*/*" if pcm else "audio/mpeg"
         },
         method="POST"
     )
@@ -61,11 +120,38 @@ def call_elevenlabs(voice_id, text, voice_settings, api_key):
         body = e.read().decode()
         raise RuntimeError(f"ElevenLabs HTTP {e.code}: {body}")
 
+def synthesize(cfg, text, api_key, cache, output_format):
+    """Returns (audio bytes, served_from_cache). cache is None when disabled."""
+    if cache is None:
+        return call_elevenlabs(cfg["voice_id"], text, cfg["settings"], api_key, cfg["speed"], output_format), False
+    # Container path /logs/... is ./logs/... on the host
+    cache_dir = "." + cache.get("dir", "/logs/cache/tts")
+    ext  = ".pcm" if pcm_sample_rate(output_format) else ".mp3"
+    path = os.path.join(cache_dir, tts_cache_key(cfg["voice_id"], cfg["settings"], cfg["speed"], text, output_format) + ext)
+    if os.path.exists(path):
+        os.utime(path)
+        with open(path, "rb") as f:
+            return f.read(), True
+    audio = call_elevenlabs(cfg["voice_id"], text, cfg["settings"], api_key, cfg["speed"], output_format)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(audio)
+    os.replace(path + ".tmp", path)
+    evict_tts_cache(cache_dir, cache.get("max_mb", 500) * 1024 * 1024)
+    return audio, False
+
 def main():
-    filter_host = sys.argv[1].upper() if len(sys.argv) > 1 else None
+    args        = [a for a in sys.argv[1:] if not a.startswith("--")]
+    filter_host = args[0].upper() if args else None
 
     env         = load_env()
     show_format = load_show_format()
+    tts_cfg     = load_tts_config()
+    out_format  = tts_cfg.get("output_format", TTS_MP3_FORMAT)
+    sample_rate = pcm_sample_rate(out_format)
+    cache       = tts_cfg.get("cache", {})
+    if "--no-cache" in sys.argv or not cache.get("enabled", True):
+        cache = None
     api_key     = env["ELEVENLABS_API_KEY"]
     os.makedirs("assets", exist_ok=True)
 
@@ -76,6 +162,7 @@ def main():
             "settings": show_format["hosts"]["host_1"].get("voice_settings",
                         {"stability": 0.28, "similarity_boost": 0.75,
                          "style": 0.40, "use_speaker_boost": True}),
+            "speed": show_format["hosts"]["host_1"].get("speed"),
             "out": "assets/test-claire.mp3"
         },
         "FLINT": {
@@ -84,6 +171,7 @@ def main():
             "settings": show_format["hosts"]["host_2"].get("voice_settings",
                         {"stability": 0.45, "similarity_boost": 0.75,
                          "style": 0.20, "use_speaker_boost": True}),
+            "speed": show_format["hosts"]["host_2"].get("speed"),
             "out": "assets/test-flint.mp3"
         }
     }
@@ -96,10 +184,21 @@ def main():
                  f"style={s.get('style', 0)}, "
                  f"similarity={s.get('similarity_boost')}")
         print(f"→ Testing {name:<5} (voice: {cfg['voice_id']}, {label}) ... ", end="", flush=True)
-        audio = call_elevenlabs(cfg["voice_id"], TEST_LINES[name], cfg["settings"], api_key)
-        with open(cfg["out"], "wb") as f:
-            f.write(audio)
-        print(f"✓  saved to {cfg['out']}  ({len(audio):,} bytes)")
+        audio, cached = synthesize(cfg, TEST_LINES[name], api_key, cache, out_format)
+        out = cfg["out"]
+        if sample_rate:
+            # Raw s16le mono — wrap it in a WAV header so it plays anywhere
+            out = out[:-len(".mp3")] + ".wav"
+            with wave.open(out, "wb") as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(sample_rate)
+                w.writeframes(audio[:len(audio) - len(audio) % 2])
+        else:
+            with open(out, "wb") as f:
+                f.write(audio)
+        secs = chunk_info(audio, out_format)["duration_ms"] / 1000
+        print(f"✓  saved to {out}  ({secs:.1f}s, {len(audio):,} bytes, {'cache hit' if cached else 'rendered'})")
 
 if __name__ == "__main__":
     main()
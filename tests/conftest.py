@@ -0,0 +1,44 @@
+"""
+Shared helpers for the tests: Code-node bodies are plain JS strings in the
+patch scripts, so the tests pull them out with ast (importing a patch script
+would call the n8n API) and run them under node with a stubbed $() / $env.
+"""
+import ast, json, os, shutil, subprocess, sys
+import pytest
+
+ROOT    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+sys.path.insert(0, SCRIPTS)
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="node not on PATH")
+
+def js_constant(script, name):
+    """Value of a top-level `NAME = r\"\"\"...\"\"\"` in scripts/<script>; bodies built as
+    `JS_LIB_PART + r\"\"\"...\"\"\"` resolve names from the script, then js_lib."""
+    import js_lib
+    with open(os.path.join(SCRIPTS, script)) as f:
+        tree = ast.parse(f.read())
+    assigned = {n.targets[0].id: n.value for n in tree.body
+                if isinstance(n, ast.Assign) and isinstance(n.targets[0], ast.Name)}
+
+    def value(node):
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            return value(node.left) + value(node.right)
+        if isinstance(node, ast.Name):
+            return value(assigned[node.id]) if node.id in assigned else getattr(js_lib, node.id)
+        return ast.literal_eval(node)
+
+    if name not in assigned:
+        raise KeyError(f"{name} not found in {script}")
+    return value(assigned[name])
+
+def run_node_body(body, nodes, env=None):
+    """Run a Code-node body with $('<node>').first().json = nodes[<node>]."""
+    script = (
+        f"const NODES = {json.dumps(nodes)};\n"
+        "const $ = name => ({ first: () => ({ json: NODES[name] }) });\n"
+        f"const $env = {json.dumps(env or {})};\n"
+        "(async () => {\n" + body + "\n})().then(r => process.stdout.write(JSON.stringify(r)));\n"
+    )
+    out = subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
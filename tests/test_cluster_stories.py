@@ -0,0 +1,66 @@
+import json, os, re
+from conftest import ROOT, js_constant, requires_node, run_node_body
+
+JS_CLUSTER_STORIES = js_constant("patch_cluster_stories.py", "JS_CLUSTER_STORIES")
+
+with open(os.path.join(ROOT, "config", "pipeline.json")) as f:
+    CLUSTERING = json.load(f)["clustering"]
+
+def story(title, source, description=""):
+    return {"title": title, "url": f"https://{source}.example/" + re.sub(r"\W+", "-", title.lower()),
+            "description": description, "source": source, "source_tier": 1}
+
+# A shares "openai ai model" with B, B shares "ai model agents" with C; A and
+# C share only "ai model". Single-link word-set Jaccard at 0.4 chains all three
+A = story("OpenAI AI model diagnoses cancer", "a")
+B = story("OpenAI AI model agents", "b")
+C = story("AI model agents compose music", "c")
+
+# An ordinary AI news day: the same vocabulary runs through most stories
+FILLER = [
+    story(f"OpenAI AI model agents {a} {b}", f"filler{i}")
+    for i, (a, b) in enumerate([
+        ("chip", "shortage"), ("privacy", "lawsuit"), ("robotics", "funding"),
+        ("weather", "forecasting"), ("math", "olympiad"), ("energy", "grid"),
+        ("translation", "app"), ("game", "studio"), ("film", "dubbing"),
+        ("school", "tutoring"),
+    ])
+]
+
+def cluster(stories):
+    out = run_node_body(JS_CLUSTER_STORIES, {
+        "Exclude Covered Stories": {"stories": stories},
+        "Fetch pipeline.json":     {"clustering": CLUSTERING},
+    })
+    return out[0]["json"]
+
+def cluster_of(result, s):
+    for rep in result["stories"]:
+        if rep["url"] == s["url"] or s["url"] in rep["related_urls"]:
+            return rep["url"]
+    raise AssertionError(f"{s['title']!r} missing from the output")
+
+@requires_node
+def test_generic_word_chain_does_not_merge():
+    result = cluster([A, B, C] + FILLER)
+    assert {"ai", "openai", "model", "agents"} <= set(result["clustering"]["generic_words"])
+    assert len({cluster_of(result, s) for s in (A, B, C)}) == 3
+    assert result["clustering"]["merged"] == 0
+
+@requires_node
+def test_chain_without_common_vocabulary_is_not_one_cluster():
+    # Too few stories for any word to count as generic: complete linkage alone
+    # must keep A and C apart even though both link to B
+    result = cluster([A, B, C])
+    assert result["clustering"]["generic_words"] == []
+    assert cluster_of(result, A) != cluster_of(result, C)
+    assert len(result["stories"]) >= 2
+
+@requires_node
+def test_reworded_duplicates_still_merge():
+    d1 = story("Nvidia unveils Blackwell Ultra GPU at GTC keynote", "verge")
+    d2 = story("At its GTC keynote, Nvidia unveils the Blackwell Ultra GPU", "ars")
+    result = cluster([d1, A, d2] + FILLER)
+    assert cluster_of(result, d1) == cluster_of(result, d2) == d1["url"]
+    rep = next(s for s in result["stories"] if s["url"] == d1["url"])
+    assert rep["source_count"] == 2 and rep["related_urls"] == [d2["url"]]
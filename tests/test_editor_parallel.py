@@ -0,0 +1,77 @@
+import pytest
+from conftest import js_constant, requires_node, run_node_body
+
+# Both deploy the segment-parallel Editor Review; fact_context is the later one
+EDITORS = ["patch_editor_parallel.py", "patch_editor_fact_context.py"]
+
+# Claude replies keyed by "<segment>/<mode>"; cachedClaude and dropClaudeCache
+# are redeclared after the node body, so the later declarations win
+FAKE_CLAUDE = r"""
+async function cachedClaude(body) {
+  const msg  = body.messages[0].content;
+  const seg  = (msg.match(/SEGMENT: (\S+)/) || [null, 'full_script'])[1];
+  const mode = msg.match(/OUTPUT MODE: (\w+)/)[1];
+  const key  = `${seg}/${mode}`;
+  if (!(key in NODES.replies)) throw new Error(`no reply for ${key}`);
+  const text = NODES.replies[key];
+  return { response: { content: [{ text: typeof text === 'string' ? text : JSON.stringify(text) }],
+                       usage: { output_tokens: 10 } },
+           cache: 'miss', key };
+}
+function dropClaudeCache(key) { NODES.dropped.push(key); }
+"""
+
+# Two chunks at max_chunk_words 8: the cut is the first FLINT: line past 8 words
+SCRIPT = "\n".join([
+    "CLAIRE: one two three four five six",
+    "CLAIRE: seven eight nine ten",
+    "FLINT: second chunk starts here okay",
+    "CLAIRE: and it keeps going on",
+])
+
+def review(script_file, replies):
+    body  = js_constant(script_file, "JS_EDITOR_REVIEW")
+    nodes = {
+        "replies": replies,
+        "dropped": [],
+        "Fetch Editor Prompt":    {"data": "You are the editor."},
+        "Parse Writer Response":  {"script": SCRIPT, "episode_title": "Test"},
+        "Ingest & Filter News":   {"stories": []},
+        "Fetch show-format.json": {"segments": {}},
+        "Parse Curator Response": {"brief": {}},
+        "Fetch pipeline.json":    {"editor": {"max_chunk_words": 8}},
+    }
+    out = run_node_body(body.replace("return [{ json: {", "return [{ dropped: NODES.dropped, json: {")
+                        + FAKE_CLAUDE, nodes)
+    return out[0]
+
+@requires_node
+@pytest.mark.parametrize("script_file", EDITORS)
+def test_failed_segment_passes_through_alone(script_file):
+    lines = SCRIPT.split("\n")
+    out = review(script_file, {
+        "story_rapidfire#1/patch": {"patches": [{"line": 2, "op": "replace", "text": "CLAIRE: seven eight nine TEN",
+                                                 "reason": "emphasis"}]},
+        "story_rapidfire#2/patch": {"patches": [{"line": 1, "op": "delete"}]},   # outside its chunk
+        "story_rapidfire#2/full":  "not json",
+    })
+    result = out["json"]
+    assert result["script"] == "\n".join([lines[0], "CLAIRE: seven eight nine TEN", lines[2], lines[3]])
+    assert result["editor_approved"] is False
+    assert result["editor_parallel"]["failed"] == ["story_rapidfire#2"]
+    assert result["editorial_changes"][0] == "Line 2 (replace): emphasis"
+    assert "story_rapidfire#2" in result["editorial_changes"][1]
+    assert out["dropped"] == ["story_rapidfire#2/patch", "story_rapidfire#2/full"]
+
+@requires_node
+@pytest.mark.parametrize("script_file", EDITORS)
+def test_all_segments_reviewed(script_file):
+    out = review(script_file, {
+        "story_rapidfire#1/patch": {"patches": [], "approved": True},
+        "story_rapidfire#2/patch": {"patches": [{"line": 4, "op": "delete", "reason": "filler"}], "approved": True},
+    })
+    result = out["json"]
+    assert result["script"] == "\n".join(SCRIPT.split("\n")[:3])
+    assert result["editor_approved"] is True
+    assert result["editor_parallel"]["failed"] == []
+    assert out["dropped"] == []
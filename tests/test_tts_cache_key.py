@@ -0,0 +1,30 @@
+import pytest
+from conftest import requires_node, run_node_body
+from js_lib import JS_TTS
+from test_voices import tts_cache_key
+
+SETTINGS = {"stability": 0.28, "similarity_boost": 0.75, "style": 0.4, "use_speaker_boost": True}
+TEXT     = "  Welcome back to the show —\n\tit's  a big one today.  "
+
+def js_key(voice, text, output_format=None):
+    fmt = f"ttsFormat({{ output_format: {output_format!r} }})" if output_format else "undefined"
+    return run_node_body(JS_TTS + f"\nreturn ttsKey(NODES.voice, NODES.text, {fmt});",
+                         {"voice": voice, "text": text})
+
+@requires_node
+@pytest.mark.parametrize("settings, speed", [
+    (SETTINGS,                               1.0),
+    (SETTINGS,                               1.1),
+    (SETTINGS,                               None),
+    ({**SETTINGS, "stability": 1.0},         0.9),
+    ({**SETTINGS, "style": 0.0},             1.0),
+    (None,                                   1.0),
+])
+def test_python_key_matches_js(settings, speed):
+    voice = {"voice_id": "abc123", "voice_settings": settings, "speed": speed}
+    assert tts_cache_key("abc123", settings, speed, TEXT) == js_key(voice, TEXT)
+
+@requires_node
+def test_python_key_matches_js_for_pcm():
+    voice = {"voice_id": "abc123", "voice_settings": SETTINGS, "speed": 1.0}
+    assert tts_cache_key("abc123", SETTINGS, 1.0, TEXT, "pcm_24000") == js_key(voice, TEXT, "pcm_24000")